@@ -0,0 +1 @@
+# The checkers rules engine and AI. Nothing in this package imports pygame.
@@ -0,0 +1,634 @@
+# The minimax AI. It only needs the board engine, so it can run without the
+# display (for example in benchmarks).
+
+import os
+import random
+import time
+
+from checkers.book import OpeningBook
+from checkers.egdb import EndgameDatabase, DRAW, get_distance
+from checkers.evaluation import Evaluator, load_weights
+from checkers.stats import get_search_stats, profile_call
+from checkers.transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+# The deepest iteration a timed search will start.
+MAX_DEPTH = 64
+# The deepest ply any search can reach.
+MAX_PLY = 128
+# How many positions to visit between checks of the clock.
+CLOCK_CHECK_INTERVAL = 256
+
+# Move ordering scores. Moves are tried from the highest score down: the
+# previous iteration's principal variation, the table move, captures (more
+# pieces first), the two killer moves of the ply, then the rest by their
+# history score.
+PRINCIPAL_VARIATION_SCORE = 1 << 40
+TABLE_MOVE_SCORE = 1 << 39
+CAPTURE_SCORE = 1 << 38
+KILLER_SCORE = 1 << 37
+
+# The most positions one quiescence search may visit before the remaining
+# captures are judged as they stand.
+QUIESCENCE_NODES = 1000
+
+# The value of a win found in the endgame database, less the number of moves
+# it takes. It is above any value the evaluation can give.
+ENDGAME_WIN = 1000
+
+# Leaves are evaluated with NumPy when at least this many are collected at
+# once. Fewer are quicker to evaluate one by one.
+BATCH_SIZE = 24
+
+# The width of the window used to test whether a move is better than the best
+# so far. Values are whole numbers, so a window of one point is enough.
+NULL_WINDOW = 1
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class AI:
+
+    def __init__(self, board, colour, difficulty, table_size=2 ** 18, replacement='depth',
+                 shuffle=True, ordering=True, seed=None, quiescence_nodes=QUIESCENCE_NODES,
+                 endgame=None, book=None, profile_dir=None, weights=None, batch=False):
+        self.board = board
+        self.colour = colour
+        self.difficulty = difficulty
+
+        # Break ties between equally ordered moves at random so that games
+        # vary. With shuffling off, the same position always gives the same
+        # move. The seed makes the random choices repeatable.
+        self.shuffle = shuffle
+        self.random = random.Random(seed)
+        # Without ordering the moves are searched in a random order (the
+        # table and principal variation moves still go first).
+        self.ordering = ordering
+        # Pending captures are followed past the depth limit, up to this many
+        # positions for each position at the limit. 0 turns this off.
+        self.quiescence_nodes = quiescence_nodes
+        self.quiescence_budget = 0
+
+        # Positions are judged by a weighted sum of features (see
+        # checkers.evaluation), weights mapping feature names to weights or
+        # naming a file made by checkers.tuning.
+        # With batching on, the leaves below a position are collected and
+        # evaluated together, which only pays when the evaluation is slow:
+        # alpha-beta would have cut some of them off.
+        if isinstance(weights, str):
+            weights = load_weights(weights)
+        self.evaluator = Evaluator(weights)
+        self.batch = batch
+
+        # The transposition table is kept for the whole game, so positions
+        # searched on one turn are remembered on the next. A size of 0 turns
+        # it off.
+        if table_size:
+            self.table = TranspositionTable(table_size, replacement)
+        else:
+            self.table = None
+
+        # The endgame database (the path of a file made by checkers.egdb), if
+        # any. Positions in it are not searched.
+        if endgame != None:
+            self.endgame = EndgameDatabase(endgame)
+        else:
+            self.endgame = None
+
+        # The opening book (the path of a file made by checkers.book), if any.
+        # Positions in it are played from the book without searching.
+        if book != None:
+            self.book = OpeningBook(book)
+        else:
+            self.book = None
+
+        # With a directory given, every search is run under cProfile and its
+        # profile is written there.
+        self.profile_dir = profile_dir
+        self.searches = 0
+        # Whether the last move came from the opening book.
+        self.from_book = False
+
+        # The number of positions visited by the last search, in total and
+        # at each ply.
+        self.nodes = 0
+        self.nodes_by_depth = [0] * MAX_PLY
+        # How many searches were cut off, how many moves had to be searched
+        # again after a null window search, and how many positions were
+        # visited past the depth limit or found in the endgame database.
+        self.cutoffs = 0
+        self.researches = 0
+        self.quiescence_visits = 0
+        self.endgame_hits = 0
+        # How many positions were evaluated, how many were expanded and how
+        # many moves those had, and the time spent generating moves, making
+        # and taking them back, and evaluating.
+        self.evaluations = 0
+        self.expansions = 0
+        self.moves_generated = 0
+        self.generation_time = 0.0
+        self.make_time = 0.0
+        self.evaluation_time = 0.0
+        # The statistics of the last move chosen (see checkers.stats).
+        self.stats = None
+        # Quiet moves that caused a cutoff, two per ply, and how much each
+        # (colour, start, end) move has caused cutoffs.
+        self.killers = [[None, None] for ply in range(MAX_PLY)]
+        self.history = [[0] * 1024, [0] * 1024]
+        # The deepest search completed by the last call to play(), and the
+        # value it gave the chosen move from the AI's point of view (None if
+        # the move was not searched).
+        self.depth_reached = 0
+        self.value = None
+        # The moves both sides are expected to play, from the last completed
+        # search (the last completed iteration of a timed search).
+        self.principal_variation = []
+        # When the current iteration has to stop, and when the timed search
+        # as a whole has to stop (None for no limit).
+        self.deadline = None
+        self.move_deadline = None
+        # Set by stop() from another thread to end the search early.
+        self.stopped = False
+
+    def get_static_value(self, board_state, depth):
+
+        start = time.perf_counter()
+        self.evaluations += 1
+
+        # The evaluation is from the AI's point of view. Take the depth into
+        # account: we would like to win as quickly as possible.
+        static_value = self.evaluator.evaluate(board_state, self.colour) - depth
+
+        self.evaluation_time += time.perf_counter() - start
+        return static_value
+
+    def evaluate_frontier(self, board_state, moves, depth):
+
+        # Return the values of the positions the moves lead to, where those
+        # are leaves at this depth, from the point of view of the player to
+        # move there (as negamax() would return them). Other positions get
+        # None and are searched as usual. NumPy only pays for itself on many
+        # positions, so the leaves are evaluated in one batch only when there
+        # are enough moves.
+        values = [None] * len(moves)
+        batch = len(moves) >= BATCH_SIZE
+        positions = []
+        leaves = []
+
+        for index, move in enumerate(moves):
+            board_state.push(move)
+            if self.endgame != None:
+                values[index] = self.get_endgame_value(board_state, depth)
+            # A leaf with a capture to make goes on to the quiescence search.
+            if values[index] == None and (not self.quiescence_nodes
+                                          or not board_state.get_jumpers(board_state.turn)):
+                if batch:
+                    positions.append((board_state.white, board_state.black, board_state.kings,
+                                      board_state.turn))
+                    leaves.append(index)
+                else:
+                    sign = 1 if board_state.turn == self.colour else -1
+                    values[index] = sign * self.get_static_value(board_state, depth)
+            board_state.pop()
+
+        if positions != []:
+            start = time.perf_counter()
+            self.evaluations += len(positions)
+            static_values = self.evaluator.evaluate_batch(positions, self.colour)
+            for index, static_value, position in zip(leaves, static_values, positions):
+                sign = 1 if position[3] == self.colour else -1
+                values[index] = sign * (static_value - depth)
+            self.evaluation_time += time.perf_counter() - start
+
+        return values
+
+    def check_clock(self):
+
+        # Give up if a timed search has run out of time or the search was
+        # stopped. Called for every node counted, but the clock is only read
+        # every CLOCK_CHECK_INTERVAL nodes.
+        if (self.nodes % CLOCK_CHECK_INTERVAL == 0
+        and (self.stopped
+             or self.deadline != None and time.perf_counter() >= self.deadline)):
+            raise SearchTimeout()
+
+    def get_best_move(self, board_state, alpha, beta, depth, depth_limit, is_maximizer):
+
+        # Search with values from the AI's point of view, where the AI is the
+        # maximizer. Returns the (move, value) pair.
+        if is_maximizer:
+            value, move = self.negamax(board_state, alpha, beta, depth, depth_limit)
+            return (move, value)
+        else:
+            value, move = self.negamax(board_state, -beta, -alpha, depth, depth_limit)
+            return (move, -value)
+
+    def negamax(self, board_state, alpha, beta, depth, depth_limit):
+
+        # A principal variation search. Values are from the point of view of
+        # the player to move, so each side maximizes the negated value of the
+        # positions its moves lead to. The search makes each move on
+        # board_state and takes it back again, so only one board exists
+        # however deep the search goes. Returns the (value, move) pair.
+
+        self.nodes += 1
+        self.nodes_by_depth[depth] += 1
+
+        self.check_clock()
+
+        # get_static_value() is from the AI's point of view.
+        sign = 1 if board_state.turn == self.colour else -1
+
+        # Positions in the endgame database need no search, except at the
+        # root where a move has to be found.
+        if depth > 0 and self.endgame != None:
+            value = self.get_endgame_value(board_state, depth)
+            if value != None:
+                return (value, None)
+    
+        if depth == depth_limit and self.quiescence_nodes:
+            # Play out any captures still to be made before judging the
+            # position, so that a capture just past the limit is not missed.
+            self.quiescence_budget = self.quiescence_nodes
+            return (self.quiesce(board_state, alpha, beta, depth, depth), None)
+    
+        if depth == depth_limit or board_state.is_won():
+            return (sign * self.get_static_value(board_state, depth), None)
+
+        # Values are stored in the table as if the position were the root
+        # (see get_static_value), so they can be reused at any depth.
+        table_move = None
+        if self.table != None:
+            entry = self.table.probe(board_state.key)
+            if entry != None:
+                table_move = entry[4]
+                # Use the stored value if it is deep enough, except at the
+                # root where a move must be found by searching.
+                if entry[1] >= depth_limit - depth and depth > 0:
+                    value = entry[3] - sign * depth
+                    if (entry[2] == EXACT
+                    or entry[2] == LOWER and value >= beta
+                    or entry[2] == UPPER and value <= alpha):
+                        return (value, table_move)
+
+        original_alpha = alpha
+        best_value = float('-inf')
+        best_move = None
+    
+        # Get all possible moves, most promising first.
+        start = time.perf_counter()
+        moves = self.order_moves(board_state, board_state.get_legal_moves(), depth, table_move)
+        self.generation_time += time.perf_counter() - start
+        self.expansions += 1
+        self.moves_generated += len(moves)
+
+        # The positions the moves lead to are leaves: evaluate them together.
+        if self.batch and depth + 1 == depth_limit:
+            leaf_values = self.evaluate_frontier(board_state, moves, depth + 1)
+        else:
+            leaf_values = None
+
+        for index, move in enumerate(moves):
+
+            if leaf_values != None and leaf_values[index] != None:
+                # Count the leaf as negamax() would have.
+                self.nodes += 1
+                self.nodes_by_depth[depth + 1] += 1
+                self.check_clock()
+                value = -leaf_values[index]
+                if value > best_value:
+                    best_value = value
+                    best_move = move
+                    if value > alpha:
+                        alpha = value
+                        if alpha >= beta:
+                            self.cutoffs += 1
+                            self.record_cutoff(board_state, move, depth, depth_limit)
+                            break
+                continue
+
+            start = time.perf_counter()
+            board_state.push(move)
+            self.make_time += time.perf_counter() - start
+
+            # Search the first move with the full window. For the others, a
+            # null window is enough to show that they are no better, and
+            # only the ones that turn out better are searched again.
+            if best_move == None:
+                value = -self.negamax(board_state, -beta, -alpha, depth + 1, depth_limit)[0]
+            else:
+                value = -self.negamax(board_state, -alpha - NULL_WINDOW, -alpha, depth + 1, depth_limit)[0]
+                if alpha < value < beta:
+                    self.researches += 1
+                    value = -self.negamax(board_state, -beta, -alpha, depth + 1, depth_limit)[0]
+
+            start = time.perf_counter()
+            board_state.pop()
+            self.make_time += time.perf_counter() - start
+
+            # Keep the best move so far. The first of several equally good
+            # moves is kept.
+            if value > best_value:
+                best_value = value
+                best_move = move
+                if value > alpha:
+                    alpha = value
+                    # The opponent will not allow this position.
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        self.record_cutoff(board_state, move, depth, depth_limit)
+                        break
+
+        # Save the result. A value outside the window is only a bound.
+        if self.table != None:
+            if best_value <= original_alpha:
+                bound = UPPER
+            elif best_value >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.table.store(board_state.key, depth_limit - depth, bound,
+                             best_value + sign * depth, best_move)
+
+        return (best_value, best_move)
+
+    def get_endgame_value(self, board_state, depth):
+
+        # Return the value of a position from the endgame database, from the
+        # point of view of the player to move, or None if it is not there.
+        value = self.endgame.probe(board_state)
+        if value == None:
+            return None
+        self.endgame_hits += 1
+
+        if value == DRAW:
+            result = 0
+        else:
+            distance, wins = get_distance(value)
+            result = ENDGAME_WIN - distance if wins else distance - ENDGAME_WIN
+
+        # Take the depth into account as get_static_value() does.
+        sign = 1 if board_state.turn == self.colour else -1
+        return result - sign * depth
+
+    def quiesce(self, board_state, alpha, beta, depth, ply):
+
+        # Search only captures until the player to move has none left. A
+        # capture cannot be refused, so there is no option of standing pat.
+        # Positions are judged at the depth of the limit (not at the ply they
+        # are reached), or longer capture sequences would count against the
+        # AI as much as the pieces they win.
+        sign = 1 if board_state.turn == self.colour else -1
+        if ply > depth and self.endgame != None:
+            value = self.get_endgame_value(board_state, ply)
+            if value != None:
+                return value
+        if self.quiescence_budget <= 0 or not board_state.get_jumpers(board_state.turn):
+            return sign * self.get_static_value(board_state, depth)
+
+        best_value = float('-inf')
+
+        # The legal moves are all captures here, with multi-jumps followed to
+        # the end by the board. Take the most pieces first.
+        moves = board_state.get_legal_moves()
+        moves.sort(key=lambda move: move[2].bit_count(), reverse=True)
+
+        for move in moves:
+
+            self.nodes += 1
+            self.nodes_by_depth[ply + 1] += 1
+            self.quiescence_visits += 1
+            self.quiescence_budget -= 1
+            self.check_clock()
+
+            board_state.push(move)
+            value = -self.quiesce(board_state, -beta, -alpha, depth, ply + 1)
+            board_state.pop()
+
+            if value > best_value:
+                best_value = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        return best_value
+
+    def order_moves(self, board_state, moves, depth, table_move):
+
+        # Shuffle first: the sort below keeps equally scored moves in the
+        # shuffled order.
+        if self.shuffle:
+            self.random.shuffle(moves)
+
+        principal_variation_move = self.get_principal_variation_move(board_state, depth)
+
+        if not self.ordering:
+            for first_move in (table_move, principal_variation_move):
+                if first_move in moves:
+                    moves.remove(first_move)
+                    moves.insert(0, first_move)
+            return moves
+
+        killers = self.killers[depth]
+        history = self.history[board_state.turn]
+
+        def get_score(move):
+            if move == principal_variation_move:
+                return PRINCIPAL_VARIATION_SCORE
+            elif move == table_move:
+                return TABLE_MOVE_SCORE
+            elif move[2]:
+                return CAPTURE_SCORE + move[2].bit_count()
+            elif move == killers[0]:
+                return KILLER_SCORE + 1
+            elif move == killers[1]:
+                return KILLER_SCORE
+            else:
+                return history[move[0] * 32 + move[1]]
+
+        moves.sort(key=get_score, reverse=True)
+        return moves
+
+    def record_cutoff(self, board_state, move, depth, depth_limit):
+
+        # Captures are always searched first, so only quiet moves are
+        # remembered.
+        if move[2]:
+            return
+
+        killers = self.killers[depth]
+        if move != killers[0]:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        # Cutoffs far from the leaves save more work.
+        self.history[board_state.turn][move[0] * 32 + move[1]] += (depth_limit - depth) ** 2
+
+    def new_search(self):
+
+        # Start the counters and the move ordering statistics again.
+        self.nodes = 0
+        self.nodes_by_depth = [0] * MAX_PLY
+        self.cutoffs = 0
+        self.researches = 0
+        self.quiescence_visits = 0
+        self.endgame_hits = 0
+        self.evaluations = 0
+        self.expansions = 0
+        self.moves_generated = 0
+        self.generation_time = 0.0
+        self.make_time = 0.0
+        self.evaluation_time = 0.0
+        self.killers = [[None, None] for ply in range(MAX_PLY)]
+        self.history = [[0] * 1024, [0] * 1024]
+        if self.table != None:
+            self.table.new_search()
+
+    def get_principal_variation_move(self, board_state, depth):
+
+        # Only the nodes reached by playing the principal variation have a
+        # move from it.
+        if depth >= len(self.principal_variation):
+            return None
+        history = board_state.history
+        for ply in range(depth):
+            if history[len(history) - depth + ply][0] != self.principal_variation[ply]:
+                return None
+        return self.principal_variation[depth]
+
+    def get_principal_variation(self, move, depth_limit):
+
+        # Follow the best moves stored in the table from the root.
+        variation = [move]
+        if self.table != None:
+            self.board.push(move)
+            while len(variation) < depth_limit:
+                entry = self.table.probe(self.board.key)
+                if entry == None or entry[4] not in self.board.get_legal_moves():
+                    break
+                variation.append(entry[4])
+                self.board.push(entry[4])
+            for played in variation:
+                self.board.pop()
+        return variation
+
+    def search_root(self, depth_limit):
+
+        # Search the AI's board and return the (move, value) pair.
+        return self.get_best_move(self.board, float('-inf'), float('+inf'), 0, depth_limit, True)
+
+    def get_timed_move(self, time_budget_ms, ponder=False):
+
+        # A pondering search has no deadline until start_clock() is called.
+        if ponder:
+            self.move_deadline = None
+        else:
+            self.move_deadline = time.perf_counter() + time_budget_ms / 1000
+        history_length = len(self.board.history)
+
+        # There is nothing to think about if only one move is possible.
+        moves = self.board.get_legal_moves()
+        if len(moves) <= 1:
+            return moves[0] if moves else None
+
+        # Search one move deeper each time, keeping the best move from the
+        # last search that finished. The first search always finishes so
+        # that there is a move to play (unless the search is stopped).
+        best_move = None
+        self.principal_variation = []
+        try:
+            for depth_limit in range(1, MAX_DEPTH + 1):
+                if depth_limit > 1:
+                    self.deadline = self.move_deadline
+                best_move, self.value = self.search_root(depth_limit)
+                self.depth_reached = depth_limit
+                self.principal_variation = self.get_principal_variation(best_move, depth_limit)
+        except SearchTimeout:
+            # Take back the moves of the unfinished search.
+            while len(self.board.history) > history_length:
+                self.board.pop()
+        finally:
+            self.deadline = None
+
+        return best_move
+
+    def start_clock(self, time_budget_ms):
+
+        # Give a pondering search its time budget from now. The first
+        # iteration is left to finish whatever the time.
+        self.move_deadline = time.perf_counter() + time_budget_ms / 1000
+        if self.depth_reached > 0:
+            self.deadline = self.move_deadline
+
+    def stop(self):
+
+        # Make the search give up at its next clock check. This is safe to
+        # call from another thread.
+        self.stopped = True
+
+    def choose_move(self, time_budget_ms=None, ponder=False):
+
+        # Find a move, keeping the statistics of the search and profiling it
+        # if asked to.
+        start = time.perf_counter()
+        self.searches += 1
+        if self.profile_dir != None:
+            path = os.path.join(self.profile_dir, 'search-%d-%d.prof' % (os.getpid(), self.searches))
+            move = profile_call(path, self.find_move, time_budget_ms, ponder)
+        else:
+            move = self.find_move(time_budget_ms, ponder)
+        self.stats = get_search_stats(self, time.perf_counter() - start, self.from_book)
+        return move
+
+    def find_move(self, time_budget_ms=None, ponder=False):
+
+        # A stop() only ends the search it interrupts.
+        self.stopped = False
+        self.new_search()
+        self.depth_reached = 0
+        self.value = None
+        self.principal_variation = []
+        self.from_book = False
+
+        # Play a book move if the book has the position.
+        if self.book != None:
+            move = self.book.choose_move(self.board, self.random)
+            if move != None:
+                self.from_book = True
+                return move
+
+        # Search to a fixed depth, or as deep as the time budget allows.
+        if time_budget_ms == None:
+            history_length = len(self.board.history)
+            try:
+                move, value = self.search_root(self.difficulty)
+                self.depth_reached = self.difficulty
+                self.value = value
+                if move != None:
+                    self.principal_variation = self.get_principal_variation(move, self.difficulty)
+            except SearchTimeout:
+                while len(self.board.history) > history_length:
+                    self.board.pop()
+                move = None
+        else:
+            move = self.get_timed_move(time_budget_ms, ponder)
+
+        # A search stopped before it found a move plays the move that would
+        # have been searched first.
+        if move == None:
+            moves = self.board.get_legal_moves()
+            if moves != []:
+                move = self.order_moves(self.board, moves, 0, None)[0]
+                self.principal_variation = [move]
+
+        return move
+
+    def play(self, time_budget_ms=None):
+
+        # Make the chosen move on the board (there is none if the AI has lost).
+        move = self.choose_move(time_budget_ms)
+        if move != None:
+            self.board.apply_move(move)
+        return self.board
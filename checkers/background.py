@@ -0,0 +1,138 @@
+# Running the AI without blocking the caller.
+#
+# BackgroundSearch searches a copy of the board in a worker thread and passes
+# the chosen move to a callback, so the GUI can keep drawing and handling
+# events while the AI thinks. The GUI's callback posts the move as a pygame
+# event. Nothing here imports pygame.
+#
+# With pondering on, the AI also thinks on the opponent's time. After each of
+# its moves it searches the position after the reply it expects (the second
+# move of its principal variation). If the opponent plays that reply the
+# search carries on as the real one, otherwise it is thrown away.
+
+import threading
+
+from checkers.bitboard import BitBoard
+
+
+class BackgroundSearch:
+
+    def __init__(self, ai, on_move, time_budget_ms=None, ponder=False):
+        self.ai = ai
+        # Called from the worker thread as on_move(move, key), where key is
+        # the key of the position the move is to be played in.
+        self.on_move = on_move
+        self.time_budget_ms = time_budget_ms
+        self.ponder = ponder
+
+        self.thread = None
+        self.lock = threading.Lock()
+        # The key of the position being searched, whether it is only a guess
+        # at the opponent's reply, and the move found for it if the guess has
+        # not been settled yet.
+        self.key = None
+        self.pondering = False
+        self.ponder_move = None
+        # Set when the result of the current search is no longer wanted.
+        self.cancelled = False
+        # The reply the AI expects to its last move (None if it has no idea).
+        self.expected_reply = None
+
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+
+    def is_thinking(self):
+        return self.thread != None and self.thread.is_alive()
+
+    def start(self, board, pondering=False):
+
+        # Search for the AI's move in board, throwing away any other search.
+        self.cancel()
+        self.key = board.key
+        self.pondering = pondering
+        self.ponder_move = None
+        self.cancelled = False
+        self.expected_reply = None
+
+        # The worker gets a board of its own, so the caller can go on using
+        # (and drawing) theirs.
+        state = BitBoard(board.white, board.black, board.kings, board.turn)
+        self.thread = threading.Thread(target=self.run, args=(state,), daemon=True)
+        self.thread.start()
+
+    def run(self, board):
+
+        ai = self.ai
+        ai.board = board
+        ai.colour = board.turn
+        move = ai.choose_move(self.time_budget_ms, self.pondering)
+
+        # Remember the reply the AI expects, for pondering on it.
+        if len(ai.principal_variation) > 1:
+            expected_reply = ai.principal_variation[1]
+        else:
+            expected_reply = None
+
+        with self.lock:
+            if self.cancelled:
+                return
+            self.expected_reply = expected_reply
+            # A guessed position waits for the opponent's move.
+            if self.pondering:
+                self.ponder_move = move
+                return
+
+        self.on_move(move, self.key)
+
+    def start_pondering(self, board):
+
+        # Think about the position after the expected reply to the move just
+        # played on board.
+        if not self.ponder or self.expected_reply == None:
+            return
+        if self.expected_reply not in board.get_legal_moves():
+            return
+        board = BitBoard(board.white, board.black, board.kings, board.turn)
+        board.apply_move(self.expected_reply)
+        self.start(board, pondering=True)
+
+    def opponent_moved(self, board):
+
+        # The opponent has moved and it is the AI's turn in board. Keep the
+        # pondering search if it guessed the move, or start a new one.
+        move = None
+        with self.lock:
+            hit = self.pondering and not self.cancelled and board.key == self.key
+            if hit:
+                self.pondering = False
+                move = self.ponder_move
+                # The search is now the real one, so its time starts now.
+                if move == None and self.time_budget_ms != None:
+                    self.ai.start_clock(self.time_budget_ms)
+            missed = self.pondering
+
+        if hit:
+            self.ponder_hits += 1
+            # The move was found before the opponent played.
+            if move != None:
+                self.on_move(move, self.key)
+            return
+
+        if missed:
+            self.ponder_misses += 1
+        self.start(board)
+
+    def move_now(self):
+
+        # Make the AI play the best move it has found so far.
+        if self.is_thinking() and not self.pondering:
+            self.ai.stop()
+
+    def cancel(self):
+
+        # Stop the search and wait for it, throwing away its result.
+        with self.lock:
+            self.cancelled = True
+        if self.is_thinking():
+            self.ai.stop()
+            self.thread.join()
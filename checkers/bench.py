@@ -0,0 +1,156 @@
+# Search benchmarks.
+#
+#   python -m checkers.bench tt --depths 4 5 6 7 8
+#   python -m checkers.bench parallel --workers 1 2 4 8 16 --depth 8
+#   python -m checkers.bench ordering --depth 8
+#
+# Each benchmark searches the opening and a fixed set of positions taken from
+# seeded random games, so runs are comparable between releases.
+
+import argparse
+import random
+import time
+
+from checkers.ai import AI
+from checkers.bitboard import BitBoard
+from checkers.parallel import ParallelAI
+
+
+def get_positions(count, seed=0):
+
+    # The opening, followed by positions from random games.
+    positions = [BitBoard()]
+    rng = random.Random(seed)
+    while len(positions) < count:
+        board = BitBoard()
+        for ply in range(rng.randrange(4, 40)):
+            moves = board.get_legal_moves()
+            if moves == []:
+                break
+            board.apply_move(rng.choice(moves))
+        else:
+            positions.append(board)
+    return positions
+
+
+def search(board, depth, **options):
+
+    # Search one position with a fixed shuffle so runs can be compared.
+    ai = AI(board.copy(), board.turn, depth, seed=0, **options)
+    start = time.perf_counter()
+    ai.play()
+    return ai, time.perf_counter() - start
+
+
+def bench_tt(depths, positions, table_size, replacement):
+
+    print('depth  nodes (no TT)  nodes (TT)  reduction  hit rate  time (TT)')
+    for depth in depths:
+        plain_nodes = table_nodes = probes = hits = 0
+        elapsed = 0.0
+        for board in positions:
+            ai, seconds = search(board, depth, table_size=0)
+            plain_nodes += ai.nodes
+            ai, seconds = search(board, depth, table_size=table_size, replacement=replacement)
+            table_nodes += ai.nodes
+            probes += ai.table.probes
+            hits += ai.table.hits
+            elapsed += seconds
+        print('%5d  %13d  %10d  %8.1f%%  %7.1f%%  %8.2fs' % (
+            depth, plain_nodes, table_nodes,
+            100 * (1 - table_nodes / plain_nodes),
+            100 * hits / probes if probes else 0.0, elapsed))
+
+
+def bench_parallel(worker_counts, depth, positions, table_size):
+
+    # The serial search is the baseline, and the parallel search must agree
+    # with it (shuffling is off in both).
+    ai = AI(None, None, depth, table_size=table_size, shuffle=False)
+    expected = []
+    serial_nodes = 0
+    start = time.perf_counter()
+    for board in positions:
+        ai.board = board.copy()
+        ai.colour = board.turn
+        ai.new_search()
+        expected.append(ai.search_root(depth))
+        serial_nodes += ai.nodes
+    serial_time = time.perf_counter() - start
+
+    print('workers      time  speedup  nodes      matches serial')
+    print('serial  %8.2fs  %6.2fx  %9d' % (serial_time, 1.0, serial_nodes))
+
+    for workers in worker_counts:
+        ai = ParallelAI(None, None, depth, workers, table_size, shuffle=False)
+        # Worker start-up is not part of the search time.
+        ai.start()
+        results = []
+        start = time.perf_counter()
+        nodes = 0
+        for board in positions:
+            ai.board = board.copy()
+            ai.colour = board.turn
+            ai.new_search()
+            results.append(ai.search_root(depth))
+            nodes += ai.nodes
+        elapsed = time.perf_counter() - start
+        ai.close()
+        print('%7d  %8.2fs  %6.2fx  %9d  %s' % (
+            workers, elapsed, serial_time / elapsed, nodes,
+            'yes' if results == expected else 'NO'))
+
+
+def bench_ordering(depth, positions):
+
+    # Count the nodes searched at each ply with the moves in random order
+    # and with move ordering.
+    counts = {}
+    for ordering in (False, True):
+        counts[ordering] = [0] * (depth + 1)
+        for board in positions:
+            ai, seconds = search(board, depth, ordering=ordering)
+            for ply in range(depth + 1):
+                counts[ordering][ply] += ai.nodes_by_depth[ply]
+
+    print('ply      random     ordered  reduction')
+    for ply in range(depth + 1):
+        random_nodes, ordered_nodes = counts[False][ply], counts[True][ply]
+        print('%3d  %10d  %10d  %8.1f%%' % (ply, random_nodes, ordered_nodes,
+              100 * (1 - ordered_nodes / random_nodes) if random_nodes else 0.0))
+    print('all  %10d  %10d  %8.1f%%' % (sum(counts[False]), sum(counts[True]),
+          100 * (1 - sum(counts[True]) / sum(counts[False]))))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Search benchmarks.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    tt = commands.add_parser('tt', help='transposition table hit rate and node reduction')
+    tt.add_argument('--depths', type=int, nargs='+', default=[4, 5, 6, 7, 8])
+    tt.add_argument('--positions', type=int, default=20)
+    tt.add_argument('--table-size', type=int, default=2 ** 18)
+    tt.add_argument('--replacement', choices=['depth', 'always'], default='depth')
+
+    parallel = commands.add_parser('parallel', help='root-parallel speedup by number of workers')
+    parallel.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parallel.add_argument('--depth', type=int, default=8)
+    parallel.add_argument('--positions', type=int, default=10)
+    parallel.add_argument('--table-size', type=int, default=2 ** 18)
+
+    ordering = commands.add_parser('ordering', help='nodes per ply with and without move ordering')
+    ordering.add_argument('--depth', type=int, default=8)
+    ordering.add_argument('--positions', type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == 'tt':
+        bench_tt(args.depths, get_positions(args.positions), args.table_size, args.replacement)
+    elif args.command == 'parallel':
+        bench_parallel(args.workers, args.depth, get_positions(args.positions), args.table_size)
+    elif args.command == 'ordering':
+        bench_ordering(args.depth, get_positions(args.positions))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+# A compact board engine for English draughts.
+#
+# Only the 32 dark squares can ever hold a piece, so a position fits in three
+# 32-bit masks: one for White's pieces, one for Black's pieces and one for the
+# crowned pieces of either colour. The squares are numbered four to a row,
+# from Black's side of the board (the top of the window) down to White's:
+#
+#        x: 0  1  2  3  4  5  6  7
+#   y = 0:  .  0  .  1  .  2  .  3
+#   y = 1:  4  .  5  .  6  .  7  .
+#   y = 2:  .  8  .  9  . 10  . 11
+#   y = 3: 12  . 13  . 14  . 15  .
+#   y = 4:  . 16  . 17  . 18  . 19
+#   y = 5: 20  . 21  . 22  . 23  .
+#   y = 6:  . 24  . 25  . 26  . 27
+#   y = 7: 28  . 29  . 30  . 31  .
+#
+# With this layout every diagonal step is a shift by 3, 4 or 5 depending on
+# the parity of the row, so whole sets of pieces can be moved at once.
+
+from checkers.zobrist import PIECE_KEYS, TURN_KEY
+
+WHITE = 0
+BLACK = 1
+
+ROWS = 8
+COLS = 8
+SQUARES = 32
+PIECES_PER_SIDE = 12
+
+FULL_MASK = 0xFFFFFFFF
+TOP_ROW = 0x0000000F
+BOTTOM_ROW = 0xF0000000
+# The first and last playable square of every row.
+FIRST_COLUMN = 0x11111111
+LAST_COLUMN = 0x88888888
+# Rows with an even and an odd y.
+EVEN_ROWS = 0x0F0F0F0F
+ODD_ROWS = 0xF0F0F0F0
+
+# White starts on the three rows nearest the bottom and Black on the three
+# rows nearest the top.
+WHITE_START = 0xFFF00000
+BLACK_START = 0x00000FFF
+
+# The row on which each side's pieces are crowned.
+CROWN_ROW = (TOP_ROW, BOTTOM_ROW)
+
+
+def square_to_position(square):
+
+    # Convert a square number to the [column, row] used by the display.
+    y = square // 4
+    x = 2 * (square % 4) + (1 - y % 2)
+    return [x, y]
+
+
+def position_to_square(position):
+
+    x, y = position
+    # Positions off the board and light squares have no square number.
+    if not (0 <= x < COLS and 0 <= y < ROWS) or (x + y) % 2 == 0:
+        return None
+    return y * 4 + x // 2
+
+
+def squares(mask):
+
+    # Yield the square number of every bit set in the mask.
+    while mask:
+        bit = mask & -mask
+        yield bit.bit_length() - 1
+        mask ^= bit
+
+
+# Each function below moves every piece in a mask one step along a diagonal.
+# Pieces that would step off the board are dropped.
+
+def up_left(mask):
+    return ((mask & EVEN_ROWS & ~TOP_ROW) >> 4) | ((mask & ODD_ROWS & ~FIRST_COLUMN) >> 5)
+
+
+def up_right(mask):
+    return ((mask & EVEN_ROWS & ~LAST_COLUMN & ~TOP_ROW) >> 3) | ((mask & ODD_ROWS) >> 4)
+
+
+def down_left(mask):
+    return ((mask & EVEN_ROWS) << 4) | ((mask & ODD_ROWS & ~FIRST_COLUMN & ~BOTTOM_ROW) << 3)
+
+
+def down_right(mask):
+    return ((mask & EVEN_ROWS & ~LAST_COLUMN) << 5) | ((mask & ODD_ROWS & ~BOTTOM_ROW) << 4)
+
+
+# Pairs of (step, opposite step). Uncrowned pieces only move forward: White
+# up the board and Black down it. Crowned pieces use all four directions.
+FORWARD_STEPS = (
+    ((up_left, down_right), (up_right, down_left)),
+    ((down_left, up_right), (down_right, up_left)),
+)
+ALL_STEPS = FORWARD_STEPS[WHITE] + FORWARD_STEPS[BLACK]
+
+# Pieces that move one at a time (as in a multi-jump) look their moves up in
+# tables instead. The kinds of piece: White's men, Black's men and kings.
+KING = 2
+
+
+def get_kind(colour, crowned):
+    return KING if crowned else colour
+
+
+def build_tables():
+
+    # STEP_TABLE[kind][square] lists (target bit, target square) for every
+    # square a piece of that kind could step to from the square, and
+    # JUMP_TABLE[kind][square] lists (jumped bit, landing bit, landing square)
+    # for every jump it could make. Squares off the board are left out.
+    step_table = []
+    jump_table = []
+    for steps in (FORWARD_STEPS[WHITE], FORWARD_STEPS[BLACK], ALL_STEPS):
+        step_rows = []
+        jump_rows = []
+        for square in range(SQUARES):
+            targets = []
+            jumps = []
+            for step, back in steps:
+                target = step(1 << square)
+                if target:
+                    targets.append((target, target.bit_length() - 1))
+                    if step(target):
+                        jumps.append((target, step(target), step(target).bit_length() - 1))
+            step_rows.append(tuple(targets))
+            jump_rows.append(tuple(jumps))
+        step_table.append(tuple(step_rows))
+        jump_table.append(tuple(jump_rows))
+    return tuple(step_table), tuple(jump_table)
+
+
+STEP_TABLE, JUMP_TABLE = build_tables()
+
+
+class BitBoard:
+
+    def __init__(self, white=WHITE_START, black=BLACK_START, kings=0, turn=WHITE):
+        self.white = white
+        self.black = black
+        self.kings = kings
+        self.turn = turn
+
+        # The Zobrist key of the position, kept up to date by every move.
+        self.key = self.get_key()
+
+        # Undo records for the moves made with push(), most recent last.
+        self.history = []
+
+    def copy(self):
+        return type(self)(self.white, self.black, self.kings, self.turn)
+
+    def get_key(self):
+
+        # Hash the whole position from scratch.
+        key = TURN_KEY if self.turn == BLACK else 0
+        for colour, pieces in ((WHITE, self.white), (BLACK, self.black)):
+            for square in squares(pieces):
+                key ^= PIECE_KEYS[colour][self.kings >> square & 1][square]
+        return key
+
+    def get_sides(self, colour):
+
+        # Return the (friendly, opponent) masks for a colour.
+        if colour == WHITE:
+            return self.white, self.black
+        else:
+            return self.black, self.white
+
+    def get_colour_at(self, square):
+
+        bit = 1 << square
+        if self.white & bit:
+            return WHITE
+        elif self.black & bit:
+            return BLACK
+        else:
+            return None
+
+    def get_jumpers(self, colour):
+
+        own, opp = self.get_sides(colour)
+        empty = ~(own | opp) & FULL_MASK
+        jumpers = 0
+
+        # A piece can jump if, looking back from an empty square, there is an
+        # opponent piece and then one of its own pieces that moves that way.
+        for step, back in FORWARD_STEPS[colour]:
+            jumpers |= back(back(empty) & opp) & own
+        for step, back in FORWARD_STEPS[1 - colour]:
+            jumpers |= back(back(empty) & opp) & own & self.kings
+
+        return jumpers
+
+    def get_movers(self, colour):
+
+        own, opp = self.get_sides(colour)
+        empty = ~(own | opp) & FULL_MASK
+        movers = 0
+
+        # A piece can make a simple move if the square ahead of it is empty.
+        for step, back in FORWARD_STEPS[colour]:
+            movers |= back(empty) & own
+        for step, back in FORWARD_STEPS[1 - colour]:
+            movers |= back(empty) & own & self.kings
+
+        return movers
+
+    def get_piece_jumps(self, square):
+
+        # Return the (captured square, landing square) pairs for one jump.
+        bit = 1 << square
+        colour = self.get_colour_at(square)
+        own, opp = self.get_sides(colour)
+        empty = ~(own | opp) & FULL_MASK
+
+        return [(over.bit_length() - 1, land_square)
+                for over, land, land_square in JUMP_TABLE[get_kind(colour, self.kings & bit)][square]
+                if over & opp and land & empty]
+
+    def get_piece_steps(self, square):
+
+        # Return the squares one piece can reach with a simple move.
+        bit = 1 << square
+        colour = self.get_colour_at(square)
+        occupied = self.white | self.black
+
+        return [target_square
+                for target, target_square in STEP_TABLE[get_kind(colour, self.kings & bit)][square]
+                if not target & occupied]
+
+    def get_piece_moves(self, square):
+
+        # Return every complete move one piece can make, following
+        # multi-jumps to the end. Jumps take priority over simple moves.
+        bit = 1 << square
+        colour = self.get_colour_at(square)
+        own, opp = self.get_sides(colour)
+        kind = get_kind(colour, self.kings & bit)
+
+        # The moving piece leaves its square, so a crowned piece can jump in
+        # a circle and land where it started.
+        empty = ~(own | opp) & FULL_MASK | bit
+
+        moves = []
+        self.add_jumps(moves, square, square, opp, empty, JUMP_TABLE[kind], 0)
+        if moves:
+            return moves
+
+        for target, target_square in STEP_TABLE[kind][square]:
+            if target & empty:
+                moves.append((square, target_square, 0))
+
+        return moves
+
+    def add_jumps(self, moves, start, square, opp, empty, jumps, captured):
+
+        extended = False
+        for over, land, land_square in jumps[square]:
+            # Each opponent piece can only be captured once per move.
+            if over & opp & ~captured and land & empty:
+                extended = True
+                self.add_jumps(moves, start, land_square, opp, empty, jumps, captured | over)
+
+        # Record the move once the piece cannot jump any further.
+        # An uncrowned piece that reaches the far row has no forward jumps
+        # left, so crowning always ends the move.
+        if not extended and captured:
+            move = (start, square, captured)
+            # Different jump orders can capture the same pieces.
+            if move not in moves:
+                moves.append(move)
+
+    def get_legal_moves(self):
+
+        # Captures are compulsory: if any piece can jump, only jumps count.
+        jumpers = self.get_jumpers(self.turn)
+        if jumpers:
+            moves = []
+            for square in squares(jumpers):
+                moves.extend(self.get_piece_moves(square))
+            return moves
+
+        own, opp = self.get_sides(self.turn)
+        empty = ~(own | opp) & FULL_MASK
+
+        moves = []
+        for step, back in FORWARD_STEPS[self.turn]:
+            for square in squares(back(empty) & own):
+                moves.append((square, step(1 << square).bit_length() - 1, 0))
+        for step, back in FORWARD_STEPS[1 - self.turn]:
+            for square in squares(back(empty) & own & self.kings):
+                moves.append((square, step(1 << square).bit_length() - 1, 0))
+
+        return moves
+
+    def apply_move(self, move):
+
+        start, end, captured = move
+        from_bit = 1 << start
+        to_bit = 1 << end
+        keys = PIECE_KEYS[self.turn]
+        opponent_keys = PIECE_KEYS[1 - self.turn]
+
+        # Take the moving and captured pieces out of the key.
+        key = self.key ^ TURN_KEY ^ keys[self.kings >> start & 1][start]
+        for square in squares(captured):
+            key ^= opponent_keys[self.kings >> square & 1][square]
+
+        # Move the piece and remove the captured pieces.
+        if self.turn == WHITE:
+            self.white ^= from_bit ^ to_bit
+            self.black &= ~captured
+        else:
+            self.black ^= from_bit ^ to_bit
+            self.white &= ~captured
+        self.kings &= ~captured
+
+        # Carry the crown along, or crown a piece reaching the far row.
+        if self.kings & from_bit:
+            self.kings ^= from_bit ^ to_bit
+        elif to_bit & CROWN_ROW[self.turn]:
+            self.kings |= to_bit
+
+        # Put the piece back into the key on its new square.
+        self.key = key ^ keys[self.kings >> end & 1][end]
+
+        # Switch turns.
+        self.turn = 1 - self.turn
+
+    def push(self, move):
+
+        start, end, captured = move
+        from_bit = 1 << start
+        to_bit = 1 << end
+
+        # Remember which captured pieces were crowned, whether this move
+        # crowns the piece and the key, so that pop() can put everything
+        # back. The turn simply switches back.
+        captured_kings = captured & self.kings
+        crowned = not self.kings & from_bit and to_bit & CROWN_ROW[self.turn] != 0
+        self.history.append((move, captured_kings, crowned, self.key))
+
+        self.apply_move(move)
+
+    def pop(self):
+
+        move, captured_kings, crowned, self.key = self.history.pop()
+        start, end, captured = move
+        from_bit = 1 << start
+        to_bit = 1 << end
+
+        # Switch turns back.
+        self.turn = 1 - self.turn
+
+        # Take the crown off again, or carry it back.
+        if crowned:
+            self.kings &= ~to_bit
+        elif self.kings & to_bit:
+            self.kings ^= from_bit ^ to_bit
+
+        # Move the piece back and return the captured pieces to the board.
+        if self.turn == WHITE:
+            self.white ^= from_bit ^ to_bit
+            self.black |= captured
+        else:
+            self.black ^= from_bit ^ to_bit
+            self.white |= captured
+        self.kings |= captured_kings
+
+        return move
+
+    def is_won(self):
+
+        # The player to move has lost if none of their pieces can move.
+        return not (self.get_movers(self.turn) or self.get_jumpers(self.turn))
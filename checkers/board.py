@@ -0,0 +1,155 @@
+# The board the game is played on.
+#
+# Board is a BitBoard that also keeps the state of a move in progress (the
+# piece picked up, the squares it can move to and the pieces captured so far)
+# and makes moves one step at a time, as a player clicks. Positions are the
+# [column, row] pairs used by the display, with row 0 at the top. Nothing here
+# draws, so the GUI, tools and services can all use the same board.
+
+from checkers.bitboard import BitBoard, WHITE, BLACK, squares, square_to_position, position_to_square
+from checkers.zobrist import PIECE_KEYS, TURN_KEY
+
+
+class Piece:
+
+    def __init__(self, colour, position, crowned=False):
+        self.colour = colour
+        self.position = position
+        self.crowned = crowned
+
+
+class Board(BitBoard):
+
+    def __init__(self, *args):
+
+        # The pieces themselves are stored as bit masks (see checkers.bitboard).
+        super().__init__(*args)
+
+        self.active_piece = None
+        self.active_piece_valid_moves = []
+
+        # Create a list to hold the pieces captured in that turn
+        self.captured_pieces = []
+
+    @property
+    def pieces(self):
+
+        # Build a Piece for every occupied square.
+        return [self.get_piece(square) for square in squares(self.white | self.black)]
+
+    @property
+    def no_of_white(self):
+        return self.white.bit_count()
+
+    @property
+    def no_of_black(self):
+        return self.black.bit_count()
+
+    def get_piece(self, square):
+        return Piece(self.get_colour_at(square), square_to_position(square),
+                     bool(self.kings & (1 << square)))
+
+    def check_piece_at(self, position):
+        
+        # Check if any piece is in that position.
+        square = position_to_square(position)
+        if square != None and (self.white | self.black) & (1 << square):
+            return self.get_piece(square)
+        # Else, return 'None'
+        else:
+            return None
+
+    def set_active(self, piece):
+
+        self.active_piece = piece
+        # Check the possible moves the active piece can make.
+        self.active_piece_valid_moves = self.get_valid_moves(piece)
+
+    def get_valid_moves(self, piece):
+
+        square = position_to_square(piece.position)
+
+        # First check for any possible captures.
+        jumps = self.get_piece_jumps(square)
+        if jumps != []:
+            return [square_to_position(land) for over, land in jumps]
+
+        # Now check for simple moves (if no jumps are possible).
+        return [square_to_position(target) for target in self.get_piece_steps(square)]
+
+    def make_move(self, piece, new_position):
+        
+        # Check if the move is a capture.
+        if abs(new_position[0] - piece.position[0]) == 2:
+            capture = True
+        else:
+            capture = False
+
+        # If the move is a capture...
+        if capture == True:
+            # ...check the piece to capture.
+            mid = [(new_position[0] + piece.position[0]) // 2,
+            (new_position[1] + piece.position[1]) // 2]
+            piece_to_capture = self.check_piece_at(mid)
+            # Capture the piece.
+            self.capture_piece(piece_to_capture)
+
+        # Move the piece to the new position.
+        start = position_to_square(piece.position)
+        end = position_to_square(new_position)
+        bits = (1 << start) | (1 << end)
+        if piece.colour == WHITE:
+            self.white ^= bits
+        else:
+            self.black ^= bits
+        if piece.crowned:
+            self.kings ^= bits
+        keys = PIECE_KEYS[piece.colour][piece.crowned]
+        self.key ^= keys[start] ^ keys[end]
+        piece.position = new_position
+
+    def capture_piece(self, piece):
+        
+        # Add the piece to the list of captured pieces.
+        self.captured_pieces.append(piece)
+        # Remove the piece from the board.
+        square = position_to_square(piece.position)
+        self.white &= ~(1 << square)
+        self.black &= ~(1 << square)
+        self.kings &= ~(1 << square)
+        self.key ^= PIECE_KEYS[piece.colour][piece.crowned][square]
+
+    def end_turn(self):
+
+        # Check for crowning.
+        if (self.active_piece.colour == WHITE 
+        and self.active_piece.position[1] == 0
+        and self.active_piece.crowned == False):
+            self.crown_piece(self.active_piece)
+        elif (self.active_piece.colour == BLACK 
+        and self.active_piece.position[1] == 7
+        and self.active_piece.crowned == False):
+            self.crown_piece(self.active_piece)
+        
+        # Reset the captured pieces.
+        self.captured_pieces.clear()
+
+        # Switch turns.
+        if self.turn == WHITE:
+            self.turn = BLACK
+        else:
+            self.turn = WHITE
+        self.key ^= TURN_KEY
+        
+        # Reset the active piece.
+        self.active_piece = None
+        # Reset the valid moves.
+        self.active_piece_valid_moves.clear()
+
+    def crown_piece(self, piece):
+
+        # Crown the piece.
+        square = position_to_square(piece.position)
+        self.key ^= PIECE_KEYS[piece.colour][False][square] ^ PIECE_KEYS[piece.colour][True][square]
+        piece.crowned = True
+        self.kings |= 1 << square
@@ -0,0 +1,183 @@
+# Opening books.
+#
+#   python -m checkers.book build --selfplay selfplay.jsonl --pdn games.pdn --output book.bin
+#   python -m checkers.book show book.bin
+#
+# A book lists, for positions early in the game, the moves that have been
+# played there and a weight for each. The AI plays a book move at random in
+# proportion to its weight instead of searching, so the opening costs no time
+# and games still vary.
+#
+# The book file is a header followed by fixed-size entries of (Zobrist key,
+# move, weight), sorted by key. OpeningBook maps the file into memory and
+# finds a position's entries by binary search, so a lookup reads only a few
+# entries however large the book is.
+#
+# Books are built from self-play records (see checkers.selfplay), binary game
+# records (see checkers.records) and PDN game collections. A move's weight is
+# the number of games in which it was played, not counting games lost by the
+# side that played it.
+
+import argparse
+import json
+import mmap
+import struct
+
+from checkers.bitboard import BitBoard, WHITE, BLACK
+from checkers.notation import read_pdn, format_move
+from checkers.records import read_games
+
+MAGIC = b'CKBOOK1\0'
+# The magic number and the number of entries.
+HEADER = struct.Struct('<8sQ')
+# The position's key, the move as (captured squares, start, end) and the
+# move's weight.
+ENTRY = struct.Struct('<QIBBH')
+
+MAX_WEIGHT = 0xFFFF
+# How many plies of each game go into the book by default.
+BOOK_PLIES = 16
+
+class OpeningBook:
+
+    def __init__(self, path):
+
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            self.data.close()
+            raise ValueError('Not an opening book: %r' % (path,))
+
+        self.probes = 0
+        self.hits = 0
+
+    def close(self):
+        self.data.close()
+
+    def get_entry(self, number):
+        return ENTRY.unpack_from(self.data, HEADER.size + number * ENTRY.size)
+
+    def get_moves(self, board):
+
+        # Return the (move, weight) pairs for a position.
+        self.probes += 1
+
+        # Find the first entry with the position's key.
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_entry(middle)[0] < board.key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        legal_moves = board.get_legal_moves()
+        while low < self.size:
+            key, captured, start, end, weight = self.get_entry(low)
+            if key != board.key:
+                break
+            # Two positions can share a key, so only legal moves are used.
+            if (start, end, captured) in legal_moves:
+                moves.append(((start, end, captured), weight))
+            low += 1
+
+        if moves != []:
+            self.hits += 1
+        return moves
+
+    def choose_move(self, board, rng):
+
+        # Pick one of the book moves at random by weight, or return None.
+        moves = self.get_moves(board)
+        if moves == []:
+            return None
+        return rng.choices([move for move, weight in moves],
+                           [weight for move, weight in moves])[0]
+
+
+def write_book(path, weights):
+
+    # weights maps (key, move) to a weight.
+    entries = sorted((key, move[2], move[0], move[1], min(weight, MAX_WEIGHT))
+                     for (key, move), weight in weights.items() if weight > 0)
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(entries)))
+        for entry in entries:
+            file.write(ENTRY.pack(*entry))
+    return len(entries)
+
+
+def add_game(weights, moves, plies, loser=None):
+
+    # Count the first moves of one game, skipping the loser's moves.
+    board = BitBoard()
+    for move in moves[:plies]:
+        if board.turn != loser:
+            weights[(board.key, move)] = weights.get((board.key, move), 0) + 1
+        board.apply_move(move)
+
+
+def read_selfplay(path):
+
+    # Yield the (moves, loser) of every game in a self-play record file.
+    with open(path) as file:
+        for line in file:
+            game = json.loads(line)
+            moves = [tuple(move['move']) for move in game['moves']]
+            loser = {'white': BLACK, 'black': WHITE}.get(game['winner'])
+            yield moves, loser
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Build and inspect opening books.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='build a book from self-play records and PDN files')
+    build.add_argument('--selfplay', nargs='*', default=[], help='self-play record files')
+    build.add_argument('--records', nargs='*', default=[], help='binary game record files')
+    build.add_argument('--pdn', nargs='*', default=[], help='PDN game collections')
+    build.add_argument('--plies', type=int, default=BOOK_PLIES, help='how many plies of each game to use')
+    build.add_argument('--min-weight', type=int, default=1, help='leave out moves with a lower weight')
+    build.add_argument('--output', default='book.bin')
+
+    show = commands.add_parser('show', help='list the book moves of the starting position')
+    show.add_argument('path')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        weights = {}
+        games = 0
+        for path in args.selfplay:
+            for moves, loser in read_selfplay(path):
+                add_game(weights, moves, args.plies, loser)
+                games += 1
+        for path in args.records:
+            for game in read_games(path):
+                # Only games from the usual starting position are used.
+                if game.get_start().key == BitBoard().key:
+                    add_game(weights, game.get_moves(args.plies), args.plies,
+                             {WHITE: BLACK, BLACK: WHITE}.get(game.result))
+                    games += 1
+        for path in args.pdn:
+            for start, moves in read_pdn(path):
+                if start.key == BitBoard().key:
+                    add_game(weights, moves, args.plies)
+                    games += 1
+        weights = {entry: weight for entry, weight in weights.items() if weight >= args.min_weight}
+        entries = write_book(args.output, weights)
+        print('%d games, %d entries, wrote %s' % (games, entries, args.output))
+
+    elif args.command == 'show':
+        book = OpeningBook(args.path)
+        print('%d entries' % book.size)
+        for move, weight in sorted(book.get_moves(BitBoard()), key=lambda item: -item[1]):
+            print('%-6s %6d' % (format_move(BitBoard(), move), weight))
+        book.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,531 @@
+# Endgame databases.
+#
+#   python -m checkers.egdb build --pieces 5 --output endgame.bin --workers 8
+#   python -m checkers.egdb info endgame.bin
+#
+# A database holds the exact result of every position with up to a given
+# number of pieces: a win or a loss for the side to move and how many moves
+# it takes (every move of both sides counts), or a draw.
+#
+# Positions are only stored with White to move. A position with Black to move
+# is the same as the one with the board turned around (square s becomes
+# square 31 - s) and the colours swapped. The positions are split into slices
+# by the number of men and kings each side has, and every position of a slice
+# has its own index (see get_index), so a slice is simply one byte per
+# position:
+#
+#   0       a draw (or an index no position has)
+#   d + 1   the side to move wins (d odd) or loses (d even) in d moves
+#
+# The database file has a header, a directory of the slices and then the
+# slices themselves. EndgameDatabase maps the file into memory and reads the
+# byte for a position straight out of the map, so opening a database is
+# instant and the operating system only loads the parts that are used.
+#
+# The slices are built by retrograde analysis, from the fewest pieces up. A
+# capture or a crowning always leads to a slice that is already finished, so
+# only quiet moves have to be followed backwards. A quiet move swaps which
+# side is to move, so each slice is built together with its mirror (the slice
+# with the two sides' pieces swapped). Slices that do not depend on each other
+# are built at the same time in separate processes. Each finished slice is
+# written to a file of its own in a work directory, so a long build can be
+# stopped and started again.
+#
+# Finished slices are read through memory maps, but a group being built is
+# held in memory whole: four bytes for each of its positions (the result, the
+# quiet moves left to settle and the longest loss among them), and four (or
+# eight in groups of more than 2^32 positions) for each position waiting in
+# Buckets to be settled. The largest group decides the memory a build needs:
+# about 1 GB for six pieces (232M positions) and 2 GB for four men against
+# four (419M). The largest groups of seven and eight pieces have 3 and 25
+# billion positions, and need at least 12 GB and 100 GB.
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from math import comb
+
+from checkers.bitboard import (BitBoard, WHITE, BLACK, SQUARES, squares,
+                               up_left, up_right, down_left, down_right)
+
+MAGIC = b'CKEGDB1\0'
+# The magic number, the largest number of pieces and the number of slices.
+HEADER = struct.Struct('<8sII')
+# The men and kings of the side to move and of the other side, then the
+# offset and size of the slice in the file.
+DIRECTORY_ENTRY = struct.Struct('<4BQQ')
+
+DRAW = 0
+# Longer distances are stored as the longest distance with the same result.
+MAX_DISTANCE = 254
+
+# Men of the side to move never stand on the top row (they would have been
+# crowned), and men of the other side never stand on the bottom row.
+MAN_SQUARES = SQUARES - 4
+
+# How many positions of a slice are looked at in one go while building.
+CHUNK_SIZE = 1 << 14
+
+# Marks an index that no position has, while building.
+INVALID = 255
+# Marks a position that cannot be lost, while building.
+CANNOT_LOSE = 0xFFFF
+
+
+def reverse(mask):
+
+    # Turn the board around: square s becomes square 31 - s.
+    return int('{:032b}'.format(mask)[::-1], 2)
+
+
+def normalize(board):
+
+    # Return the (side to move, other side, kings) masks of a position, as
+    # if White were to move.
+    if board.turn == WHITE:
+        return board.white, board.black, board.kings
+    return reverse(board.black), reverse(board.white), reverse(board.kings)
+
+
+def get_slice(mover, opponent, kings):
+
+    # Count the (men, kings) of the side to move and then the other side.
+    return ((mover & ~kings).bit_count(), (mover & kings).bit_count(),
+            (opponent & ~kings).bit_count(), (opponent & kings).bit_count())
+
+
+def get_mirror(slice):
+    return slice[2:] + slice[:2]
+
+
+def get_slice_size(slice):
+    men, kings, opponent_men, opponent_kings = slice
+    free = SQUARES - men - opponent_men
+    return (comb(MAN_SQUARES, men) * comb(MAN_SQUARES, opponent_men)
+            * comb(free, kings) * comb(free - kings, opponent_kings))
+
+
+def get_slices(max_pieces):
+
+    # Every slice in which both sides have a piece, grouped into levels. A
+    # level only depends on the levels before it, and each level is a list
+    # of groups: a slice and its mirror, which depend on each other.
+    levels = {}
+    for total in range(2, max_pieces + 1):
+        for pieces in range(1, total):
+            for men in range(pieces + 1):
+                for opponent_men in range(total - pieces + 1):
+                    slice = (men, pieces - men, opponent_men, total - pieces - opponent_men)
+                    group = tuple(sorted({slice, get_mirror(slice)}))
+                    level = levels.setdefault((total, men + opponent_men), [])
+                    if group not in level:
+                        level.append(group)
+    return [levels[key] for key in sorted(levels)]
+
+
+def rank(positions):
+
+    # The combinatorial number of a set of positions, given in ascending order.
+    return sum(comb(position, count) for count, position in enumerate(positions, 1))
+
+
+def unrank(number, count):
+
+    # The positions, in ascending order, of the set with this number.
+    positions = []
+    position = SQUARES
+    for count in range(count, 0, -1):
+        while comb(position, count) > number:
+            position -= 1
+        positions.append(position)
+        number -= comb(position, count)
+        position -= 1
+    positions.reverse()
+    return positions
+
+
+def get_index(slice, mover, opponent, kings):
+
+    men, crowned, opponent_men, opponent_crowned = slice
+    free = SQUARES - men - opponent_men
+
+    # Men are numbered among the squares they can stand on. Kings are
+    # numbered among the squares left empty by the pieces before them.
+    index = rank([square - 4 for square in squares(mover & ~kings)])
+    index = index * comb(MAN_SQUARES, opponent_men) + rank(list(squares(opponent & ~kings)))
+
+    occupied = (mover | opponent) & ~kings
+    index = index * comb(free, crowned) + rank(
+        [square - (occupied & ((1 << square) - 1)).bit_count() for square in squares(mover & kings)])
+
+    occupied |= mover & kings
+    index = index * comb(free - crowned, opponent_crowned) + rank(
+        [square - (occupied & ((1 << square) - 1)).bit_count() for square in squares(opponent & kings)])
+
+    return index
+
+
+def get_position(slice, index):
+
+    # The (side to move, other side, kings) masks of a position from its
+    # index, or None if no position has that index.
+    men, crowned, opponent_men, opponent_crowned = slice
+    free = SQUARES - men - opponent_men
+
+    index, opponent_king_number = divmod(index, comb(free - crowned, opponent_crowned))
+    index, king_number = divmod(index, comb(free, crowned))
+    men_number, opponent_men_number = divmod(index, comb(MAN_SQUARES, opponent_men))
+
+    mover = sum(1 << (position + 4) for position in unrank(men_number, men))
+    opponent = sum(1 << position for position in unrank(opponent_men_number, opponent_men))
+    # Both sides' men can be numbered onto the same square.
+    if mover & opponent:
+        return None
+
+    # The kings go on the squares the men left empty, the side to move's first.
+    kings = 0
+    for count, number, is_mover in ((crowned, king_number, True),
+                                    (opponent_crowned, opponent_king_number, False)):
+        empty = [square for square in range(SQUARES) if not (mover | opponent) >> square & 1]
+        placed = sum(1 << empty[position] for position in unrank(number, count))
+        if is_mover:
+            mover |= placed
+        else:
+            opponent |= placed
+        kings |= placed
+
+    return mover, opponent, kings
+
+
+def get_distance(value):
+
+    # How many moves a win or loss takes, and whether the side to move wins.
+    distance = value - 1
+    return distance, distance % 2 == 1
+
+
+def get_slice_path(work_dir, slice):
+    return os.path.join(work_dir, 'slice-%d-%d-%d-%d.bin' % slice)
+
+
+class EndgameDatabase:
+
+    def __init__(self, path=None):
+
+        # Each slice is found as (buffer, offset) in a memory map.
+        self.slices = {}
+        self.maps = []
+        self.max_pieces = 0
+        self.probes = 0
+        self.hits = 0
+        if path != None:
+            self.open(path)
+
+    def open(self, path):
+
+        with open(path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, max_pieces, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            data.close()
+            raise ValueError('Not an endgame database: %r' % (path,))
+
+        self.maps.append(data)
+        self.max_pieces = max(self.max_pieces, max_pieces)
+        for number in range(count):
+            entry = DIRECTORY_ENTRY.unpack_from(data, HEADER.size + number * DIRECTORY_ENTRY.size)
+            self.slices[entry[:4]] = (data, entry[4])
+
+    def add_slice(self, slice, path):
+
+        # Use a single slice written by the builder.
+        with open(path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.maps.append(data)
+        self.slices[slice] = (data, 0)
+        self.max_pieces = max(self.max_pieces, sum(slice))
+
+    def close(self):
+        for data in self.maps:
+            data.close()
+        self.maps = []
+        self.slices = {}
+
+    def get_value(self, slice, mover, opponent, kings):
+        data, offset = self.slices[slice]
+        return data[offset + get_index(slice, mover, opponent, kings)]
+
+    def probe(self, board):
+
+        # Return the stored value of a position, or None if the database
+        # does not have it.
+        self.probes += 1
+        pieces = board.white | board.black
+        if pieces.bit_count() > self.max_pieces or not board.white or not board.black:
+            return None
+        mover, opponent, kings = normalize(board)
+        slice = get_slice(mover, opponent, kings)
+        if slice not in self.slices:
+            return None
+        self.hits += 1
+        return self.get_value(slice, mover, opponent, kings)
+
+
+def get_predecessors(mover, opponent, kings):
+
+    # Yield the positions (Black to move) from which Black's quiet moves
+    # lead to this one (White to move). Black's pieces are stepped back the
+    # way they came, and Black must have had no capture to make instead.
+    empty = ~(mover | opponent) & 0xFFFFFFFF
+    for square in squares(opponent):
+        bit = 1 << square
+        crowned = kings & bit
+        sources = up_left(bit) | up_right(bit)
+        if crowned:
+            sources |= down_left(bit) | down_right(bit)
+        for source in squares(sources & empty):
+            moved = bit | (1 << source)
+            board = BitBoard(mover, opponent ^ moved, kings ^ moved if crowned else kings, BLACK)
+            if not board.get_jumpers(BLACK):
+                yield board
+
+
+class Buckets:
+
+    # The positions waiting to be settled, by the distance at which they
+    # will be. Position numbers are kept in arrays rather than lists, which
+    # would take an int object and a pointer (about 40 bytes) for each.
+
+    def __init__(self, total):
+        self.typecode = 'I' if total <= 1 << 32 else 'Q'
+        self.arrays = {}
+
+    def add(self, distance, number):
+        if distance not in self.arrays:
+            self.arrays[distance] = array(self.typecode)
+        self.arrays[distance].append(number)
+
+    def pop(self, distance):
+        return self.arrays.pop(distance, ())
+
+    def get_max_distance(self):
+        return max(self.arrays, default=-1)
+
+
+def scan(database, slice, start, stop, remaining, longest, buckets, base):
+
+    # Look at the moves of the positions start to stop of a slice. Moves to
+    # other slices are settled from the database. Positions whose result
+    # they settle go into buckets by distance, and the quiet moves still to
+    # be settled are counted.
+    for index in range(start, stop):
+        number = base + index
+        position = get_position(slice, index)
+        if position == None:
+            remaining[number] = INVALID
+            continue
+
+        mover, opponent, kings = position
+        board = BitBoard(mover, opponent, kings, WHITE)
+        moves = board.get_legal_moves()
+        quiet = 0
+        win = None
+        loss = 0
+        for move in moves:
+            board.push(move)
+            if not move[2] and board.kings.bit_count() == kings.bit_count():
+                quiet += 1
+            else:
+                # A side left without pieces has lost.
+                value = 1 if not board.black else database.probe(board)
+                if value == DRAW:
+                    loss = CANNOT_LOSE
+                else:
+                    distance, wins = get_distance(value)
+                    if not wins:
+                        win = distance + 1 if win == None else min(win, distance + 1)
+                    elif loss != CANNOT_LOSE:
+                        loss = max(loss, distance + 1)
+            board.pop()
+
+        remaining[number] = quiet
+        if win != None:
+            # A position with a move to a lost position cannot be lost.
+            longest[number] = CANNOT_LOSE
+            buckets.add(win, number)
+        else:
+            longest[number] = loss
+            if quiet == 0 and loss != CANNOT_LOSE:
+                buckets.add(loss, number)
+
+
+def build_group(work_dir, group):
+
+    # Build a slice and its mirror, unless an earlier run already has.
+    paths = [get_slice_path(work_dir, slice) for slice in group]
+    if all(os.path.exists(path) for path in paths):
+        return group
+
+    # Finished slices are read from the work directory.
+    database = EndgameDatabase()
+    for name in os.listdir(work_dir):
+        if name.startswith('slice-') and name.endswith('.bin'):
+            slice = tuple(int(count) for count in name[6:-4].split('-'))
+            database.add_slice(slice, os.path.join(work_dir, name))
+
+    # Number the positions of both slices one after the other.
+    bases = {}
+    total = 0
+    for slice in group:
+        bases[slice] = total
+        total += get_slice_size(slice)
+
+    values = bytearray(total)
+    remaining = bytearray(total)
+    longest = array('H', bytes(2 * total))
+    buckets = Buckets(total)
+
+    for slice in group:
+        size = get_slice_size(slice)
+        for start in range(0, size, CHUNK_SIZE):
+            scan(database, slice, start, min(start + CHUNK_SIZE, size),
+                 remaining, longest, buckets, bases[slice])
+    database.close()
+
+    # Settle the positions from the shortest distance up. A position lost
+    # in d moves makes the positions before it won in d + 1, and a position
+    # whose moves are all won for the other side is lost in one more than
+    # the longest of them.
+    distance = 0
+    while distance <= buckets.get_max_distance():
+        for number in buckets.pop(distance):
+            if values[number]:
+                continue
+            values[number] = min(distance, MAX_DISTANCE - distance % 2) + 1
+
+            slice = group[0] if len(group) == 1 or number < bases[group[1]] else group[1]
+            position = get_position(slice, number - bases[slice])
+            for board in get_predecessors(*position):
+                mover, opponent, kings = normalize(board)
+                previous = get_slice(mover, opponent, kings)
+                before = bases[previous] + get_index(previous, mover, opponent, kings)
+                if values[before]:
+                    continue
+                if distance % 2 == 0:
+                    buckets.add(distance + 1, before)
+                else:
+                    remaining[before] -= 1
+                    if longest[before] != CANNOT_LOSE:
+                        longest[before] = max(longest[before], distance + 1)
+                        if remaining[before] == 0:
+                            buckets.add(longest[before], before)
+        distance += 1
+
+    # Write each slice out whole, so that a slice file is always complete.
+    for slice, path in zip(group, paths):
+        start = bases[slice]
+        with open(path + '.tmp', 'wb') as file:
+            file.write(values[start:start + get_slice_size(slice)])
+        os.replace(path + '.tmp', path)
+
+    return group
+
+
+def write_database(path, max_pieces, work_dir):
+
+    # Join the slice files into one database file.
+    slices = [slice for level in get_slices(max_pieces) for group in level for slice in group]
+    offset = HEADER.size + DIRECTORY_ENTRY.size * len(slices)
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, max_pieces, len(slices)))
+        for slice in slices:
+            size = get_slice_size(slice)
+            file.write(DIRECTORY_ENTRY.pack(*slice, offset, size))
+            offset += size
+        for slice in slices:
+            with open(get_slice_path(work_dir, slice), 'rb') as slice_file:
+                while True:
+                    data = slice_file.read(1 << 20)
+                    if not data:
+                        break
+                    file.write(data)
+
+
+def build(max_pieces, path, workers=None, work_dir=None, report=None):
+
+    work_dir = work_dir or path + '.work'
+    os.makedirs(work_dir, exist_ok=True)
+
+    levels = get_slices(max_pieces)
+    if workers == 1:
+        for level in levels:
+            for group in level:
+                build_group(work_dir, group)
+                if report != None:
+                    report(group)
+    else:
+        # The groups of a level only depend on earlier levels.
+        with ProcessPoolExecutor(workers) as executor:
+            for level in levels:
+                for group in executor.map(build_group, repeat(work_dir), level):
+                    if report != None:
+                        report(group)
+
+    write_database(path, max_pieces, work_dir)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Build and inspect endgame databases.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_command = commands.add_parser('build', help='build a database by retrograde analysis')
+    build_command.add_argument('--pieces', type=int, default=4)
+    build_command.add_argument('--output', default='endgame.bin')
+    build_command.add_argument('--workers', type=int, default=os.cpu_count())
+    build_command.add_argument('--work-dir', help='where to keep finished slices (default OUTPUT.work)')
+
+    info = commands.add_parser('info', help='count the results in each slice of a database')
+    info.add_argument('path')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+
+        def report(group):
+            print('%-22s %12d positions %8.1fs' % (
+                ' '.join('%d%d-%d%d' % slice for slice in group),
+                sum(get_slice_size(slice) for slice in group),
+                time.perf_counter() - start), file=sys.stderr)
+
+        build(args.pieces, args.output, args.workers, args.work_dir, report)
+        print('wrote %s (%d bytes)' % (args.output, os.path.getsize(args.output)))
+
+    elif args.command == 'info':
+        database = EndgameDatabase(args.path)
+        print('slice        positions       wins     losses      draws  longest')
+        for slice, (data, offset) in database.slices.items():
+            counts = [0, 0, 0]
+            longest = 0
+            for index in range(get_slice_size(slice)):
+                value = data[offset + index]
+                if value == DRAW:
+                    if get_position(slice, index) != None:
+                        counts[2] += 1
+                    continue
+                distance, wins = get_distance(value)
+                counts[0 if wins else 1] += 1
+                longest = max(longest, distance)
+            print('%d%d-%d%d  %12d %10d %10d %10d %8d' % (slice + (sum(counts),) + tuple(counts) + (longest,)))
+        database.close()
+
+
+if __name__ == '__main__':
+    main()
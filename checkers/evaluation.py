@@ -0,0 +1,223 @@
+# Evaluation features and weights.
+#
+# A position is judged by a weighted sum of features, each counted for the
+# AI's pieces less the opponent's:
+#
+#   men          uncrowned pieces
+#   kings        crowned pieces
+#   advancement  rows the men have moved up the board
+#   back_rank    men still on the side's own back row, which stops the
+#                opponent from crowning there
+#   centre       pieces on the eight middle squares
+#   mobility     non-capturing moves the side could make
+#   won          1 if the opponent is to move and cannot, -1 if the AI is
+#
+# The features are computed with the shifts of checkers.bitboard, so the same
+# code scores one position (with Python integers) or many at once (with NumPy
+# arrays of masks, one element per position). The search collects the leaves
+# below a position and evaluates them in one call (see AI.evaluate_frontier).
+#
+# Weights fitted by checkers.tuning are read from its JSON files with
+# load_weights().
+#
+# NumPy is only needed for batches. It is imported by the first batch, so
+# engines that never evaluate one start as quickly as before and do not need
+# it installed.
+
+import json
+
+from checkers.bitboard import WHITE, FORWARD_STEPS, TOP_ROW, BOTTOM_ROW
+
+FEATURES = ('men', 'kings', 'advancement', 'back_rank', 'centre', 'mobility', 'won')
+
+# The weights the AI has always used: a man is worth one point, a king two and
+# a win twenty.
+DEFAULT_WEIGHTS = {'men': 1, 'kings': 2, 'won': 20}
+
+# Squares 9, 10, 13, 14, 17, 18, 21 and 22.
+CENTRE = 0x00666600
+
+# For each side, the squares where its men have moved up at least 1, 2, ... 6
+# rows. A man on a square counts once for every mask that holds the square.
+# White moves up the board (towards row 0) and Black down it.
+ADVANCEMENT_MASKS = (
+    tuple(sum(0xF << (4 * y) for y in range(8 - rows)) for rows in range(1, 7)),
+    tuple(sum(0xF << (4 * y) for y in range(rows, 8)) for rows in range(1, 7)),
+)
+# The row each side starts from.
+BACK_ROW = (BOTTOM_ROW, TOP_ROW)
+
+# Filled in by get_numpy().
+numpy = None
+
+# The lookup tables of every set of weights used so far (see Evaluator), so
+# that engines with the same weights share them.
+_tables = {}
+
+
+def get_numpy():
+
+    global numpy
+    if numpy == None:
+        import numpy
+    return numpy
+
+
+def load_weights(path):
+
+    # Read the weights from a file made by checkers.tuning.
+    with open(path) as file:
+        return json.load(file)['weights']
+
+
+def get_mobility(pieces, other, kings, colour, count):
+
+    # Return the number of non-capturing moves a side has, and a mask that
+    # is not zero if it has a capture. count() counts the set bits of a mask.
+    empty = ~(pieces | other) & 0xFFFFFFFF
+    mobility = 0
+    can_capture = 0
+    # Men step forward only, kings both ways.
+    for steps, movers in ((FORWARD_STEPS[colour], pieces), (FORWARD_STEPS[1 - colour], pieces & kings)):
+        for step, opposite in steps:
+            mobility = mobility + count(step(movers) & empty)
+            can_capture = can_capture | (step(step(movers) & other) & empty)
+    return mobility, can_capture
+
+
+def get_side_features(pieces, other, kings, colour, count):
+
+    # Return (men, kings, advancement, back rank, centre, mobility, can
+    # capture) for one side.
+    men = pieces & ~kings
+    advancement = 0
+    for mask in ADVANCEMENT_MASKS[colour]:
+        advancement = advancement + count(men & mask)
+
+    return (count(men), count(pieces & kings), advancement, count(men & BACK_ROW[colour]),
+            count(pieces & CENTRE)) + get_mobility(pieces, other, kings, colour, count)
+
+
+def get_features(white, black, kings, turn, colour, count):
+
+    # Return the features of FEATURES, from colour's point of view. The masks
+    # and turn are Python integers for one position or NumPy arrays for many.
+    friendly, opponent = (white, black) if colour == WHITE else (black, white)
+    ours = get_side_features(friendly, opponent, kings, colour, count)
+    theirs = get_side_features(opponent, friendly, kings, 1 - colour, count)
+
+    # The side to move has lost if it can neither step nor capture.
+    our_turn = turn == colour
+    if isinstance(our_turn, bool):
+        mover = ours if our_turn else theirs
+        won = (-1 if our_turn else 1) if mover[5] == 0 and mover[6] == 0 else 0
+    else:
+        mobility = numpy.where(our_turn, ours[5], theirs[5])
+        can_capture = numpy.where(our_turn, ours[6], theirs[6])
+        won = numpy.where((mobility == 0) & (can_capture == 0), numpy.where(our_turn, -1, 1), 0)
+
+    return [ours[index] - theirs[index] for index in range(6)] + [won]
+
+
+def count_bits(mask):
+    return mask.bit_count()
+
+
+def count_array_bits(masks):
+    # bitwise_count() gives small unsigned counts, which cannot be negated.
+    return numpy.bitwise_count(masks).astype(numpy.int64)
+
+
+class Evaluator:
+
+    def __init__(self, weights=None):
+
+        # weights maps feature names to weights. Features left out weigh
+        # nothing.
+        if weights == None:
+            weights = DEFAULT_WEIGHTS
+        for name in weights:
+            if name not in FEATURES:
+                raise ValueError('Unknown evaluation feature: %r' % (name,))
+        self.weights = [weights.get(name, 0) for name in FEATURES]
+        self.mobility_weight = weights.get('mobility', 0)
+        self.won_weight = weights.get('won', 0)
+        # Values are rounded to whole numbers, which the search relies on.
+        self.whole = all(isinstance(weight, int) for weight in self.weights)
+
+        # Every feature but mobility and won adds up something for each
+        # piece, so their weighted sum can be looked up a byte of a mask at a
+        # time. tables[colour][kind][byte] lists the value of every set of
+        # pieces on that byte's eight squares, for colour's men, colour's
+        # kings, the opponent's men and the opponent's kings.
+        key = tuple(self.weights[:5])
+        if key not in _tables:
+            tables = []
+            for colour in (WHITE, 1 - WHITE):
+                kinds = []
+                for side, crowned, sign in ((colour, False, 1), (colour, True, 1),
+                                            (1 - colour, False, -1), (1 - colour, True, -1)):
+                    squares = [sign * self.get_linear_value(1 << square, crowned, side)
+                               for square in range(32)]
+                    kinds.append([self.get_byte_table(squares[8 * byte:8 * byte + 8]) for byte in range(4)])
+                tables.append(kinds)
+            _tables[key] = tables
+        self.tables = _tables[key]
+
+    def get_linear_value(self, pieces, crowned, colour):
+
+        # The weighted sum of the features that add up piece by piece, for
+        # one side's pieces.
+        features = get_side_features(pieces, 0, pieces if crowned else 0, colour, count_bits)
+        return sum(weight * feature for weight, feature in zip(self.weights[:5], features))
+
+    def get_byte_table(self, squares):
+
+        # The value of each of the 256 sets of pieces on eight squares, given
+        # the value of a piece on each square. Each set is a smaller set plus
+        # its lowest square.
+        table = [0] * 256
+        for pieces in range(1, 256):
+            lowest = pieces & -pieces
+            table[pieces] = table[pieces ^ lowest] + squares[lowest.bit_length() - 1]
+        return table
+
+    def evaluate(self, board_state, colour):
+
+        # The value of one position from colour's point of view.
+        friendly, opponent = board_state.get_sides(colour)
+        kings = board_state.kings
+        value = 0
+        for table, pieces in zip(self.tables[colour], (friendly & ~kings, friendly & kings,
+                                                       opponent & ~kings, opponent & kings)):
+            if pieces:
+                value += (table[0][pieces & 255] + table[1][(pieces >> 8) & 255]
+                          + table[2][(pieces >> 16) & 255] + table[3][pieces >> 24])
+
+        if self.mobility_weight:
+            ours = get_mobility(friendly, opponent, kings, colour, count_bits)
+            theirs = get_mobility(opponent, friendly, kings, 1 - colour, count_bits)
+            value += self.mobility_weight * (ours[0] - theirs[0])
+
+        # The side to move has lost if it can neither step nor capture.
+        if self.won_weight and board_state.is_won():
+            value += self.won_weight if board_state.turn != colour else -self.won_weight
+
+        return value if self.whole else round(value)
+
+    def get_batch_features(self, positions, colour):
+
+        # Return an array with a row of features for every position, given as
+        # (white, black, kings, turn) tuples.
+        numpy = get_numpy()
+        masks = numpy.array(positions, dtype=numpy.int64).reshape(-1, 4)
+        features = get_features(masks[:, 0], masks[:, 1], masks[:, 2], masks[:, 3], colour,
+                                count_array_bits)
+        return numpy.stack(features, axis=1)
+
+    def evaluate_batch(self, positions, colour):
+
+        # The values of many positions from colour's point of view, as a list.
+        numpy = get_numpy()
+        values = self.get_batch_features(positions, colour) @ numpy.array(self.weights)
+        return numpy.rint(values).astype(numpy.int64).tolist()
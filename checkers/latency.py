@@ -0,0 +1,110 @@
+# Import-to-first-move latency.
+#
+#   python -m checkers.latency --runs 5
+#   python -m checkers.latency --gui --dummy-display --output latency.jsonl
+#
+# Each run starts a new Python process and times, from the moment the process
+# was started, how long it takes to import the engine (or the GUI) and to
+# play the first move from the starting position. The headless path is what
+# tools and services see, and the GUI path also sets up pygame and draws the
+# first frame. The median of each phase over the runs is printed and can be
+# appended to a JSON lines file to follow it from release to release.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# The directory holding the checkers package and main.py.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The code run in each new process. It prints the times (from time.time())
+# at which each phase ended.
+HEADLESS = '''
+import time
+started = time.time()
+from checkers.ai import AI
+from checkers.board import Board
+imported = time.time()
+board = Board()
+AI(board, board.turn, %(depth)d).play()
+print(started, imported, imported, time.time())
+'''
+
+GUI = '''
+import time
+started = time.time()
+import main
+imported = time.time()
+main.setup()
+main.refresh_display()
+drawn = time.time()
+main.ai.colour = main.b.turn
+main.ai.difficulty = %(depth)d
+main.b.apply_move(main.ai.choose_move())
+main.refresh_display()
+print(started, imported, drawn, time.time())
+'''
+
+PHASES = ('startup', 'import', 'first frame', 'first move', 'total')
+
+
+def measure(code, environment):
+
+    # Return the length in seconds of each phase of one run.
+    launched = time.time()
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=environment,
+                            capture_output=True, text=True, check=True).stdout
+    started, imported, drawn, moved = map(float, output.split()[-4:])
+    return {
+        'startup': started - launched,
+        'import': imported - started,
+        'first frame': drawn - imported,
+        'first move': moved - drawn,
+        'total': moved - launched,
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Time from starting Python to the first move.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--depth', type=int, default=2, help='the AI difficulty for the first move')
+    parser.add_argument('--gui', action='store_true', help='also time the GUI (needs pygame)')
+    parser.add_argument('--dummy-display', action='store_true',
+                        help='let the GUI run without a screen or sound card')
+    parser.add_argument('--output', help='append the results to this JSON lines file')
+    args = parser.parse_args()
+
+    environment = dict(os.environ)
+    if args.dummy_display:
+        environment['SDL_VIDEODRIVER'] = 'dummy'
+        environment['SDL_AUDIODRIVER'] = 'dummy'
+
+    paths = [('headless', HEADLESS)]
+    if args.gui:
+        paths.append(('gui', GUI))
+
+    print('%-9s' % 'path' + ''.join('%13s' % phase for phase in PHASES))
+    for name, code in paths:
+        runs = [measure(code % {'depth': args.depth}, environment) for run in range(args.runs)]
+        medians = {phase: statistics.median(run[phase] for run in runs) for phase in PHASES}
+        print('%-9s' % name + ''.join('%11.1fms' % (medians[phase] * 1000) for phase in PHASES))
+
+        if args.output != None:
+            with open(args.output, 'a') as output:
+                output.write(json.dumps({
+                    'path': name,
+                    'runs': args.runs,
+                    'depth': args.depth,
+                    'python': sys.version.split()[0],
+                    'time': round(time.time()),
+                    'ms': {phase: round(medians[phase] * 1000, 3) for phase in PHASES},
+                }) + '\n')
+
+
+if __name__ == '__main__':
+    main()
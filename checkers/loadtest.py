@@ -0,0 +1,173 @@
+# Load test for the analysis server.
+#
+#   python -m checkers.loadtest --start-server --workers 4 --clients 16 --requests 2000
+#   python -m checkers.loadtest --port 8765 --mix best_move=1 --depth 6 --output load.jsonl
+#
+# Each client opens its own connection and sends requests one after another,
+# each for a position from checkers.bench, with the methods mixed in the
+# proportions given. Best-move requests name the client's game, so each
+# client's searches share a transposition table. The latency of every request
+# is measured from sending it to reading its answer, and the median, 90th and
+# 99th percentiles are printed for each method.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+from checkers.bench import get_positions
+from checkers.notation import write_fen
+from checkers.server import PORT
+
+# The directory holding the checkers package.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PERCENTILES = (50, 90, 99)
+# How long a started server has to stop at the end of the test.
+SERVER_STOP_SECONDS = 30
+
+
+def parse_mix(text):
+
+    # Turn 'best_move=1,evaluate=4' into a list of (method, weight) pairs.
+    mix = []
+    for item in text.split(','):
+        method, weight = item.split('=')
+        mix.append((method, float(weight)))
+    return mix
+
+
+def get_percentile(values, percentile):
+
+    # The nearest-rank percentile of a sorted list.
+    return values[min(len(values) - 1, max(0, round(percentile / 100 * len(values)) - 1))]
+
+
+async def run_client(number, host, port, requests, mix, fens, args, latencies, errors):
+
+    reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random(number)
+    methods = [method for method, weight in mix]
+    weights = [weight for method, weight in mix]
+
+    for request_id in range(requests):
+        method = rng.choices(methods, weights)[0]
+        request = {'id': request_id, 'method': method, 'fen': rng.choice(fens)}
+        if method == 'best_move':
+            request['game'] = 'client-%d' % number
+            request['timeout'] = args.timeout
+            if args.time != None:
+                request['time'] = args.time
+            else:
+                request['depth'] = args.depth
+
+        start = time.perf_counter()
+        writer.write((json.dumps(request) + '\n').encode())
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies[method].append(time.perf_counter() - start)
+        if 'error' in response:
+            errors[method] = errors.get(method, 0) + 1
+
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(args):
+
+    mix = parse_mix(args.mix)
+    fens = [write_fen(board) for board in get_positions(args.positions)]
+    latencies = {method: [] for method, weight in mix}
+    errors = {}
+
+    # Share the requests out between the clients.
+    counts = [args.requests // args.clients + (client < args.requests % args.clients)
+              for client in range(args.clients)]
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(client, args.host, args.port, counts[client], mix, fens,
+                                      args, latencies, errors)
+                           for client in range(args.clients)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Measure the latency of the analysis server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--start-server', action='store_true', help='start a server for the test')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='workers of the started server')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=1000, help='requests in all')
+    parser.add_argument('--mix', default='best_move=1,evaluate=4,legal_moves=1',
+                        help='methods and their proportions')
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--time', type=int, help='search with this budget in ms instead of a depth')
+    parser.add_argument('--timeout', type=int, default=10000)
+    parser.add_argument('--positions', type=int, default=50)
+    parser.add_argument('--output', help='append the results to this JSON lines file')
+    args = parser.parse_args()
+
+    server = None
+    if args.start_server:
+        server = subprocess.Popen([sys.executable, '-m', 'checkers.server', '--host', args.host,
+                                   '--port', str(args.port), '--workers', str(args.workers)],
+                                  cwd=ROOT, stdout=subprocess.PIPE, text=True)
+        # Wait until it is listening.
+        server.stdout.readline()
+
+    try:
+        latencies, errors, elapsed = asyncio.run(run(args))
+    finally:
+        # Let the server shut its workers down, and only kill it if it does
+        # not.
+        if server != None:
+            server.send_signal(signal.SIGINT)
+            try:
+                server.wait(SERVER_STOP_SECONDS)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+    total = sum(len(values) for values in latencies.values())
+    print('%d requests from %d clients in %.2fs (%.0f per second)'
+          % (total, args.clients, elapsed, total / elapsed))
+    print('%-12s %8s' % ('method', 'requests') + ''.join('%9s' % ('p%d' % percentile)
+                                                         for percentile in PERCENTILES)
+          + '%9s %7s' % ('mean', 'errors'))
+    results = {}
+    for method, values in latencies.items():
+        if values == []:
+            continue
+        values.sort()
+        results[method] = {'requests': len(values), 'errors': errors.get(method, 0),
+                           'mean': statistics.mean(values) * 1000}
+        for percentile in PERCENTILES:
+            results[method]['p%d' % percentile] = get_percentile(values, percentile) * 1000
+        print('%-12s %8d' % (method, len(values))
+              + ''.join('%7.1fms' % results[method]['p%d' % percentile] for percentile in PERCENTILES)
+              + '%7.1fms %7d' % (results[method]['mean'], results[method]['errors']))
+
+    if args.output != None:
+        with open(args.output, 'a') as output:
+            output.write(json.dumps({
+                'clients': args.clients,
+                'mix': args.mix,
+                'depth': args.depth,
+                'time_budget': args.time,
+                'seconds': round(elapsed, 3),
+                'time': round(time.time()),
+                'ms': {method: {name: round(value, 3) if isinstance(value, float) else value
+                                for name, value in result.items()}
+                       for method, result in results.items()},
+            }) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,376 @@
+# A Monte Carlo tree search AI.
+#
+# MCTSAI plays like AI (choose_move() and play() take the same time budget)
+# but, instead of searching every move to a depth, it grows a tree one
+# position at a time. Each round picks a path down the tree by the UCT rule,
+# adds the moves of the position at its end, and plays one of them out with
+# random moves. The result of the playout is added to every position on the
+# path. The move played is the one whose position was visited most.
+#
+# Playouts stop after PLAYOUT_PLIES random moves and are then scored by
+# material, since longer random games say little more. They play on one
+# scratch board without keeping any history.
+#
+# The tree is kept as columns of numbers (see Tree) rather than as node
+# objects. After the AI moves the tree is kept, and if the opponent replies
+# with a move that is in it, the next search starts from what is already
+# known about the new position.
+#
+# With more than one worker, each worker process grows a tree of its own from
+# the same position and the visits of the root moves are added up.
+
+import math
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from checkers.bitboard import BitBoard, WHITE, BLACK
+
+# How many playouts a search makes when it has no time budget.
+PLAYOUTS = 2000
+# How much UCT favours trying moves that have been visited less.
+EXPLORATION = 1.4
+# How many random moves a playout makes before it is scored.
+PLAYOUT_PLIES = 32
+# The tree is started again when it has this many nodes.
+MAX_TREE_NODES = 1 << 21
+# How many playouts to make between checks of the clock.
+CLOCK_CHECK_INTERVAL = 16
+
+# Set up in each worker process by init_worker().
+_worker_ai = None
+
+
+class Tree:
+
+    def __init__(self):
+
+        # Node n is the position after move n (start, end, captured) from its
+        # parent. Its children are the nodes first_child[n] to first_child[n]
+        # + child_count[n] - 1, and first_child[n] is -1 until they are added.
+        # wins[n] adds up the results of the playouts through the node for
+        # the player who made its move: 1 for a win, 0.5 for a draw.
+        self.parent = array('i')
+        self.first_child = array('i')
+        self.child_count = array('H')
+        self.start = array('B')
+        self.end = array('B')
+        self.captured = array('I')
+        self.visits = array('I')
+        self.wins = array('d')
+        self.add(-1, (0, 0, 0))
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self, parent, move):
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.child_count.append(0)
+        self.start.append(move[0])
+        self.end.append(move[1])
+        self.captured.append(move[2])
+        self.visits.append(0)
+        self.wins.append(0.0)
+
+    def get_move(self, node):
+        return (self.start[node], self.end[node], self.captured[node])
+
+    def expand(self, node, moves):
+        self.first_child[node] = len(self.parent)
+        self.child_count[node] = len(moves)
+        for move in moves:
+            self.add(node, move)
+
+    def get_children(self, node):
+        return range(self.first_child[node], self.first_child[node] + self.child_count[node])
+
+    def get_most_visited(self, node):
+        return max(self.get_children(node), key=lambda child: self.visits[child])
+
+
+def playout(board, rng):
+
+    # Play random moves on board until the game ends or PLAYOUT_PLIES have
+    # been made. Return the winning colour, or None for a draw.
+    for ply in range(PLAYOUT_PLIES):
+        moves = board.get_legal_moves()
+        if not moves:
+            return 1 - board.turn
+        board.apply_move(moves[rng.randrange(len(moves))])
+
+    # Score the position by material, a king counting as two men.
+    white = board.white.bit_count() + (board.white & board.kings).bit_count()
+    black = board.black.bit_count() + (board.black & board.kings).bit_count()
+    if white == black:
+        return None
+    return WHITE if white > black else BLACK
+
+
+def init_worker(playouts):
+
+    global _worker_ai
+    _worker_ai = MCTSAI(None, None, playouts, seed=os.getpid())
+
+
+def search_worker(state, time_budget_ms, playouts):
+
+    # Grow the worker's tree from a position and return the (move, visits,
+    # wins) of each root move, with the statistics of the search.
+    ai = _worker_ai
+    ai.board = BitBoard(*state)
+    ai.colour = ai.board.turn
+    ai.playouts = playouts
+    ai.search(time_budget_ms)
+    tree = ai.tree
+    return [(tree.get_move(child), tree.visits[child], tree.wins[child])
+            for child in tree.get_children(ai.root)], ai.nodes, len(tree), ai.reused
+
+
+class MCTSAI:
+
+    def __init__(self, board, colour, playouts=PLAYOUTS, exploration=EXPLORATION, workers=1, seed=None):
+        self.board = board
+        self.colour = colour
+        self.playouts = playouts
+        self.exploration = exploration
+        self.random = random.Random(seed)
+
+        # The tree, the node of the current position, and the position it
+        # was for (to find the position after the opponent's reply).
+        self.tree = Tree()
+        self.root = 0
+        self.root_state = None
+
+        # Root parallel search over worker processes, started on first use.
+        self.workers = workers
+        self.pool = None
+
+        # The same statistics as AI: playouts made by the last search, the
+        # length of the line it expects, and whether the tree was reused.
+        self.nodes = 0
+        self.depth_reached = 0
+        self.principal_variation = []
+        self.reused = False
+        self.tree_nodes = 0
+        self.stats = None
+        self.deadline = None
+        self.move_deadline = None
+        self.stopped = False
+
+    def close(self):
+        if self.pool != None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def find_root(self):
+
+        # Return the node of the board's position if the tree has it: the
+        # root itself, or a position two moves (the AI's and the reply) or
+        # one move below it. Otherwise start a new tree.
+        board = self.board
+        state = (board.white, board.black, board.kings, board.turn)
+        tree = self.tree
+        if self.root_state != None and len(tree) < MAX_TREE_NODES:
+            if state == self.root_state:
+                return self.root
+            root_board = BitBoard(*self.root_state)
+            for child in tree.get_children(self.root):
+                root_board.push(tree.get_move(child))
+                if (root_board.white, root_board.black, root_board.kings, root_board.turn) == state:
+                    return child
+                for grandchild in tree.get_children(child):
+                    root_board.push(tree.get_move(grandchild))
+                    found = (root_board.white, root_board.black, root_board.kings, root_board.turn) == state
+                    root_board.pop()
+                    if found:
+                        return grandchild
+                root_board.pop()
+
+        self.tree = Tree()
+        return 0
+
+    def search(self, time_budget_ms=None, ponder=False):
+
+        # Grow the tree from the board's position, for the time budget or
+        # for the number of playouts. A stop() only ends the search it
+        # interrupts.
+        self.stopped = False
+        self.root = self.find_root()
+        self.reused = self.tree.visits[self.root] > 0
+        self.root_state = (self.board.white, self.board.black, self.board.kings, self.board.turn)
+        tree = self.tree
+        root = self.root
+        # Moves above the root no longer count.
+        tree.parent[root] = -1
+
+        if time_budget_ms != None and not ponder:
+            self.move_deadline = time.perf_counter() + time_budget_ms / 1000
+        else:
+            self.move_deadline = None
+
+        board = self.board
+        history_length = len(board.history)
+        scratch = BitBoard()
+        rng = self.random
+        exploration = self.exploration
+        self.nodes = 0
+
+        while True:
+            # Stop when the playouts or the time run out, or when stopped. A
+            # pondering search has no limit until start_clock() is called.
+            if self.move_deadline == None and not ponder and self.nodes >= self.playouts:
+                break
+            if self.nodes % CLOCK_CHECK_INTERVAL == 0:
+                if self.stopped:
+                    break
+                if self.move_deadline != None and time.perf_counter() >= self.move_deadline:
+                    break
+            self.nodes += 1
+
+            # Go down the tree, taking the child with the best UCT score.
+            node = root
+            while tree.child_count[node]:
+                log_visits = math.log(tree.visits[node] + 1)
+                best_score = -1.0
+                for child in tree.get_children(node):
+                    visits = tree.visits[child]
+                    # Moves not yet tried go first.
+                    if visits == 0:
+                        node = child
+                        break
+                    score = tree.wins[child] / visits + exploration * math.sqrt(log_visits / visits)
+                    if score > best_score:
+                        best_score = score
+                        best = child
+                else:
+                    node = best
+                board.push(tree.get_move(node))
+                if tree.visits[node] == 0:
+                    break
+
+            # Add the moves of a position visited before, and play one out.
+            if tree.first_child[node] == -1 and (node == root or tree.visits[node] > 0):
+                moves = board.get_legal_moves()
+                tree.expand(node, moves)
+                if moves:
+                    node = tree.first_child[node] + rng.randrange(len(moves))
+                    board.push(tree.get_move(node))
+
+            if tree.first_child[node] != -1 and tree.child_count[node] == 0:
+                # The player to move has lost.
+                winner = 1 - board.turn
+            else:
+                scratch.white, scratch.black, scratch.kings, scratch.turn = (
+                    board.white, board.black, board.kings, board.turn)
+                winner = playout(scratch, rng)
+
+            # Add the result to the path, for the player who made each move.
+            mover = 1 - board.turn
+            while node != -1:
+                tree.visits[node] += 1
+                if winner == None:
+                    tree.wins[node] += 0.5
+                elif winner == mover:
+                    tree.wins[node] += 1.0
+                mover = 1 - mover
+                node = tree.parent[node]
+
+            while len(board.history) > history_length:
+                board.pop()
+
+    def start_clock(self, time_budget_ms):
+
+        # Give a pondering search its time budget from now.
+        self.move_deadline = time.perf_counter() + time_budget_ms / 1000
+
+    def stop(self):
+
+        # Make the search stop soon. This is safe to call from another
+        # thread.
+        self.stopped = True
+
+    def choose_move(self, time_budget_ms=None, ponder=False):
+
+        start = time.perf_counter()
+        moves = self.board.get_legal_moves()
+        if len(moves) <= 1:
+            self.nodes = 0
+            self.tree_nodes = len(self.tree)
+            self.principal_variation = moves[:]
+            self.depth_reached = len(moves)
+            move = moves[0] if moves else None
+        elif self.workers > 1:
+            move = self.choose_move_in_parallel(moves, time_budget_ms)
+        else:
+            self.search(time_budget_ms, ponder)
+            self.tree_nodes = len(self.tree)
+
+            # Play the most visited move and expect the most visited replies.
+            tree = self.tree
+            node = self.root
+            self.principal_variation = []
+            while tree.child_count[node] and tree.visits[node] > 1:
+                node = tree.get_most_visited(node)
+                self.principal_variation.append(tree.get_move(node))
+            self.depth_reached = len(self.principal_variation)
+            if self.principal_variation != []:
+                move = self.principal_variation[0]
+            else:
+                # The search ended too soon to choose (with no time, no
+                # playouts or stopped): play the most visited move, or the
+                # first if the root has no moves yet.
+                if tree.child_count[self.root]:
+                    move = tree.get_move(tree.get_most_visited(self.root))
+                else:
+                    move = moves[0]
+                self.principal_variation = [move]
+
+        self.stats = {
+            'playouts': self.nodes,
+            'depth': self.depth_reached,
+            'tree_nodes': self.tree_nodes,
+            'reused': self.reused,
+            'seconds': time.perf_counter() - start,
+        }
+        return move
+
+    def choose_move_in_parallel(self, moves, time_budget_ms):
+
+        if self.pool == None:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                            initargs=(self.playouts,))
+        state = (self.board.white, self.board.black, self.board.kings, self.board.turn)
+        playouts = math.ceil(self.playouts / self.workers)
+        futures = [self.pool.submit(search_worker, state, time_budget_ms, playouts)
+                   for worker in range(self.workers)]
+
+        # Add up the visits of each root move over the workers.
+        visits = {}
+        self.nodes = self.tree_nodes = 0
+        for future in futures:
+            children, nodes, tree_nodes, self.reused = future.result()
+            self.nodes += nodes
+            self.tree_nodes += tree_nodes
+            for move, child_visits, wins in children:
+                visits[move] = visits.get(move, 0) + child_visits
+
+        # The workers may not have had time to try any move.
+        if visits != {}:
+            move = max(visits, key=visits.get)
+            self.depth_reached = 1
+        else:
+            move = moves[0]
+            self.depth_reached = 0
+        self.principal_variation = [move]
+        return move
+
+    def play(self, time_budget_ms=None):
+
+        # Make the chosen move on the board (there is none if the AI has lost).
+        move = self.choose_move(time_budget_ms)
+        if move != None:
+            self.board.apply_move(move)
+        return self.board
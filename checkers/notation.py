@@ -0,0 +1,239 @@
+# Writing positions and moves down.
+#
+# A position has a canonical encoding as one integer below 2 ** 97: the
+# White, Black and crowned masks of checkers.bitboard, 32 bits each, then the
+# side to move. As bytes it takes 13.
+#
+# Positions and games are also read and written in the usual text formats of
+# English draughts: FEN strings such as 'B:W18,24,27,28,K10,K15:B12,16,20,K22'
+# and PDN game collections. Those number the squares 1 to 32 from the far side
+# of the first player, who is called Black. That player is White here, and
+# square n is square 32 - n of checkers.bitboard.
+
+import re
+import struct
+
+from checkers.bitboard import (BitBoard, WHITE, BLACK, WHITE_START, BLACK_START, CROWN_ROW,
+                               FULL_MASK, JUMP_TABLE, get_kind, squares, square_to_position,
+                               position_to_square)
+
+# The three masks and the side to move.
+POSITION = struct.Struct('<IIIB')
+
+PDN_TAG = re.compile(r'\[[^\]]*\]')
+PDN_TAG_VALUE = re.compile(r'\[\s*(\w+)\s+"([^"]*)"\s*\]')
+PDN_COMMENT = re.compile(r'\{[^}]*\}')
+PDN_MOVE_NUMBER = re.compile(r'^\d+\.+')
+PDN_MOVE = re.compile(r'\d+(?:[-x]\d+)+')
+PDN_RESULT = re.compile(r'(?:1-0|0-1|1/2-1/2|2-0|0-2|1-1|\*)$')
+
+# The colour letters of FEN strings, by colour here.
+FEN_COLOURS = ('B', 'W')
+
+
+def encode(board):
+    return board.white | board.black << 32 | board.kings << 64 | board.turn << 96
+
+
+def decode(code):
+
+    board = BitBoard(code & FULL_MASK, code >> 32 & FULL_MASK, code >> 64 & FULL_MASK, code >> 96)
+    check_position(board)
+    return board
+
+
+def to_bytes(board):
+    return POSITION.pack(board.white, board.black, board.kings, board.turn)
+
+
+def from_bytes(data):
+
+    board = BitBoard(*POSITION.unpack(data))
+    check_position(board)
+    return board
+
+
+def check_position(board):
+
+    # Refuse masks that no game could reach.
+    if board.white & board.black:
+        raise ValueError('A square holds both colours')
+    if board.kings & ~(board.white | board.black):
+        raise ValueError('A crown is on an empty square')
+    if board.turn not in (WHITE, BLACK):
+        raise ValueError('Unknown side to move: %r' % (board.turn,))
+    for colour, pieces in ((WHITE, board.white), (BLACK, board.black)):
+        if pieces & ~board.kings & CROWN_ROW[colour]:
+            raise ValueError('An uncrowned piece is on its crowning row')
+
+
+def to_pdn_square(square):
+    return 32 - square
+
+
+def from_pdn_square(number):
+
+    if not 1 <= number <= 32:
+        raise ValueError('No such square: %d' % (number,))
+    return 32 - number
+
+
+def write_fen(board):
+
+    fields = [FEN_COLOURS[board.turn]]
+    for colour, pieces in ((WHITE, board.white), (BLACK, board.black)):
+        numbers = sorted(to_pdn_square(square) for square in squares(pieces))
+        fields.append(FEN_COLOURS[colour] + ','.join(('K%d' if board.kings >> (32 - number) & 1 else '%d')
+                                                     % number for number in numbers))
+    return ':'.join(fields)
+
+
+def read_fen(text):
+
+    # Read a FEN string, with or without its [FEN "..."] tag. Squares can be
+    # given as ranges such as 1-12.
+    match = PDN_TAG_VALUE.fullmatch(text.strip())
+    if match != None:
+        text = match.group(2)
+    fields = text.strip().rstrip('.').split(':')
+    if fields[0].upper() not in FEN_COLOURS:
+        raise ValueError('Not a FEN string: %r' % (text,))
+
+    masks = [0, 0]
+    kings = 0
+    for field in fields[1:]:
+        colour = FEN_COLOURS.index(field[:1].upper())
+        for item in filter(None, field[1:].split(',')):
+            crowned = item[:1].upper() == 'K'
+            numbers = [int(number) for number in item.lstrip('Kk').split('-')]
+            for number in range(numbers[0], numbers[-1] + 1):
+                bit = 1 << from_pdn_square(number)
+                masks[colour] |= bit
+                if crowned:
+                    kings |= bit
+
+    board = BitBoard(masks[WHITE], masks[BLACK], kings, FEN_COLOURS.index(fields[0].upper()))
+    check_position(board)
+    return board
+
+
+def get_capture_path(board, move):
+
+    # Return the squares a capture passes through, from start to end. The
+    # move only records the captured pieces, so the path is found again.
+    start, end, captured = move
+    own, opp = board.get_sides(board.turn)
+    jumps = JUMP_TABLE[get_kind(board.turn, board.kings >> start & 1)]
+    empty = ~(own | opp) & FULL_MASK | 1 << start
+
+    def follow(square, left):
+        if not left:
+            return [square] if square == end else None
+        for over, land, land_square in jumps[square]:
+            if over & left and land & empty:
+                rest = follow(land_square, left ^ over)
+                if rest != None:
+                    return [square] + rest
+        return None
+
+    return follow(start, captured)
+
+
+def format_move(board, move):
+
+    # Write a legal move in PDN, with every square of a capture.
+    start, end, captured = move
+    if not captured:
+        return '%d-%d' % (to_pdn_square(start), to_pdn_square(end))
+    return 'x'.join(str(to_pdn_square(square)) for square in get_capture_path(board, move))
+
+
+def parse_move(board, text):
+
+    # Turn a move such as '11-15', '22x15' or '22x15x6' into a legal move.
+    path = [from_pdn_square(int(number)) for number in re.split('[-x]', text)]
+
+    # The pieces jumped between the squares given, if all are given.
+    captured = 0
+    for start, end in zip(path, path[1:]):
+        (x1, y1), (x2, y2) = square_to_position(start), square_to_position(end)
+        if abs(x1 - x2) == 2:
+            captured |= 1 << position_to_square(((x1 + x2) // 2, (y1 + y2) // 2))
+
+    for move in board.get_legal_moves():
+        if move[0] != path[0] or move[1] != path[-1]:
+            continue
+        # A capture that only gives its ends can be ambiguous, so the first
+        # one that fits is taken.
+        if len(path) > 2 and move[2] != captured:
+            continue
+        return move
+    raise ValueError('Illegal move: %r' % (text,))
+
+
+def read_pdn(path):
+
+    # Yield the (starting position, moves) of every game in a PDN file.
+    with open(path) as file:
+        text = file.read()
+
+    for game in re.split(r'\n\s*\n(?=\s*\[)', text):
+        tags = dict(PDN_TAG_VALUE.findall(game))
+        if 'FEN' in tags:
+            start = read_fen(tags['FEN'])
+        else:
+            start = BitBoard()
+
+        movetext = PDN_COMMENT.sub(' ', PDN_TAG.sub(' ', game))
+        # Leave out variations, which can be nested.
+        while '(' in movetext:
+            movetext = re.sub(r'\([^()]*\)', ' ', movetext)
+
+        board = start.copy()
+        moves = []
+        for token in movetext.split():
+            token = PDN_MOVE_NUMBER.sub('', token)
+            if PDN_RESULT.match(token):
+                break
+            if PDN_MOVE.fullmatch(token):
+                move = parse_move(board, token)
+                board.apply_move(move)
+                moves.append(move)
+        if moves != []:
+            yield start, moves
+
+
+def write_pdn(file, start, moves, result='*', tags=()):
+
+    # Write one game to an open text file, with the tags given as (name,
+    # value) pairs.
+    for name, value in tuple(tags) + (('Result', result),):
+        file.write('[%s "%s"]\n' % (name, value))
+    if (start.white, start.black, start.kings, start.turn) != (WHITE_START, BLACK_START, 0, WHITE):
+        file.write('[FEN "%s"]\n' % write_fen(start))
+
+    board = start.copy()
+    words = []
+    number = 1
+    for ply, move in enumerate(moves):
+        # Number the first player's moves, and the other's if the game
+        # starts with it.
+        if board.turn == WHITE:
+            words.append('%d.' % number)
+        elif ply == 0:
+            words.append('%d...' % number)
+        words.append(format_move(board, move))
+        if board.turn == BLACK:
+            number += 1
+        board.apply_move(move)
+    words.append(result)
+
+    # Keep the lines short.
+    line = ''
+    for word in words:
+        if line and len(line) + 1 + len(word) > 79:
+            file.write(line + '\n')
+            line = word
+        else:
+            line = line + ' ' + word if line else word
+    file.write(line + '\n\n')
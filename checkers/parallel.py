@@ -0,0 +1,172 @@
+# Root-parallel search.
+#
+# ParallelAI shares the moves at the root out between worker processes. Each
+# worker searches the positions it is given with its own AI, whose
+# transposition table lasts as long as the process. Boards are sent to the
+# workers as four integers (the three masks and the side to move).
+#
+# The best value found so far at the root is kept in shared memory, so every
+# worker starts with the tightest alpha bound available and cutoffs still
+# happen across workers. With shuffling off, ParallelAI picks the same move
+# with the same value as the serial AI.
+
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from checkers.ai import AI, SearchTimeout, QUIESCENCE_NODES
+from checkers.bitboard import BitBoard
+
+# Set up in each worker process by init_worker().
+_shared_alpha = None
+_worker_ai = None
+_search_id = None
+
+
+def init_worker(shared_alpha, table_size, replacement, quiescence_nodes, endgame, weights, batch):
+
+    global _shared_alpha, _worker_ai
+
+    # The shared alpha holds [best value so far, index of the move that
+    # found it].
+    _shared_alpha = shared_alpha
+    _worker_ai = AI(None, None, 0, table_size, replacement, shuffle=False,
+                    quiescence_nodes=quiescence_nodes, endgame=endgame, weights=weights, batch=batch)
+
+
+def search_move(state, colour, move, index, depth_limit, time_budget_ms, search_id):
+
+    global _search_id
+
+    ai = _worker_ai
+    ai.board = BitBoard(*state)
+    ai.colour = colour
+
+    # Start the move ordering statistics again for each new search, and let
+    # table entries from earlier searches be replaced first.
+    if search_id != _search_id:
+        ai.new_search()
+        _search_id = search_id
+
+    # The serial search keeps the first of several equally good moves. So a
+    # move after the current best can be cut off when it only ties, but a move
+    # before it has to search one point lower to tell a tie from a worse move.
+    with _shared_alpha.get_lock():
+        alpha, alpha_index = _shared_alpha[0], _shared_alpha[1]
+    if alpha_index < index:
+        window = alpha
+    else:
+        window = alpha - 1
+
+    if time_budget_ms != None:
+        ai.deadline = time.perf_counter() + time_budget_ms / 1000
+
+    ai.nodes = 0
+    ai.board.push(move)
+    try:
+        value = ai.get_best_move(ai.board, window, math.inf, 1, depth_limit, False)[1]
+    except SearchTimeout:
+        return (index, None, False, ai.nodes)
+    finally:
+        ai.deadline = None
+
+    # A value above the window is exact. Anything else is only an upper bound.
+    exact = value > window
+    if exact:
+        with _shared_alpha.get_lock():
+            if (value > _shared_alpha[0]
+            or value == _shared_alpha[0] and index < _shared_alpha[1]):
+                _shared_alpha[0] = value
+                _shared_alpha[1] = index
+
+    return (index, value, exact, ai.nodes)
+
+
+class ParallelAI(AI):
+
+    def __init__(self, board, colour, difficulty, workers=None, table_size=2 ** 18,
+                 replacement='depth', shuffle=True, ordering=True, seed=None,
+                 quiescence_nodes=QUIESCENCE_NODES, endgame=None, book=None, profile_dir=None,
+                 weights=None, batch=False):
+
+        # The workers do the searching and keep the transposition tables,
+        # so this process does not need a table of its own.
+        super().__init__(board, colour, difficulty, 0, replacement, shuffle, ordering, seed,
+                         quiescence_nodes, endgame, book, profile_dir, weights, batch)
+
+        self.workers = workers or os.cpu_count()
+        self.table_size = table_size
+        self.replacement = replacement
+        self.endgame_path = endgame
+        self.weights = weights
+
+        self.shared_alpha = multiprocessing.Array('d', 2)
+        self.pool = None
+        # Numbers the searches, so that the workers know when one starts.
+        self.search_id = 0
+
+    def start(self):
+
+        # Start the worker processes now rather than on the first move.
+        if self.pool == None:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                initargs=(self.shared_alpha, self.table_size, self.replacement,
+                          self.quiescence_nodes, self.endgame_path, self.weights, self.batch))
+            for future in [self.pool.submit(time.sleep, 0.05) for worker in range(self.workers)]:
+                future.result()
+        return self.pool
+
+    def new_search(self):
+        super().new_search()
+        # The workers start a new search when the search number changes.
+        self.search_id += 1
+
+    def close(self):
+        if self.pool != None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def search_root(self, depth_limit):
+
+        moves = self.board.get_legal_moves()
+
+        # Without a choice to make there is nothing to share out.
+        if depth_limit == 0 or moves == []:
+            return super().search_root(depth_limit)
+
+        self.nodes += 1
+
+        # Order the moves as the serial search would.
+        moves = self.order_moves(self.board, moves, 0, None)
+
+        state = (self.board.white, self.board.black, self.board.kings, self.board.turn)
+        with self.shared_alpha.get_lock():
+            self.shared_alpha[0] = -math.inf
+            self.shared_alpha[1] = len(moves)
+
+        pool = self.start()
+
+        def submit(index):
+            # Workers get whatever is left of a timed search's budget.
+            time_budget_ms = None
+            if self.deadline != None:
+                time_budget_ms = max(0.0, (self.deadline - time.perf_counter()) * 1000)
+            return pool.submit(search_move, state, self.colour, moves[index], index,
+                               depth_limit, time_budget_ms, self.search_id)
+
+        # Search the first (usually best) move alone so that the others start
+        # with a useful alpha bound, then search the rest together.
+        results = [submit(0).result()]
+        futures = [submit(index) for index in range(1, len(moves))]
+        results += [future.result() for future in futures]
+
+        self.nodes += sum(result[3] for result in results)
+        if any(result[1] == None for result in results):
+            raise SearchTimeout()
+
+        # Take the best exact value, and the first move among equals.
+        index, value, exact, nodes = min((result for result in results if result[2]),
+                                         key=lambda result: (-result[1], result[0]))
+        return (moves[index], value)
@@ -0,0 +1,147 @@
+# Move generation perft.
+#
+#   python -m checkers.perft --depth 8             count from the opening
+#   python -m checkers.perft --depth 6 --divide    count per first move
+#   python -m checkers.perft --check               check every stored position
+#
+# perft(n) is the number of different n-move sequences from a position. Any
+# mistake in move generation (a missed multi-jump, a capture that was not
+# forced, a piece crowned at the wrong time) changes the counts, and the time
+# taken to count them measures the speed of the move generator.
+
+import argparse
+import sys
+import time
+
+from checkers.bitboard import BitBoard, WHITE, BLACK
+
+# The published counts for English draughts from the starting position.
+OPENING_COUNTS = [7, 49, 302, 1469, 7361, 36768, 179740, 845931,
+                  3963680, 18391564, 85242128, 388623673]
+
+# Positions that exercise the harder parts of the rules, given as
+# (name, White's squares, Black's squares, crowned squares, side to move,
+# counts from depth 1). Square numbers are those of checkers.bitboard.
+# The counts agree with the move generator the game used before the bitboard
+# engine.
+POSITIONS = [
+    ('opening', None, None, None, WHITE, OPENING_COUNTS),
+    ('double jump', [14, 19, 20, 22, 23, 24, 25, 27, 28, 29, 30, 31],
+     [0, 1, 2, 3, 4, 5, 6, 7, 9, 10, 11], [], BLACK,
+     [2, 3, 9, 52, 363, 2474, 16093, 99145]),
+    ('crowning jump', [16, 18, 21, 25, 31], [3, 4, 9, 13, 15], [], BLACK,
+     [2, 5, 16, 66, 275, 1030, 4306, 15109]),
+    ('middle game', [14, 20, 22, 24, 25, 28, 30, 31], [0, 3, 4, 5, 6, 7, 8, 17], [], BLACK,
+     [1, 2, 14, 90, 368, 2152, 9952, 52661]),
+    ('king jump', [17, 23, 25, 27, 28], [0, 2, 4, 5, 10, 12, 20, 26], [26], BLACK,
+     [1, 6, 36, 144, 601, 2249, 9141, 30449]),
+    ('kings', [3, 18], [0, 4, 6, 9, 11, 28, 31], [3, 28, 31], BLACK,
+     [9, 23, 111, 335, 1986, 5564, 37223, 97274]),
+    ('circular jump', [16], [13, 14, 21, 22, 24, 28], [16], WHITE,
+     [1, 1, 4, 8, 19, 59, 192, 462]),
+]
+
+
+def make_board(white, black, kings, turn):
+
+    # The starting position is stored as None.
+    if white == None:
+        return BitBoard()
+    return BitBoard(sum(1 << square for square in white),
+                    sum(1 << square for square in black),
+                    sum(1 << square for square in kings), turn)
+
+
+def perft(board, depth):
+
+    # The position itself is the only sequence of no moves.
+    if depth == 0:
+        return 1
+
+    moves = board.get_legal_moves()
+
+    # The moves themselves are the leaves one ply from the end.
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def divide(board, depth):
+
+    # Count the leaves under each first move separately.
+    counts = []
+    for move in board.get_legal_moves():
+        board.push(move)
+        counts.append((move, perft(board, depth - 1) if depth > 1 else 1))
+        board.pop()
+    return counts
+
+
+def format_move(move):
+    start, end, captured = move
+    return '%d%s%d' % (start, 'x' if captured else '-', end)
+
+
+def check(max_depth, max_nodes):
+
+    # Count every stored position as deep as the limits allow and compare
+    # with the known counts. Yields (name, depth, expected, counted, seconds).
+    for name, white, black, kings, turn, counts in POSITIONS:
+        board = make_board(white, black, kings, turn)
+        for depth, expected in enumerate(counts[:max_depth], 1):
+            if expected > max_nodes:
+                break
+            start = time.perf_counter()
+            counted = perft(board, depth)
+            yield name, depth, expected, counted, time.perf_counter() - start
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Count move sequences to check the move generator.')
+    parser.add_argument('--depth', type=int, default=7)
+    parser.add_argument('--divide', action='store_true', help='show the count under each first move')
+    parser.add_argument('--check', action='store_true', help='check every stored position')
+    parser.add_argument('--max-nodes', type=int, default=10 ** 6,
+                        help='skip checks with more leaves than this')
+    args = parser.parse_args()
+    if args.depth < 1:
+        raise ValueError('The depth must be at least 1')
+
+    if args.check:
+        failures = 0
+        for name, depth, expected, counted, seconds in check(args.depth, args.max_nodes):
+            ok = counted == expected
+            failures += not ok
+            print('%-14s %2d %10d %10d  %-4s %10.0f nodes/s' % (
+                name, depth, expected, counted, 'ok' if ok else 'FAIL',
+                counted / seconds if seconds else 0))
+        sys.exit(1 if failures else 0)
+
+    board = BitBoard()
+    start = time.perf_counter()
+    if args.divide:
+        total = 0
+        for move, count in divide(board, args.depth):
+            print('%s %d' % (format_move(move), count))
+            total += count
+    else:
+        total = perft(board, args.depth)
+    seconds = time.perf_counter() - start
+
+    expected = OPENING_COUNTS[args.depth - 1] if args.depth <= len(OPENING_COUNTS) else None
+    print('perft(%d) = %d%s' % (args.depth, total,
+          '' if expected == None else ' (expected %d)' % expected))
+    print('%.2fs, %.0f nodes/s' % (seconds, total / seconds if seconds else 0))
+    if expected != None and total != expected:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
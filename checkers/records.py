@@ -0,0 +1,188 @@
+# Binary game records.
+#
+#   python -m checkers.records convert --selfplay selfplay.jsonl --pdn games.pdn --output games.bin
+#   python -m checkers.records info games.bin
+#   python -m checkers.records pdn games.bin --output games.pdn
+#
+# A record file is a header followed by one record per game, each only ever
+# appended. A record is the starting position (see checkers.notation), the
+# result, the number of plies, and then one byte per ply: the number of the
+# move played among the position's legal moves in sorted order. A game of
+# sixty plies takes 76 bytes.
+#
+# read_games() reads one record at a time, so files of millions of games can
+# be scanned in constant memory. A record cut short (by a writer that was
+# stopped) ends the file, and is dropped when the file is next written to. The
+# moves are only worked out when asked for.
+
+import argparse
+import json
+import os
+import struct
+
+from checkers.bitboard import BitBoard, WHITE, BLACK
+from checkers.notation import POSITION, to_bytes, from_bytes, read_pdn, write_pdn
+
+MAGIC = b'CKGAME1\0'
+# The starting position, the result and the number of plies.
+RECORD = struct.Struct('<%dsBH' % POSITION.size)
+
+# Results: the winning colour, or one of these.
+DRAW = 2
+UNKNOWN = 3
+RESULT_NAMES = {WHITE: 'white', BLACK: 'black', DRAW: 'draw', UNKNOWN: 'unknown'}
+# PDN gives the first player's score first.
+PDN_RESULTS = {WHITE: '1-0', BLACK: '0-1', DRAW: '1/2-1/2', UNKNOWN: '*'}
+
+
+class GameRecord:
+
+    def __init__(self, start, result, indices):
+        # The starting position as bytes, the result, and the number of
+        # each move among the sorted legal moves.
+        self.start = start
+        self.result = result
+        self.indices = indices
+
+    def get_start(self):
+        return from_bytes(self.start)
+
+    def replay(self, plies=None):
+
+        # Yield (position, move) for every ply, or the first few. The same
+        # board is used throughout, so copy it to keep a position.
+        board = self.get_start()
+        for index in self.indices[:plies]:
+            move = sorted(board.get_legal_moves())[index]
+            yield board, move
+            board.apply_move(move)
+
+    def get_moves(self, plies=None):
+        return [move for board, move in self.replay(plies)]
+
+
+class GameWriter:
+
+    def __init__(self, path):
+
+        # Append, so that several runs can share one file. A record cut short
+        # at the end is dropped first, or the new ones would be misread.
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            size = get_complete_size(path)
+            if size < os.path.getsize(path):
+                os.truncate(path, size)
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def write(self, moves, result=UNKNOWN, start=None):
+
+        # Add one game, played from start (the usual starting position if
+        # None).
+        if start == None:
+            start = BitBoard()
+        board = start.copy()
+        indices = bytearray()
+        for move in moves:
+            indices.append(sorted(board.get_legal_moves()).index(move))
+            board.apply_move(move)
+        self.file.write(RECORD.pack(to_bytes(start), result, len(indices)) + indices)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def get_complete_size(path):
+
+    # Return the length of a record file up to the end of its last complete
+    # record, skipping over the moves.
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError('Not a game record file: %r' % (path,))
+        size = os.fstat(file.fileno()).st_size
+        end = len(MAGIC)
+        while end + RECORD.size <= size:
+            file.seek(end)
+            plies = RECORD.unpack(file.read(RECORD.size))[2]
+            if end + RECORD.size + plies > size:
+                break
+            end += RECORD.size + plies
+    return end
+
+
+def read_games(path):
+
+    # Yield a GameRecord for every game in a record file.
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError('Not a game record file: %r' % (path,))
+        while True:
+            header = file.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            start, result, plies = RECORD.unpack(header)
+            indices = file.read(plies)
+            if len(indices) < plies:
+                return
+            yield GameRecord(start, result, indices)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Convert and inspect binary game records.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help='add self-play records and PDN games to a record file')
+    convert.add_argument('--selfplay', nargs='*', default=[], help='self-play record files')
+    convert.add_argument('--pdn', nargs='*', default=[], help='PDN game collections')
+    convert.add_argument('--output', default='games.bin')
+
+    info = commands.add_parser('info', help='count the games, plies and results of a record file')
+    info.add_argument('path')
+
+    pdn = commands.add_parser('pdn', help='write the games of a record file as PDN')
+    pdn.add_argument('path')
+    pdn.add_argument('--output', default='games.pdn')
+
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        writer = GameWriter(args.output)
+        games = 0
+        for path in args.selfplay:
+            with open(path) as file:
+                for line in file:
+                    game = json.loads(line)
+                    result = {'white': WHITE, 'black': BLACK, 'draw': DRAW}[game['winner']]
+                    writer.write([tuple(move['move']) for move in game['moves']], result)
+                    games += 1
+        for path in args.pdn:
+            for start, moves in read_pdn(path):
+                writer.write(moves, UNKNOWN, start)
+                games += 1
+        writer.close()
+        print('%d games added to %s' % (games, args.output))
+
+    elif args.command == 'info':
+        games = plies = 0
+        results = dict.fromkeys(RESULT_NAMES, 0)
+        for game in read_games(args.path):
+            games += 1
+            plies += len(game.indices)
+            results[game.result] += 1
+        print('%d games, %d plies, %d bytes' % (games, plies, os.path.getsize(args.path)))
+        print(', '.join('%s %d' % (RESULT_NAMES[result], count) for result, count in results.items()))
+
+    elif args.command == 'pdn':
+        with open(args.output, 'w') as output:
+            for number, game in enumerate(read_games(args.path)):
+                write_pdn(output, game.get_start(), game.get_moves(), PDN_RESULTS[game.result],
+                          (('Event', 'Game %d' % (number + 1)),))
+        print('wrote %s' % args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+# Headless engine-vs-engine games.
+#
+#   python -m checkers.selfplay --games 1000 --workers 16 \
+#       --first depth=4 --second time=100,replacement=always --output games.jsonl
+#
+# Each engine is described by comma-separated settings:
+#
+#   depth=N        search N moves ahead (the AI's difficulty, default 2)
+#   time=MS        use iterative deepening with this budget per move instead
+#   table=N        transposition table size, 0 to turn it off
+#   replacement=P  'depth' or 'always'
+#   shuffle=0|1    shuffle moves so that games vary (default 1)
+#   quiescence=N   follow captures past the depth limit for up to N
+#                  positions (default 1000, 0 to turn it off)
+#   endgame=PATH   use an endgame database made by checkers.egdb
+#   book=PATH      play from an opening book made by checkers.book
+#   profile=DIR    write a cProfile profile of every search to DIR
+#   batch=0|1      evaluate the leaves below a position together (default 0)
+#   weights=PATH   evaluate with weights made by checkers.tuning
+#   engine=NAME    'minimax' (the default) or 'mcts' for checkers.mcts, which
+#                  only uses time, shuffle and these:
+#   playouts=N     playouts per move without a time budget (default 2000)
+#   processes=N    run the playouts in this many processes (default 1)
+#
+# The engines swap colours every game. One JSON line is written per finished
+# game, as soon as it finishes. With --stats the search statistics of every
+# move (see checkers.stats) go to a second JSON lines file, and with --records
+# the games are also appended to a binary record file (see checkers.records).
+# Nothing here imports pygame.
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from checkers.ai import AI, QUIESCENCE_NODES
+from checkers.bitboard import BitBoard, WHITE, BLACK
+from checkers.mcts import MCTSAI, PLAYOUTS
+from checkers.records import GameWriter, DRAW
+from checkers.stats import StatsWriter
+
+COLOUR_NAMES = {WHITE: 'white', BLACK: 'black'}
+
+# A game is drawn after this many moves without a result, or when the same
+# position comes up for the third time.
+MAX_PLIES = 200
+REPETITIONS = 3
+
+
+def parse_engine(text):
+
+    settings = {'depth': 2, 'time': None, 'table': 2 ** 18, 'replacement': 'depth', 'shuffle': 1,
+                'quiescence': QUIESCENCE_NODES, 'endgame': None, 'book': None, 'profile': None,
+                'batch': 0, 'weights': None, 'engine': 'minimax', 'playouts': PLAYOUTS, 'processes': 1}
+    for item in filter(None, text.split(',')):
+        name, value = item.split('=', 1)
+        if name not in settings:
+            raise ValueError('Unknown engine setting: %r' % (name,))
+        if name in ('replacement', 'endgame', 'book', 'profile', 'weights', 'engine'):
+            settings[name] = value
+        else:
+            settings[name] = int(value)
+    if settings['engine'] not in ('minimax', 'mcts'):
+        raise ValueError('Unknown engine: %r' % (settings['engine'],))
+    return settings
+
+
+def make_ai(board, colour, settings, seed):
+    if settings['engine'] == 'mcts':
+        # Without shuffling every game from the start is the same.
+        return MCTSAI(board, colour, settings['playouts'], workers=settings['processes'],
+                      seed=seed if settings['shuffle'] else 0)
+    return AI(board, colour, settings['depth'], table_size=settings['table'],
+              replacement=settings['replacement'], shuffle=bool(settings['shuffle']), seed=seed,
+              quiescence_nodes=settings['quiescence'], endgame=settings['endgame'],
+              book=settings['book'], profile_dir=settings['profile'], weights=settings['weights'],
+              batch=bool(settings['batch']))
+
+
+def play_game(game, engines, max_plies, seed):
+
+    # The engines swap colours every game.
+    names = list(engines) if game % 2 == 0 else list(reversed(list(engines)))
+    board = BitBoard()
+    # Seed each game on its own so that any game can be replayed.
+    players = {WHITE: make_ai(board, WHITE, engines[names[0]], (seed + game) * 2),
+               BLACK: make_ai(board, BLACK, engines[names[1]], (seed + game) * 2 + 1)}
+    budgets = {WHITE: engines[names[0]]['time'], BLACK: engines[names[1]]['time']}
+
+    seen = {board.key: 1}
+    moves = []
+    winner = None
+    reason = 'max plies'
+    start = time.perf_counter()
+
+    while len(moves) < max_plies:
+
+        # The player to move loses if they cannot move.
+        if board.is_won():
+            winner = 1 - board.turn
+            reason = 'no moves'
+            break
+
+        ai = players[board.turn]
+        move_start = time.perf_counter()
+        move = ai.choose_move(budgets[board.turn])
+        board.apply_move(move)
+        moves.append({
+            'ms': round((time.perf_counter() - move_start) * 1000, 3),
+            'nodes': ai.nodes,
+            'depth': ai.depth_reached,
+            'move': move,
+            'stats': ai.stats,
+        })
+
+        seen[board.key] = seen.get(board.key, 0) + 1
+        if seen[board.key] == REPETITIONS:
+            reason = 'repetition'
+            break
+
+    for ai in players.values():
+        if isinstance(ai, MCTSAI):
+            ai.close()
+
+    return {
+        'game': game,
+        'white': names[0],
+        'black': names[1],
+        'winner': COLOUR_NAMES.get(winner, 'draw'),
+        'winning_engine': names[winner] if winner != None else None,
+        'reason': reason,
+        'plies': len(moves),
+        'nodes': sum(move['nodes'] for move in moves),
+        'seconds': round(time.perf_counter() - start, 3),
+        'moves': moves,
+    }
+
+
+def run(engines, games, workers, max_plies, seed):
+
+    # Yield the results of all the games as they finish.
+    if workers == 1:
+        for game in range(games):
+            yield play_game(game, engines, max_plies, seed)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(play_game, game, engines, max_plies, seed)
+                   for game in range(games)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Play engine-vs-engine games without a display.')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--first', default='depth=2', help='settings for the first engine')
+    parser.add_argument('--second', default='depth=2', help='settings for the second engine')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='selfplay.jsonl')
+    parser.add_argument('--stats', help='append the search statistics of every move to this JSON lines file')
+    parser.add_argument('--records', help='also append the games to this binary record file')
+    args = parser.parse_args()
+
+    # The engines are named by their settings (plus a number if both are the
+    # same, so that the results still tell them apart).
+    first, second = args.first, args.second
+    if first == second:
+        first, second = first + ' #1', second + ' #2'
+    engines = {first: parse_engine(args.first), second: parse_engine(args.second)}
+
+    score = {first: 0, second: 0, None: 0}
+    start = time.perf_counter()
+    finished = 0
+
+    # Append to the output so that several runs can share one file.
+    stats = StatsWriter(args.stats) if args.stats != None else None
+    records = GameWriter(args.records) if args.records != None else None
+    with open(args.output, 'a') as output:
+        for result in run(engines, args.games, args.workers, args.max_plies, args.seed):
+            # The statistics are kept out of the game records.
+            for ply, move in enumerate(result['moves']):
+                move_stats = move.pop('stats')
+                if stats != None:
+                    # White moves first, so it plays the even plies.
+                    engine = result['white'] if ply % 2 == 0 else result['black']
+                    stats.write(move_stats, game=result['game'], ply=ply, engine=engine)
+            if records != None:
+                records.write([tuple(move['move']) for move in result['moves']],
+                              {'white': WHITE, 'black': BLACK}.get(result['winner'], DRAW))
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            score[result['winning_engine']] += 1
+            finished += 1
+
+    if stats != None:
+        stats.close()
+    if records != None:
+        records.close()
+
+    elapsed = time.perf_counter() - start
+    print('%s: %d wins, %s: %d wins, %d draws' % (first, score[first], second, score[second], score[None]))
+    print('%d games in %.1fs (%.0f games per hour)' % (finished, elapsed, finished * 3600 / elapsed),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
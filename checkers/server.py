@@ -0,0 +1,313 @@
+# A local analysis server.
+#
+#   python -m checkers.server --port 8765 --workers 4
+#
+# Clients connect over TCP and send one JSON object per line. Each request
+# gets one JSON line back with the same id, as soon as it is answered, so a
+# client can send many requests without waiting:
+#
+#   {"id": 1, "method": "legal_moves", "fen": "B:W21-32:B1-12"}
+#   {"id": 2, "method": "evaluate", "fen": "..."}
+#   {"id": 3, "method": "best_move", "fen": "...", "depth": 6, "game": "g42"}
+#   {"id": 4, "method": "best_move", "code": 1234, "time": 200, "timeout": 1000}
+#
+#   {"id": 1, "result": {"moves": ["9-13", "9-14", ...]}}
+#   {"id": 3, "result": {"move": "11-15", "value": 2, "depth": 6, ...}}
+#   {"id": 4, "error": "..."}
+#
+# Positions are FEN strings or codes from checkers.notation, and values are
+# from the point of view of the player to move.
+#
+# Searches run in worker processes. Requests naming the same game always go
+# to the same worker, which keeps an AI (and its transposition table) for
+# each game and side to move it has seen, so each search of a game reuses the
+# ones before it for the same side. (The table holds values from the AI's
+# point of view, so the two sides cannot share one.)
+# A search that runs past its timeout stops and the request fails. Static
+# evaluations are cheap, so they are answered here, with the requests that
+# arrive together evaluated in one batch.
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from checkers.ai import AI, BATCH_SIZE, MAX_DEPTH
+from checkers.bitboard import WHITE, BLACK
+from checkers.evaluation import Evaluator
+from checkers.notation import encode, decode, read_fen, format_move
+
+PORT = 8765
+# The default search depth, and the longest a request may take unless it
+# says otherwise.
+DEPTH = 6
+TIMEOUT_MS = 10000
+# How long to wait for more evaluations to batch with the first, and the
+# most to evaluate at once.
+BATCH_WAIT_MS = 1
+MAX_BATCH = 1024
+# How many games each worker keeps AIs for (one for each side), and the size of their tables.
+GAMES_PER_WORKER = 64
+TABLE_SIZE = 2 ** 18
+
+# The AIs of one worker process, most recently used last.
+_worker_ais = OrderedDict()
+
+
+def get_worker_ai(game, colour):
+
+    # Return the worker's AI for a game (or for requests without one) with
+    # colour to move.
+    key = (game, colour)
+    if key in _worker_ais:
+        _worker_ais.move_to_end(key)
+    else:
+        _worker_ais[key] = AI(None, colour, DEPTH, TABLE_SIZE, shuffle=False)
+        if len(_worker_ais) > 2 * GAMES_PER_WORKER:
+            _worker_ais.popitem(last=False)
+    return _worker_ais[key]
+
+
+def start_worker():
+
+    # Make the AIs for requests without a game, so the first of them does not
+    # wait for them.
+    get_worker_ai(None, WHITE)
+    get_worker_ai(None, BLACK)
+
+
+def search(code, game, depth, time_budget_ms, deadline):
+
+    # Find the best move in a worker process, by the deadline (from
+    # time.time(), so that it is counted from when the request arrived, not
+    # from when the worker got to it). Returns the result to send.
+    remaining_ms = (deadline - time.time()) * 1000
+    if remaining_ms <= 0:
+        raise TimeoutError('The request timed out before it was searched')
+
+    board = decode(code)
+    ai = get_worker_ai(game, board.turn)
+    ai.board = board
+    ai.difficulty = depth
+
+    # The clock is checked during the search, so the search stops soon after
+    # the deadline rather than being left to run.
+    if time_budget_ms != None:
+        time_budget_ms = min(time_budget_ms, remaining_ms)
+    else:
+        ai.deadline = time.perf_counter() + remaining_ms / 1000
+    try:
+        move = ai.choose_move(time_budget_ms)
+    finally:
+        ai.deadline = None
+
+    if move == None:
+        return {'move': None, 'value': None, 'depth': 0, 'nodes': ai.nodes, 'pv': []}
+    if ai.depth_reached == 0 and time_budget_ms == None:
+        raise TimeoutError('The search did not finish in time')
+
+    # Write the principal variation out by playing it.
+    variation = []
+    for played in ai.principal_variation:
+        variation.append(format_move(board, played))
+        board.push(played)
+    for played in ai.principal_variation:
+        board.pop()
+
+    return {
+        'move': variation[0] if variation else format_move(board, move),
+        'value': ai.value,
+        'depth': ai.depth_reached,
+        'nodes': ai.nodes,
+        'pv': variation,
+    }
+
+
+class EvaluationBatcher:
+
+    def __init__(self, evaluator):
+        self.evaluator = evaluator
+        # The (board, future) pairs waiting to be evaluated.
+        self.pending = []
+        self.batches = 0
+
+    def evaluate(self, board):
+
+        # Return a future for the value of a position from the point of view
+        # of the player to move.
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((board, future))
+        if len(self.pending) == 1:
+            loop.call_later(BATCH_WAIT_MS / 1000, self.flush)
+        elif len(self.pending) >= MAX_BATCH:
+            self.flush()
+        return future
+
+    def flush(self):
+
+        pending, self.pending = self.pending, []
+        if pending == []:
+            return
+        self.batches += 1
+
+        # Evaluate everything from White's point of view and turn the values
+        # round for Black. Few positions are quicker one at a time.
+        if len(pending) >= BATCH_SIZE:
+            values = self.evaluator.evaluate_batch([(board.white, board.black, board.kings, board.turn)
+                                                    for board, future in pending], WHITE)
+        else:
+            values = [self.evaluator.evaluate(board, WHITE) for board, future in pending]
+
+        for (board, future), value in zip(pending, values):
+            if not future.done():
+                future.set_result(value if board.turn == WHITE else -value)
+
+
+class AnalysisServer:
+
+    def __init__(self, workers):
+        # One process per worker, so that requests can be sent to a given one.
+        self.workers = [ProcessPoolExecutor(1) for worker in range(workers)]
+        self.busy = [0] * workers
+        self.batcher = EvaluationBatcher(Evaluator())
+        self.requests = 0
+
+    def close(self):
+        for worker in self.workers:
+            worker.shutdown(cancel_futures=True)
+
+    def get_worker(self, game):
+
+        # The same game always goes to the same worker. Other requests go to
+        # the least busy one.
+        if game != None:
+            return zlib.crc32(str(game).encode()) % len(self.workers)
+        return self.busy.index(min(self.busy))
+
+    async def handle(self, request):
+
+        # Answer one request, returning the result.
+        if 'fen' in request:
+            board = read_fen(request['fen'])
+        elif 'code' in request:
+            board = decode(int(request['code']))
+        else:
+            raise ValueError('The request has no position')
+        method = request.get('method')
+
+        if method == 'legal_moves':
+            return {'moves': [format_move(board, move) for move in sorted(board.get_legal_moves())]}
+
+        elif method == 'evaluate':
+            return {'value': await self.batcher.evaluate(board)}
+
+        elif method == 'best_move':
+            # The killer and history tables of the search only go so deep,
+            # and a search to depth 0 finds no move.
+            depth = int(request.get('depth', DEPTH))
+            if not 1 <= depth <= MAX_DEPTH:
+                raise ValueError('The depth must be from 1 to %d' % MAX_DEPTH)
+            timeout_ms = request.get('timeout', TIMEOUT_MS)
+            game = request.get('game')
+            worker = self.get_worker(game)
+            future = asyncio.get_running_loop().run_in_executor(
+                self.workers[worker], search, encode(board), game, depth,
+                request.get('time'), time.time() + timeout_ms / 1000)
+            self.busy[worker] += 1
+            try:
+                # The worker stops at the deadline itself. This only gives up
+                # on it if it does not (the first iteration of a timed search
+                # always finishes).
+                return await asyncio.wait_for(future, timeout_ms / 1000 + 1)
+            except asyncio.TimeoutError:
+                raise TimeoutError('The request took longer than %d ms' % timeout_ms)
+            finally:
+                self.busy[worker] -= 1
+
+        raise ValueError('Unknown method: %r' % (method,))
+
+    async def respond(self, line, writer):
+
+        self.requests += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = {'id': request_id, 'result': await self.handle(request)}
+        except Exception as error:
+            response = {'id': request_id, 'error': str(error) or type(error).__name__}
+        writer.write((json.dumps(response) + '\n').encode())
+        await writer.drain()
+
+    async def serve_client(self, reader, writer):
+
+        # Answer the requests of one connection, each as soon as it is done.
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(self.respond(line, writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, workers):
+
+    server = AnalysisServer(workers)
+    # Start the workers before accepting requests.
+    await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(worker, start_worker)
+                           for worker in server.workers))
+    listener = await asyncio.start_server(server.serve_client, host, port)
+
+    # Stop on SIGTERM (as sent by checkers.loadtest) as on Ctrl-C, so that
+    # the workers are shut down too and do not outlive the server. Windows
+    # has no signal handlers and stops with KeyboardInterrupt instead.
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    try:
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, task.cancel)
+    except NotImplementedError:
+        pass
+
+    print('serving on %s:%d with %d workers' % (host, port, workers), flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        server.close()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Serve position analysis over line-delimited JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# Search statistics.
+#
+# The AI keeps cheap counters during every search: positions visited and
+# evaluated, cutoffs, transposition table probes and hits, and the time spent
+# generating moves, making and taking back moves, and evaluating positions.
+# After each move get_search_stats() gathers them into a dict, which the AI
+# keeps as AI.stats. StatsWriter appends such dicts to a JSON lines file, one
+# line per move, so they can be charted from release to release.
+#
+# For a closer look the AI can also run each search under cProfile (see the
+# profile_dir option of AI). The .prof files can be read with pstats.
+
+import cProfile
+import json
+
+# The phases of a search that are timed.
+PHASES = ('generation', 'make', 'evaluation')
+
+
+def get_search_stats(ai, seconds, book=False):
+
+    # Gather the counters of the AI's last search, which took this many
+    # seconds in all.
+    table = ai.table
+    phases = {
+        'generation': ai.generation_time,
+        'make': ai.make_time,
+        'evaluation': ai.evaluation_time,
+    }
+    phases['other'] = max(0.0, seconds - sum(phases.values()))
+
+    return {
+        'nodes': ai.nodes,
+        'evaluations': ai.evaluations,
+        'depth': ai.depth_reached,
+        'cutoffs': ai.cutoffs,
+        'researches': ai.researches,
+        'quiescence_nodes': ai.quiescence_visits,
+        'endgame_hits': ai.endgame_hits,
+        'table_probes': table.probes if table != None else 0,
+        'table_hits': table.hits if table != None else 0,
+        # The average number of moves of the positions that were expanded,
+        # and the branching factor that would give the same number of nodes
+        # in a uniform tree as deep as the search.
+        'branching': ai.moves_generated / ai.expansions if ai.expansions else 0.0,
+        'effective_branching': ai.nodes ** (1 / ai.depth_reached) if ai.depth_reached else 0.0,
+        'book': book,
+        'seconds': seconds,
+        'phases': phases,
+    }
+
+
+def profile_call(path, function, *args):
+
+    # Call the function under cProfile, write the profile to path and
+    # return what the function returned.
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args)
+    finally:
+        profiler.dump_stats(path)
+
+
+class StatsWriter:
+
+    def __init__(self, path):
+        # Append, so that several runs can share one file.
+        self.file = open(path, 'a')
+
+    def write(self, stats, **fields):
+
+        # Write one line, with any extra fields (such as the game and ply)
+        # before the statistics.
+        self.file.write(json.dumps(dict(fields, **stats)) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,83 @@
+# A fixed-size transposition table.
+#
+# The search reaches many positions more than once through different move
+# orders, and the AI reaches the same positions again on its next turn. Each
+# slot remembers the result of searching one position: how deep it was
+# searched, whether the value is exact or only a bound, and the best move.
+
+# Bound types.
+EXACT = 0
+# The value is at least the stored value (the search failed high).
+LOWER = 1
+# The value is at most the stored value (the search failed low).
+UPPER = 2
+
+# Replacement policies for a slot that already holds another position.
+# 'depth' keeps the deeper search unless the entry is from an earlier search,
+# 'always' keeps the newest one.
+REPLACEMENT_POLICIES = ('depth', 'always')
+
+
+class TranspositionTable:
+
+    def __init__(self, size=2 ** 18, replacement='depth'):
+
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError('Unknown replacement policy: %r' % (replacement,))
+
+        # Round the size down to a power of two so that a key can be masked
+        # into a slot number.
+        self.size = 1 << (size.bit_length() - 1)
+        self.mask = self.size - 1
+        self.replacement = replacement
+
+        # Each slot holds None or (key, depth, bound, value, move, age).
+        self.slots = [None] * self.size
+        # The age of the current search. Entries from earlier searches are
+        # replaced first.
+        self.age = 0
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        self.age += 1
+        # The counters are for the current search.
+        self.probes = self.hits = self.stores = 0
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.probes = self.hits = self.stores = 0
+
+    def probe(self, key):
+
+        self.probes += 1
+        entry = self.slots[key & self.mask]
+        # The full key is kept so that different positions sharing a slot
+        # are told apart.
+        if entry != None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, bound, value, move):
+
+        index = key & self.mask
+        entry = self.slots[index]
+
+        if (self.replacement == 'depth'
+        and entry != None
+        and entry[5] == self.age
+        and entry[0] != key
+        and entry[1] > depth):
+            return
+
+        self.slots[index] = (key, depth, bound, value, move, self.age)
+        self.stores += 1
+
+    def get_hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def get_usage(self):
+        return sum(1 for entry in self.slots if entry != None) / self.size
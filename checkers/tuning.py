@@ -0,0 +1,211 @@
+# Tuning the evaluation weights on recorded games.
+#
+#   python -m checkers.tuning --records games.bin --selfplay games.jsonl --output weights.json
+#   python -m checkers.tuning --records games.bin --features men,kings,advancement,centre
+#   python -m checkers.selfplay --first weights=weights.json --second depth=2
+#
+# Every position of every game with a known result is labelled with White's
+# score in that game: 1 for a win, 0.5 for a draw and 0 for a loss. The
+# opening plies and positions with a capture to make are left out, since the
+# features say little about them. The weights are fitted as in the Texel
+# method: the chance of White winning is taken to be the logistic function of
+# the weighted features, and the weights that best predict the scores (by
+# logistic regression, with Newton's method) are kept.
+#
+# The games are replayed in worker processes, each taking every n-th game of
+# every file, and their features are computed in NumPy batches (see
+# Evaluator.get_batch_features) and kept as bytes, seven per position. The
+# fitting then runs over blocks of positions in threads, which NumPy lets run
+# at once.
+#
+# The search needs whole numbers, so the fitted weights are scaled to make a
+# man worth --unit points and rounded. The won feature never varies in the
+# games (their last positions are not labelled), so it is kept at twenty men.
+# The weights go to a JSON file that AI takes in place of its weights.
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from checkers.bitboard import BitBoard, WHITE, BLACK
+from checkers.evaluation import Evaluator, FEATURES, DEFAULT_WEIGHTS, get_numpy
+from checkers.records import read_games, DRAW, UNKNOWN
+
+# Plies left out at the start of every game.
+SKIP_PLIES = 8
+# How many positions to compute the features of at once.
+CHUNK_SIZE = 1 << 16
+# How many positions each thread fits at once.
+BLOCK_SIZE = 1 << 18
+# The points a man is worth, and a win in men.
+UNIT = 10
+WON_MEN = 20
+# Newton's method stops after this many steps, or when no weight moves more
+# than the tolerance.
+ITERATIONS = 50
+TOLERANCE = 1e-7
+# Added to the Hessian so that features that never vary do not stop the fit.
+RIDGE = 1e-6
+
+# White's score for each result.
+SCORES = {WHITE: 1.0, BLACK: 0.0, DRAW: 0.5}
+WINNERS = {'white': WHITE, 'black': BLACK, 'draw': DRAW}
+
+
+def get_games(kind, path, part, parts):
+
+    # Yield the (start, moves, result) of the games of a file numbered part
+    # modulo parts. Games whose result is unknown are skipped.
+    if kind == 'selfplay':
+        with open(path) as file:
+            for number, line in enumerate(file):
+                if number % parts == part:
+                    game = json.loads(line)
+                    yield BitBoard(), [tuple(move['move']) for move in game['moves']], WINNERS[game['winner']]
+    else:
+        for number, game in enumerate(read_games(path)):
+            if number % parts == part and game.result != UNKNOWN:
+                yield game.get_start(), game.get_moves(), game.result
+
+
+def extract_positions(sources, part, parts, skip_plies):
+
+    # Return the features (from White's point of view) and White's scores of
+    # the labelled positions in one part of the games.
+    numpy = get_numpy()
+    evaluator = Evaluator()
+    positions = []
+    scores = []
+    chunks = []
+
+    for kind, path in sources:
+        for board, moves, result in get_games(kind, path, part, parts):
+            for ply, move in enumerate(moves):
+                if ply >= skip_plies and not board.get_jumpers(board.turn):
+                    positions.append((board.white, board.black, board.kings, board.turn))
+                    scores.append(SCORES[result])
+                board.apply_move(move)
+
+            if len(positions) >= CHUNK_SIZE:
+                chunks.append(evaluator.get_batch_features(positions, WHITE).astype(numpy.int8))
+                positions = []
+
+    if positions != []:
+        chunks.append(evaluator.get_batch_features(positions, WHITE).astype(numpy.int8))
+    if chunks == []:
+        return numpy.zeros((0, len(FEATURES)), numpy.int8), numpy.zeros(0, numpy.float32)
+    return numpy.concatenate(chunks), numpy.array(scores, numpy.float32)
+
+
+def load_positions(sources, workers, skip_plies):
+
+    # Extract the positions of all the games, in worker processes.
+    numpy = get_numpy()
+    if workers == 1:
+        return extract_positions(sources, 0, 1, skip_plies)
+    with ProcessPoolExecutor(workers) as executor:
+        parts = list(executor.map(extract_positions, [sources] * workers, range(workers),
+                                  [workers] * workers, [skip_plies] * workers))
+    return (numpy.concatenate([features for features, scores in parts]),
+            numpy.concatenate([scores for features, scores in parts]))
+
+
+def get_block_terms(features, scores, weights, start):
+
+    # Return the cross-entropy of the predictions for one block of
+    # positions, with its gradient and Hessian.
+    numpy = get_numpy()
+    x = features[start:start + BLOCK_SIZE].astype(numpy.float64)
+    y = scores[start:start + BLOCK_SIZE]
+    z = x @ weights
+    p = 1 / (1 + numpy.exp(-z))
+    loss = numpy.sum(numpy.logaddexp(0, z) - y * z)
+    return loss, x.T @ (p - y), (x * (p * (1 - p))[:, None]).T @ x
+
+
+def get_terms(features, scores, weights, executor):
+
+    # Add up the terms of every block.
+    numpy = get_numpy()
+    count = len(weights)
+    loss, gradient, hessian = 0.0, numpy.zeros(count), numpy.zeros((count, count))
+    for terms in executor.map(lambda start: get_block_terms(features, scores, weights, start),
+                              range(0, len(scores), BLOCK_SIZE)):
+        loss += terms[0]
+        gradient += terms[1]
+        hessian += terms[2]
+    return loss / len(scores), gradient, hessian
+
+
+def fit(features, scores, executor):
+
+    # Return the weights (in logits per unit of each feature) that minimise
+    # the mean cross-entropy of the scores, and that cross-entropy.
+    numpy = get_numpy()
+    count = features.shape[1]
+    weights = numpy.zeros(count)
+    for iteration in range(ITERATIONS):
+        loss, gradient, hessian = get_terms(features, scores, weights, executor)
+        step = numpy.linalg.solve(hessian + RIDGE * len(scores) * numpy.eye(count), gradient)
+        weights -= step
+        if numpy.abs(step).max() < TOLERANCE:
+            break
+    return weights, get_terms(features, scores, weights, executor)[0]
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Fit the evaluation weights to the results of recorded games.')
+    parser.add_argument('--records', nargs='*', default=[], help='binary game record files')
+    parser.add_argument('--selfplay', nargs='*', default=[], help='self-play record files')
+    parser.add_argument('--features', default=','.join(name for name in FEATURES if name != 'won'),
+                        help='the features to fit, which must include men')
+    parser.add_argument('--skip-plies', type=int, default=SKIP_PLIES, help='plies to leave out at the start of a game')
+    parser.add_argument('--unit', type=int, default=UNIT, help='the points a man is worth')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default='weights.json')
+    args = parser.parse_args()
+
+    numpy = get_numpy()
+    names = args.features.split(',')
+    for name in names:
+        if name not in FEATURES or name == 'won':
+            raise ValueError('Cannot fit the weight of %r' % (name,))
+    if 'men' not in names:
+        raise ValueError('The features to fit must include men')
+
+    start = time.perf_counter()
+    sources = [('records', path) for path in args.records] + [('selfplay', path) for path in args.selfplay]
+    features, scores = load_positions(sources, args.workers, args.skip_plies)
+    if len(scores) == 0:
+        raise ValueError('The games have no labelled positions')
+    print('%d positions in %.1fs' % (len(scores), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.workers) as executor:
+        # The default weights, only scaled, for comparison.
+        default = numpy.array([DEFAULT_WEIGHTS.get(name, 0) for name in FEATURES], numpy.int16)
+        default_loss = fit((features @ default)[:, None], scores, executor)[1]
+        fitted, loss = fit(features[:, [FEATURES.index(name) for name in names]], scores, executor)
+    print('fitted in %.1fs: cross-entropy %.5f, %.5f with the default weights'
+          % (time.perf_counter() - start, loss, default_loss))
+
+    men = fitted[names.index('men')]
+    if men <= 0:
+        raise ValueError('Men came out worth nothing; there are too few games')
+    weights = {name: round(value / men * args.unit) for name, value in zip(names, fitted)}
+    weights['won'] = WON_MEN * args.unit
+    for name, value in zip(names, fitted):
+        print('%-12s %9.4f %5d' % (name, value, weights[name]))
+
+    with open(args.output, 'w') as output:
+        json.dump({'weights': weights, 'positions': len(scores), 'cross_entropy': round(loss, 6),
+                   'default_cross_entropy': round(default_loss, 6)}, output, indent=2)
+        output.write('\n')
+    print('wrote %s' % args.output)
+
+
+if __name__ == '__main__':
+    main()
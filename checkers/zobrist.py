@@ -0,0 +1,22 @@
+# Zobrist keys for hashing positions.
+#
+# Every (colour, crowned, square) combination gets a random 64-bit number and
+# a position's key is the XOR of the numbers for its pieces, plus TURN_KEY
+# when Black is to move. Moving a piece only changes a few terms, so BitBoard
+# updates its key as it makes and takes back moves.
+#
+# The numbers come from a fixed seed so that keys are the same in every
+# process and every run, which lets them be shared and stored on disk.
+
+import random
+
+SEED = 20240101
+
+_random = random.Random(SEED)
+
+# PIECE_KEYS[colour][crowned][square], with White = 0 and Black = 1 as in
+# checkers.bitboard.
+PIECE_KEYS = [[[_random.getrandbits(64) for square in range(32)]
+               for crowned in range(2)]
+              for colour in range(2)]
+TURN_KEY = _random.getrandbits(64)
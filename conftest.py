@@ -0,0 +1,30 @@
+# Shared pytest set-up for the tests in tests/.
+#
+#   python -m pytest                     the quick tests
+#   python -m pytest --run-slow          also the slow checks and benchmarks
+#   python -m pytest -m benchmark --run-slow -s
+#
+# Tests marked slow (long correctness checks) or benchmark (timing cases) are
+# skipped unless --run-slow is given. Keeping this file at the top of the
+# repository also puts the repository on sys.path, so the checkers package
+# imports without being installed.
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption('--run-slow', action='store_true', help='run the slow tests and benchmarks')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: a long correctness check, run with --run-slow')
+    config.addinivalue_line('markers', 'benchmark: a timing case, run with --run-slow')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--run-slow'):
+        return
+    skip = pytest.mark.skip(reason='needs --run-slow')
+    for item in items:
+        if 'slow' in item.keywords or 'benchmark' in item.keywords:
+            item.add_marker(skip)
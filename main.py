@@ -1,13 +1,16 @@
-import random
-import copy
+import os
 import pygame
-import time
-import cProfile
 
-# Initialize the pygame module.
-pygame.init()
+from checkers.ai import AI
+from checkers.background import BackgroundSearch
+from checkers.bitboard import WHITE, BLACK, ALL_STEPS, square_to_position, position_to_square
+from checkers.board import Board, Piece
 
 FPS = 10
+# Pieces are moved smoothly at this frame rate, taking this many milliseconds
+# for each step.
+ANIMATION_FPS = 60
+ANIMATION_STEP_MS = 150
 ROWS = 8
 COLS = 8
 SQUARE_WIDTH = 50
@@ -17,453 +20,240 @@ LIGHT_SQUARE_COLOUR = (240,220,130)
 DARK_SQUARE_COLOUR = (0,128,0)
 WHITE_PIECE_COLOUR = (255,255,255)
 BLACK_PIECE_COLOUR = (255,0,0)
+PIECE_COLOURS = {WHITE: WHITE_PIECE_COLOUR, BLACK: BLACK_PIECE_COLOUR}
 HIGHLIGHT_COLOUR = (173, 255, 47)
 VALID_MOVE_HIGHLIGHT_RADIUS = 10
 PIECE_RADIUS = 20
-PIECES_PER_SIDE = 12
-CROWN = pygame.transform.scale(pygame.image.load('images\\crown.png'), (25, 25))
-CLICK_SOUND = pygame.mixer.Sound('sounds\\click.wav')
-CROWN_SOUND = pygame.mixer.Sound('sounds\\crown.wav')
-WIN_SOUND = pygame.mixer.Sound('sounds\\win.wav')
+# Images and sounds are found next to this file, and are only loaded the
+# first time they are used.
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS = {
+    'crown': ('images', 'crown.png'),
+    'icon': ('images', 'icon.png'),
+    'click': ('sounds', 'click.wav'),
+    'crown sound': ('sounds', 'crown.wav'),
+    'win': ('sounds', 'win.wav'),
+}
+CROWN_SIZE = (25, 25)
+# The AI thinks in the background and posts its move as this event.
+AI_MOVE_EVENT = pygame.USEREVENT
+# Milliseconds the AI may think per move (None to search to its difficulty),
+# and whether it thinks on the player's time too.
+AI_TIME_BUDGET_MS = None
+PONDER = True
+
+
+# Loaded assets by name.
+_assets = {}
+
+
+def get_asset(name):
+
+    if name not in _assets:
+        path = os.path.join(ASSET_DIR, *ASSETS[name])
+        if path.endswith('.wav'):
+            _assets[name] = pygame.mixer.Sound(path)
+        elif name == 'crown':
+            _assets[name] = pygame.transform.scale(pygame.image.load(path), CROWN_SIZE)
+        else:
+            _assets[name] = pygame.image.load(path)
+    return _assets[name]
 
 
-class Piece:
+def draw_piece(piece, centre=None):
 
-    def __init__(self, colour, position, crowned=False):
-        self.colour = colour
-        self.position = position
-        self.crowned = crowned
+    # Draw a piece on its square, or centred on a point while it moves.
+    if centre == None:
+        centre = (piece.position[0] * SQUARE_WIDTH + (SQUARE_WIDTH // 2),
+        piece.position[1] * SQUARE_WIDTH + (SQUARE_WIDTH // 2))
 
-    def draw(self):
-        pygame.draw.circle(screen, self.colour, 
-        (self.position[0] * SQUARE_WIDTH + (SQUARE_WIDTH // 2), 
-        self.position[1] * SQUARE_WIDTH + (SQUARE_WIDTH // 2)), PIECE_RADIUS)
+    pygame.draw.circle(screen, PIECE_COLOURS[piece.colour], centre, PIECE_RADIUS)
 
-        # Draw crowns for crowned pieces.
-        if self.crowned == True:
-            screen.blit(CROWN, 
-            (self.position[0] * SQUARE_WIDTH + (SQUARE_WIDTH // 2) - CROWN.get_width()//2, 
-            self.position[1] * SQUARE_WIDTH + (SQUARE_WIDTH // 2) - CROWN.get_width()//2))
+    # Draw crowns for crowned pieces.
+    if piece.crowned == True:
+        crown = get_asset('crown')
+        screen.blit(crown, 
+        (centre[0] - crown.get_width()//2, 
+        centre[1] - crown.get_width()//2))
 
 
-class Board:
+class BoardView:
 
     def __init__(self):
-        
-        self.pieces = []
-
-        # Prepare White's pieces.
-        self.pieces += [Piece(WHITE_PIECE_COLOUR, [left, top]) for top 
-                        in range(ROWS-1, (ROWS-1)-(PIECES_PER_SIDE//(COLS//2)), -1) 
-                        for left in range((top + 1) % 2 , COLS, 2)]
-        # Prepare Black's pieces.
-        self.pieces += [Piece(BLACK_PIECE_COLOUR, [left, top]) for top 
-                        in range(0, (PIECES_PER_SIDE//(COLS//2)), 1) 
-                        for left in range((top + 1) % 2 , COLS, 2)]
-
-        self.no_of_white = PIECES_PER_SIDE
-        self.no_of_black = PIECES_PER_SIDE
-
-        self.turn = WHITE_PIECE_COLOUR
-        self.active_piece = None
-        self.active_piece_valid_moves = []
-
-        # Create a list to hold the pieces captured in that turn
-        self.captured_pieces = []
-
-    def draw(self):
 
+        # The checkered board never changes, so draw it once and copy parts
+        # of it over squares that need drawing again.
+        self.background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
         # First, draw a huge square in one colour.
-        pygame.draw.rect(screen, DARK_SQUARE_COLOUR, (0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
-        
+        self.background.fill(DARK_SQUARE_COLOUR)
         # Then draw the other squares to complete the checkered board.
         for top in range(ROWS):       
             for left in range(top % 2, COLS, 2):
-                pygame.draw.rect(screen, LIGHT_SQUARE_COLOUR,
+                pygame.draw.rect(self.background, LIGHT_SQUARE_COLOUR,
                     (left * SQUARE_WIDTH, top * SQUARE_WIDTH, SQUARE_WIDTH, SQUARE_WIDTH))
 
-        # Highlight the square the active piece is on (if any).
-        if self.active_piece != None:
-            pygame.draw.rect(screen, HIGHLIGHT_COLOUR, 
-            (self.active_piece.position[0] * SQUARE_WIDTH, 
-            self.active_piece.position[1] * SQUARE_WIDTH,
-            SQUARE_WIDTH, SQUARE_WIDTH))
-
-        # Next, draw the pieces.
-        for piece in self.pieces:
-            piece.draw()
-
-        # If there is an active piece, draw its valid moves.
-        for move in self.active_piece_valid_moves:
-            pygame.draw.circle(screen, HIGHLIGHT_COLOUR, 
-            (move[0] * SQUARE_WIDTH + (SQUARE_WIDTH // 2), 
-            move[1] * SQUARE_WIDTH + (SQUARE_WIDTH // 2)),
-            VALID_MOVE_HIGHLIGHT_RADIUS)
-
-        # Draw captured pieces
-        for piece in self.captured_pieces:
-            piece.draw()
-
-    def check_piece_at(self, position):
-        
-        # Check if any piece is in that position.
-        for piece in self.pieces:
-            if piece.position == position:
-                return piece
-        # Else, return 'None'
-        else:
-            return None
-
-    def set_active(self, piece):
+        # What was last drawn on each square, or None if the whole screen
+        # has to be drawn.
+        self.drawn = None
+        # The piece being moved, the points it passes through and when it
+        # started, and the rectangle it was last drawn in.
+        self.animation = None
 
-        self.active_piece = piece
-        # Check the possible moves the active piece can make.
-        self.active_piece_valid_moves = self.get_valid_moves(piece)
+    def invalidate(self):
+        self.drawn = None
 
-    def get_valid_moves(self, piece):
+    def get_cells(self, board):
 
-        valid_moves = []
+        # Work out what each square should show, as
+        # (highlighted, piece colour, crowned, valid move marker).
+        cells = {}
+        for piece in board.pieces + board.captured_pieces:
+            cells[tuple(piece.position)] = (False, piece.colour, piece.crowned, False)
 
-        if piece.crowned == False:
-
-            # These are the two simple moves an uncrowned piece can make.
-            if piece.colour == WHITE_PIECE_COLOUR:
-                options = [[1, -1], [-1, -1]]
-            else:
-                options = [[1, 1], [-1, 1]]
-
-        else:
-
-            # These are the four simple moves a crowned piece can make.
-            options = [[1, -1], [-1, -1], [1, 1], [-1, 1]]
-
-        # First check for any possible captures.
-        for option in options:
-
-            simple_move = [piece.position[0] + option[0], piece.position[1] + option[1]]
-            jump = [piece.position[0] + option[0] * 2, piece.position[1] + option[1] * 2]
-            piece_at_simple_move = self.check_piece_at(simple_move)
-            piece_at_jump = self.check_piece_at(jump)
-
-            # If there is a piece diagonally opposite
-            if (type(piece_at_simple_move) == Piece
-            # and the piece is an opponent piece
-            and piece_at_simple_move.colour != piece.colour
-            # and the jump destination is valid
-            and 0 <= jump[0] <= 7
-            and 0 <= jump[1] <= 7
-            # and there is no piece at the jump destination
-            and piece_at_jump == None):
-
-                # the capture is valid.
-                valid_moves.append(jump)
-
-        # Now check for simple moves (if no jumps are possible).
-        if valid_moves == []:
-            
-            for option in options:
-
-                simple_move = [piece.position[0] + option[0], piece.position[1] + option[1]]
-                piece_at_simple_move = self.check_piece_at(simple_move)
-
-                # If the move is in the board
-                if (0 <= simple_move[0] <= 7 
-                and 0 <= simple_move[1] <= 7
-                # and there is no piece at the destination.
-                and piece_at_simple_move == None):
-
-                    # the move is valid.
-                    valid_moves.append(simple_move)
-
-        return valid_moves
-
-    def make_move(self, piece, new_position):
-        
-        # Check if the move is a capture.
-        if abs(new_position[0] - piece.position[0]) == 2:
-            capture = True
-        else:
-            capture = False
-
-        # If the move is a capture...
-        if capture == True:
-            # ...check the piece to capture.
-            mid = [(new_position[0] + piece.position[0]) // 2,
-            (new_position[1] + piece.position[1]) // 2]
-            piece_to_capture = self.check_piece_at(mid)
-            # Capture the piece.
-            self.capture_piece(piece_to_capture)
-
-        # Move the piece to the new position.
-        piece.position = new_position
-
-    def capture_piece(self, piece):
-        
-        # Add the piece to the list of captured pieces.
-        self.captured_pieces.append(piece)
-        # Update the number of pieces.
-        if piece.colour == WHITE_PIECE_COLOUR:
-            self.no_of_white -= 1
-        else:
-            self.no_of_black -= 1
-        # Remove the piece from the list of pieces.
-        self.pieces.remove(piece)
-
-    def end_turn(self):
-
-        # Check for crowning.
-        if (self.active_piece.colour == WHITE_PIECE_COLOUR 
-        and self.active_piece.position[1] == 0
-        and self.active_piece.crowned == False):
-            self.crown_piece(self.active_piece)
-        elif (self.active_piece.colour == BLACK_PIECE_COLOUR 
-        and self.active_piece.position[1] == 7
-        and self.active_piece.crowned == False):
-            self.crown_piece(self.active_piece)
-        
-        # Reset the captured pieces.
-        self.captured_pieces.clear()
-
-        # Switch turns.
-        if self.turn == WHITE_PIECE_COLOUR:
-            self.turn = BLACK_PIECE_COLOUR
-        else:
-            self.turn = WHITE_PIECE_COLOUR
-        
-        # Reset the active piece.
-        self.active_piece = None
-        # Reset the valid moves.
-        self.active_piece_valid_moves.clear()
-
-    def crown_piece(self, piece):
-
-        # Crown the piece.
-        piece.crowned = True
-
-    def is_won(self):
-        # If it is Black's turn and Black has no pieces left...
-        if self.turn == BLACK_PIECE_COLOUR and self.no_of_black == 0:
-            return True
-        # If it is White's turn and White has no pieces left...
-        elif self.turn == WHITE_PIECE_COLOUR and self.no_of_white == 0:
-            return True
+        # Highlight the square the active piece is on (if any).
+        if board.active_piece != None:
+            position = tuple(board.active_piece.position)
+            cells[position] = (True,) + cells[position][1:]
+
+        # Mark the valid moves of the active piece.
+        for move in board.active_piece_valid_moves:
+            cells[tuple(move)] = (False, None, False, True)
+
+        # A moving piece is drawn separately until it arrives.
+        if self.animation != None:
+            cells.pop(self.animation['square'], None)
+
+        return cells
+
+    def get_rect(self, cell):
+        return pygame.Rect(cell[0] * SQUARE_WIDTH, cell[1] * SQUARE_WIDTH, SQUARE_WIDTH, SQUARE_WIDTH)
+
+    def draw_cell(self, cell, contents):
+
+        rect = self.get_rect(cell)
+        screen.blit(self.background, rect, rect)
+        if contents == None:
+            return rect
+
+        highlighted, colour, crowned, marker = contents
+        if highlighted:
+            pygame.draw.rect(screen, HIGHLIGHT_COLOUR, rect)
+        if colour != None:
+            draw_piece(Piece(colour, list(cell), crowned))
+        if marker:
+            pygame.draw.circle(screen, HIGHLIGHT_COLOUR, rect.center, VALID_MOVE_HIGHLIGHT_RADIUS)
+        return rect
+
+    def animate(self, piece, path):
+
+        # Move a piece along a list of squares. The board already shows the
+        # move, except for the piece itself.
+        points = [(x * SQUARE_WIDTH + SQUARE_WIDTH // 2, y * SQUARE_WIDTH + SQUARE_WIDTH // 2)
+                  for x, y in map(square_to_position, path)]
+        self.animation = {'piece': piece, 'points': points, 'start': pygame.time.get_ticks(),
+                          'square': tuple(square_to_position(path[-1])), 'rect': None}
+
+    def get_animation_point(self):
+
+        # Where the moving piece is now, or None if it has arrived.
+        points = self.animation['points']
+        progress = (pygame.time.get_ticks() - self.animation['start']) / ANIMATION_STEP_MS
+        step = int(progress)
+        if step >= len(points) - 1:
+            return None
+        (x0, y0), (x1, y1) = points[step], points[step + 1]
+        fraction = progress - step
+        return (round(x0 + (x1 - x0) * fraction), round(y0 + (y1 - y0) * fraction))
+
+    def update(self, board):
+
+        # Draw what has changed since the last update and push only those
+        # parts of the screen to the display.
+        cells = self.get_cells(board)
+        rects = []
+
+        if self.drawn == None:
+            screen.blit(self.background, (0, 0))
+            for cell, contents in cells.items():
+                self.draw_cell(cell, contents)
+            rects.append(screen.get_rect())
         else:
-            for piece in self.pieces:
-                if piece.colour == self.turn and self.get_valid_moves(piece) != []:
-                    break
-            # If the player has no pieces that can move..
-            else:
-                return True
-
-
-class AI:
-
-    def __init__(self, board, colour, difficulty):
-        self.board = board
-        self.colour = colour
-        self.difficulty = difficulty
-
-    def get_static_value(self, board_state, depth):
-        
-        static_value = 0
-
-        if board_state.is_won():
-            # If the AI wins...
-            if board_state.turn != self.colour:
-                static_value += 20
-            # If the AI loses...
-            else:
-                static_value -= 20
-            
-        for piece in board_state.pieces:
-
-            if piece.colour == self.colour:
-                if piece.crowned == False:
-                    # +1 for each uncrowned friendly  piece
-                    static_value += 1
-                else:
-                    # +2 for each crowned friendly piece
-                    static_value += 2
-            
-            else:
-                if piece.crowned == False:
-                    # -1 for each uncrowned opponent piece
-                    static_value -= 1
-                else:
-                    # -2 for each crowned opponent piece
-                    static_value -= 2 
-                
-        # Take the depth into account. We would like to win as quickly as possible.
-        static_value -= depth
-
-        return static_value
-
-    def get_future_piece_states(self, board_state, piece):
-
-        future_piece_states = []
-
-        # Get all the positions the piece can move to.
-        valid_moves = board_state.get_valid_moves(piece)
-
-        for position in valid_moves:
-
-            # Make a copy of the board and the piece.
-            copy_board_state = copy.deepcopy(board_state)
-            copy_piece = copy.deepcopy(piece)
-
-            # Set the piece as active.
-            copy_board_state.set_active(copy_piece)
-
-            # Make each move. Captures are done within the method.
-            copy_board_state.make_move(copy_piece, position)
-
-            # Check the piece's next moves.
-            next_valid_moves = copy_board_state.get_valid_moves(copy_piece)
-
-            # If a multi-jump is possible.
-            if (copy_board_state.captured_pieces != []
-            and next_valid_moves != []
-            and abs(next_valid_moves[0][0] - copy_board_state.active_piece.position[0]) == 2):
-
-                # Call recursively.
-                more_states = self.get_future_piece_states(copy_board_state, copy_piece)
-                # Add the new states to the list.
-                future_piece_states.extend(more_states)
-
+            for cell in set(cells) | set(self.drawn):
+                if cells.get(cell) != self.drawn.get(cell):
+                    rects.append(self.draw_cell(cell, cells.get(cell)))
+
+        if self.animation != None:
+            # Draw over where the piece was last time.
+            previous = self.animation['rect']
+            if previous != None:
+                for x in range(previous.left // SQUARE_WIDTH, (previous.right - 1) // SQUARE_WIDTH + 1):
+                    for y in range(previous.top // SQUARE_WIDTH, (previous.bottom - 1) // SQUARE_WIDTH + 1):
+                        rects.append(self.draw_cell((x, y), cells.get((x, y))))
+
+            point = self.get_animation_point()
+            if point == None:
+                # The piece has arrived, so its square is drawn as usual.
+                square = self.animation['square']
+                self.animation = None
+                cells = self.get_cells(board)
+                rects.append(self.draw_cell(square, cells.get(square)))
             else:
-                # End turn.
-                copy_board_state.end_turn()
-                # Put the piece into the board.
-                copy_board_state.pieces.append(copy_piece)
-                # Save the board state to the list.
-                future_piece_states.append(copy_board_state)
-
-        return future_piece_states
-
-    def get_future_board_states(self, board_state):
-
-        future_board_states = []
-
-        for piece in board_state.pieces:
-
-            if piece.colour == board_state.turn:
-
-                # Check the piece's valid moves.
-                valid_moves = board_state.get_valid_moves(piece)
-
-                # If the piece cannot move, skip.
-                if len(valid_moves) == 0:
-                    continue
-
-                # If the piece can capture,
-                elif abs(valid_moves[0][0] - piece.position[0]) == 2:
-                    # Store the piece index.
-                    index = board_state.pieces.index(piece)
-                    # Separate the piece from the board.
-                    board_state.pieces.remove(piece)
-                    # Get future states.
-                    future_board_states.extend(self.get_future_piece_states(board_state, piece))
-                    # Put the piece back into the board.
-                    board_state.pieces.insert(index, piece)
-
-                else:
-
-                    for other_piece in board_state.pieces:
-                        other_piece_valid_moves = board_state.get_valid_moves(other_piece)
-                        # Check if any other piece can capture.
-                        if (other_piece.colour == board_state.turn
-                        and other_piece_valid_moves != [] 
-                        and abs(other_piece_valid_moves[0][0] - other_piece.position[0]) == 2):
-                            break
-
-                    # If no other piece can capture, then the piece can move.
-                    else:
-                        # Store the piece index.
-                        index = board_state.pieces.index(piece)
-                        # Separate the piece from the board.
-                        board_state.pieces.remove(piece)
-                        # Get future states.
-                        future_board_states.extend(self.get_future_piece_states(board_state, piece))
-                        # Put the piece back into the board.
-                        board_state.pieces.insert(index, piece)
-
-        return future_board_states
-
-    def get_best_move(self, board_state, alpha, beta, depth, depth_limit, is_maximizer):
-    
-        if depth == depth_limit or board_state.is_won():
-            return (board_state, self.get_static_value(board_state, depth))
-    
-        # Get all possible future states.
-        future_states = self.get_future_board_states(board_state)
-    
-        # Shuffle the future states.
-        random.shuffle(future_states)
-    
-        if is_maximizer:
-        
-            evaluated_states = []
-    
-            for state in future_states:
-                # Call recursively to get the static value of that branch.
-                evaluated_state = self.get_best_move(state, alpha, beta, depth + 1, depth_limit, False)
-                evaluated_states.append((state, evaluated_state[1]))
-                # Compare with alpha.
-                if evaluated_state[1] > alpha:
-                    alpha = evaluated_state[1]
-                # Check for pruning.
-                if beta <= min(evaluated_states, key=lambda evaluated_state: evaluated_state[1])[1]:
-                    break
-                
-            # Return the largest (max) option.
-            return max(evaluated_states, key=lambda evaluated_states: evaluated_states[1])
-    
+                draw_piece(self.animation['piece'], point)
+                rect = pygame.Rect(0, 0, 2 * PIECE_RADIUS, 2 * PIECE_RADIUS)
+                rect.center = point
+                self.animation['rect'] = rect
+                rects.append(rect)
+
+        self.drawn = cells
+        if rects != []:
+            pygame.display.update(rects)
+
+
+def get_move_path(board, move):
+
+    # The squares a piece passes through, from the start to the end of a
+    # move. The move has not been made on the board yet.
+    start, end, captured = move
+    path = [start]
+    bit = 1 << start
+    while captured:
+        for step, back in ALL_STEPS:
+            over = step(bit) & captured
+            if over and step(over):
+                captured ^= over
+                bit = step(over)
+                path.append(bit.bit_length() - 1)
+                break
         else:
-        
-            evaluated_states = []
-    
-            for state in future_states:
-                # Call recursively to get the static value of that branch.
-                evaluated_state = self.get_best_move(state, alpha, beta, depth + 1, depth_limit, True)
-                evaluated_states.append((state, evaluated_state[1]))
-                # Compare with beta.
-                if evaluated_state[1] < beta:
-                    beta = evaluated_state[1]
-                # Check for pruning.
-                if alpha >= max(evaluated_states, key=lambda evaluated_state: evaluated_state[1])[1]:
-                    break
-                
-            # Return the smallest (min) option.
-            return min(evaluated_states, key=lambda evaluated_states: evaluated_states[1])
-    
-    def play(self):
-        self.board = self.get_best_move(self.board, float('-inf'), float('+inf'), 0, self.difficulty, True)[0]
-        return self.board
+            break
+    if path[-1] != end:
+        path.append(end)
+    return path
 
 
 def refresh_display():
+    view.update(b)
 
-    screen.fill((0,0,0))
-    b.draw()
-    pygame.display.update()
 
+def post_ai_move(move, key):
 
-def main():
+    # Called from the AI's thread. Hand the move to the event loop.
+    pygame.event.post(pygame.event.Event(AI_MOVE_EVENT, move=move, key=key))
 
-    global b
+
+def main():
 
     refresh_display()
 
+    # Start the AI thinking if it moves first.
+    if b.turn == ai.colour:
+        search.start(b)
+
     running = True
     while running:
 
-        # Limit the framerate.
-        clock.tick(FPS)
-
-        if b.turn == ai.colour:
-            b = ai.play()
-            refresh_display()
-            continue
+        # Limit the framerate (moving pieces need more frames).
+        clock.tick(ANIMATION_FPS if view.animation != None else FPS)
 
         for event in pygame.event.get():
 
@@ -471,8 +261,39 @@ def main():
             if event.type == pygame.QUIT:
                 running = False
 
-            # Did the user click the mouse?
-            elif event.type == pygame.MOUSEBUTTONUP:
+            # Draw everything again if the window was covered up.
+            elif event.type == pygame.VIDEOEXPOSE:
+                view.invalidate()
+
+            # Escape makes the AI play the best move it has found so far.
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                search.move_now()
+
+            # Has the AI chosen its move?
+            elif event.type == AI_MOVE_EVENT:
+
+                # Ignore moves meant for a position that is no longer on the board.
+                if (event.key == b.key
+                and b.turn == ai.colour
+                and event.move != None):
+
+                    piece = b.get_piece(event.move[0])
+                    path = get_move_path(b, event.move)
+                    b.apply_move(event.move)
+                    # Check if the game is won.
+                    if b.is_won():
+                        refresh_display()
+                        get_asset('win').play()
+                        clock.tick(1)
+                        running = False
+                    else:
+                        # Slide the piece to its new square.
+                        view.animate(piece, path)
+                        # Think about the expected reply on the player's time.
+                        search.start_pondering(b)
+
+            # Did the user click the mouse (while it is their turn)?
+            elif event.type == pygame.MOUSEBUTTONUP and b.turn != ai.colour:
                 
                 # Save the position of the mouse.
                 mouse_position = pygame.mouse.get_pos()
@@ -491,37 +312,13 @@ def main():
                 # and a move is not in progress
                 and b.captured_pieces == []):
 
-                    # Check its valid moves
-                    valid_moves = b.get_valid_moves(clicked)
-
-                    # If the piece has no valid moves, skip
-                    if valid_moves == []:
-                        pass
-
-                    # If the piece can capture...
-                    elif abs(valid_moves[0][0] - clicked.position[0]) == 2:
-                        # ...set that piece as active.
+                    # The piece can be picked up if a legal move starts from
+                    # it. Captures are compulsory, so while any piece can
+                    # capture only those pieces have legal moves.
+                    square = position_to_square(clicked.position)
+                    if any(move[0] == square for move in b.get_legal_moves()):
                         b.set_active(clicked)
 
-                    # If the piece cannot capture, check if any other piece can
-                    else:
-
-                        for piece in b.pieces:
-                            # If it is that colour's turn,
-                            if piece.colour == b.turn:
-                                # check all its valid moves
-                                piece_moves = b.get_valid_moves(piece)
-                                # If the piece can move and capture
-                                if (piece_moves != []
-                                and abs(piece_moves[0][0] - piece.position[0]) == 2):
-                                    break
-
-                        # If no other piece can capture
-                        else:
-                            # set it as active
-                            b.set_active(clicked)
-                                              
-
                 # If the user clicks on a position and it's a valid position...
                 elif col_row in b.active_piece_valid_moves:
 
@@ -529,17 +326,14 @@ def main():
                     # (make captures if possible)
                     b.make_move(b.active_piece, col_row)
                     # Play sound.
-                    CLICK_SOUND.play()
+                    get_asset('click').play()
                     
-                    next_moves = b.get_valid_moves(b.active_piece)
-                    # If a piece has been captured....
-                    if (b.captured_pieces != []
-                    # but the active piece can still move...
-                    and next_moves != []
-                    # and capture...
-                    and abs(next_moves[0][0] - b.active_piece.position[0]) == 2):
+                    # If a piece has been captured but the active piece can
+                    # capture again...
+                    next_jumps = b.get_piece_jumps(position_to_square(b.active_piece.position))
+                    if b.captured_pieces != [] and next_jumps != []:
                         # Reset the valid moves but do not end turn
-                        b.active_piece_valid_moves = next_moves
+                        b.active_piece_valid_moves = [square_to_position(land) for over, land in next_jumps]
 
                     else:
                         # End the turn
@@ -547,27 +341,48 @@ def main():
                         # Check if the game is won.
                         if b.is_won():
                             refresh_display()
-                            WIN_SOUND.play()
+                            get_asset('win').play()
                             clock.tick(1)
                             running = False
+                        # Let the AI think about its move.
+                        else:
+                            search.opponent_moved(b)
+
+        # Keep the display up to date while the AI thinks. Only the squares
+        # that changed are drawn.
+        refresh_display()
+
+    # Stop the AI before closing.
+    search.cancel()
+
+
+def setup():
+
+    global b, ai, search, screen, view, clock
 
-                # Refresh the display after each click.
-                refresh_display()
+    # Initialize the pygame module.
+    pygame.init()
 
+    # Create a new board object.
+    b = Board()
+    # Create the AI
+    ai = AI(b, BLACK, 2)
+    # Run its searches off the event loop.
+    search = BackgroundSearch(ai, post_ai_move, AI_TIME_BUDGET_MS, PONDER)
+    # Create the screen.
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    # Set a window caption.
+    pygame.display.set_caption('English Draughts!')
+    # Add an icon.
+    pygame.display.set_icon(get_asset('icon'))
 
-# Create a new board object.
-b = Board()
-# Create the AI
-ai = AI(b, BLACK_PIECE_COLOUR, 2)
-# Create the screen.
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-# Set a window caption.
-pygame.display.set_caption('English Draughts!')
-# Add an icon.
-pygame.display.set_icon(pygame.image.load('images\\icon.png'))
+    # Create the view, which only draws what changes.
+    view = BoardView()
 
-# Create a 'Clock' object
-clock = pygame.time.Clock()
+    # Create a 'Clock' object
+    clock = pygame.time.Clock()
 
 
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    setup()
+    main()
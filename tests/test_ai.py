@@ -0,0 +1,84 @@
+# The minimax AI: fixed-depth, timed, stopped and parallel searches.
+
+import os
+import threading
+import time
+
+from checkers.ai import AI
+from checkers.bench import get_positions
+from checkers.bitboard import BitBoard, WHITE
+from checkers.notation import read_fen
+from checkers.parallel import ParallelAI
+
+
+def test_fixed_depth_search():
+    board = BitBoard()
+    ai = AI(board, WHITE, 4, seed=1)
+    move = ai.choose_move()
+    assert move in board.get_legal_moves()
+    assert ai.depth_reached == 4
+    assert ai.principal_variation[0] == move
+    assert board.history == []
+
+
+def test_a_won_position_is_taken():
+    # A capture of the last piece ends the game.
+    board = read_fen('B:W18:B14')
+    ai = AI(board, board.turn, 4)
+    assert ai.choose_move() == board.get_legal_moves()[0]
+    assert ai.value > 0
+
+
+def test_timed_search_keeps_to_its_budget():
+    board = BitBoard()
+    ai = AI(board, WHITE, 2, seed=1)
+    start = time.perf_counter()
+    move = ai.choose_move(100)
+    assert time.perf_counter() - start < 1
+    assert move in board.get_legal_moves()
+    assert ai.depth_reached >= 1
+    assert board.history == []
+
+
+def test_stop_ends_a_search_with_a_move():
+    board = BitBoard()
+    ai = AI(board, WHITE, 40, seed=1)
+    threading.Timer(0.1, ai.stop).start()
+    start = time.perf_counter()
+    move = ai.choose_move()
+    assert time.perf_counter() - start < 2
+    assert move in board.get_legal_moves()
+    assert board.history == []
+
+    # The next search is not stopped.
+    ai.difficulty = 6
+    assert ai.choose_move() in board.get_legal_moves()
+    assert ai.depth_reached > 0
+    assert ai.nodes > 256
+
+
+def test_parallel_search_matches_serial_search():
+    serial = AI(None, None, 4, shuffle=False)
+    parallel = ParallelAI(None, None, 4, workers=2, shuffle=False)
+    try:
+        for board in get_positions(5):
+            for ai in (serial, parallel):
+                ai.board = board.copy()
+                ai.colour = board.turn
+            assert parallel.choose_move() == serial.choose_move()
+            assert parallel.value == serial.value
+    finally:
+        parallel.close()
+
+
+def test_each_search_is_profiled_once(tmp_path):
+    board = BitBoard()
+    ai = ParallelAI(board, WHITE, 2, workers=2, profile_dir=str(tmp_path), seed=1)
+    try:
+        for move in range(3):
+            ai.colour = board.turn
+            ai.play()
+    finally:
+        ai.close()
+    assert sorted(os.listdir(tmp_path)) == ['search-%d-%d.prof' % (os.getpid(), number)
+                                            for number in (1, 2, 3)]
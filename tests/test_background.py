@@ -0,0 +1,110 @@
+# Searching in a background thread: delivering moves, pondering on the
+# expected reply, cancelling and moving at once.
+
+import queue
+import time
+
+from checkers.ai import AI
+from checkers.background import BackgroundSearch
+from checkers.bitboard import BitBoard
+
+# How long to wait for a move before failing.
+TIMEOUT = 10
+
+
+def make_search(difficulty=4, time_budget_ms=None, ponder=False):
+
+    # Return a BackgroundSearch that puts the (move, key) pairs it delivers
+    # on a queue, and the queue.
+    moves = queue.Queue()
+    ai = AI(None, None, difficulty, seed=1)
+    search = BackgroundSearch(ai, lambda move, key: moves.put((move, key)), time_budget_ms, ponder)
+    return search, moves
+
+
+def start_pondering(search, moves, board):
+
+    # Let the AI move in board and start pondering on a reply. The reply is
+    # set rather than taken from the search, so that the guessed position
+    # has more than one move and the pondering search runs until the
+    # opponent moves.
+    move, key = moves.get(timeout=TIMEOUT)
+    board.apply_move(move)
+    for reply in board.get_legal_moves():
+        guess = board.copy()
+        guess.apply_move(reply)
+        if len(guess.get_legal_moves()) > 1:
+            break
+    search.expected_reply = reply
+    search.start_pondering(board)
+    assert search.pondering and search.is_thinking()
+    return reply
+
+
+def test_a_search_delivers_a_move():
+    search, moves = make_search()
+    board = BitBoard()
+    search.start(board)
+    move, key = moves.get(timeout=TIMEOUT)
+    assert move in board.get_legal_moves()
+    assert key == board.key
+    # The search works on a board of its own.
+    assert board.history == []
+
+
+def test_a_ponder_hit_keeps_the_search():
+    search, moves = make_search(time_budget_ms=100, ponder=True)
+    board = BitBoard()
+    search.start(board)
+    reply = start_pondering(search, moves, board)
+    thread = search.thread
+
+    board.apply_move(reply)
+    search.opponent_moved(board)
+    move, key = moves.get(timeout=TIMEOUT)
+    assert move in board.get_legal_moves()
+    assert key == board.key
+    assert (search.ponder_hits, search.ponder_misses) == (1, 0)
+    # The pondering search itself gave the move.
+    assert search.thread is thread
+
+
+def test_a_ponder_miss_starts_again():
+    search, moves = make_search(time_budget_ms=100, ponder=True)
+    board = BitBoard()
+    search.start(board)
+    reply = start_pondering(search, moves, board)
+    stale_key = search.key
+
+    board.apply_move([move for move in board.get_legal_moves() if move != reply][0])
+    search.opponent_moved(board)
+    move, key = moves.get(timeout=TIMEOUT)
+    assert move in board.get_legal_moves()
+    assert key == board.key != stale_key
+    assert (search.ponder_hits, search.ponder_misses) == (0, 1)
+
+    # The search of the guessed position never delivers its move.
+    search.thread.join()
+    assert moves.empty()
+
+
+def test_cancel_throws_the_search_away():
+    search, moves = make_search(difficulty=40)
+    search.start(BitBoard())
+    time.sleep(0.1)
+    start = time.perf_counter()
+    search.cancel()
+    assert time.perf_counter() - start < 2
+    assert not search.is_thinking()
+    assert moves.empty()
+
+
+def test_move_now_delivers_the_best_move_so_far():
+    search, moves = make_search(difficulty=40)
+    board = BitBoard()
+    search.start(board)
+    time.sleep(0.1)
+    search.move_now()
+    move, key = moves.get(timeout=2)
+    assert move in board.get_legal_moves()
+    assert key == board.key
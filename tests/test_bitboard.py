@@ -0,0 +1,100 @@
+# Rules of the bitboard engine. Positions are written as FEN strings and
+# moves in PDN (see checkers.notation), where the side moving first is Black.
+
+import random
+
+from checkers.bitboard import BitBoard, WHITE, BLACK, squares
+from checkers.notation import read_fen, write_fen, format_move
+
+
+def get_moves(fen):
+    board = read_fen(fen)
+    return sorted(format_move(board, move) for move in board.get_legal_moves())
+
+
+def play_random_game(seed, plies=80):
+
+    # Yield the board before every move of a random game, with the move.
+    rng = random.Random(seed)
+    board = BitBoard()
+    for ply in range(plies):
+        moves = board.get_legal_moves()
+        if moves == []:
+            return
+        move = rng.choice(moves)
+        yield board, move
+        board.push(move)
+
+
+def test_opening_moves():
+    assert get_moves(write_fen(BitBoard())) == ['10-14', '10-15', '11-15', '11-16', '12-16',
+                                                '9-13', '9-14']
+
+
+def test_captures_are_compulsory():
+    assert get_moves('B:W18,30:B14,1') == ['14x23']
+
+
+def test_multi_jumps_are_one_move():
+    assert get_moves('B:W18,26:B14') == ['14x23x30']
+    assert get_moves('B:W26,27:B23') == ['23x30', '23x32']
+
+
+def test_crowning_ends_the_move():
+    # As a king the piece could go on to take 27, but a man crowned by a
+    # jump stops there.
+    assert get_moves('B:W26,27:B22') == ['22x31']
+
+
+def test_only_kings_move_backwards():
+    assert get_moves('B:W30:B14') == ['14-17', '14-18']
+    assert get_moves('B:W30:BK14') == ['14-10', '14-17', '14-18', '14-9']
+
+
+def test_a_side_without_moves_has_lost():
+    assert read_fen('W:W:B1').is_won()
+    assert read_fen('W:W32:B27,28,23,24').is_won()
+    assert not BitBoard().is_won()
+
+
+def test_piece_moves_match_legal_moves():
+
+    # The moves the display asks for one piece at a time are the legal moves.
+    for seed in range(5):
+        for board, played in play_random_game(seed):
+            own = board.white if board.turn == WHITE else board.black
+            piece_moves = [move for square in squares(own) for move in board.get_piece_moves(square)]
+            if any(move[2] for move in piece_moves):
+                piece_moves = [move for move in piece_moves if move[2]]
+            assert sorted(piece_moves) == sorted(board.get_legal_moves())
+
+
+def test_push_and_pop_restore_the_position():
+
+    for seed in range(5):
+        states = []
+        for board, move in play_random_game(seed):
+            # The key is kept up to date move by move.
+            assert board.key == board.get_key()
+            states.append((board.white, board.black, board.kings, board.turn, board.key))
+        assert len(board.history) == len(states)
+        while board.history != []:
+            board.pop()
+            assert (board.white, board.black, board.kings, board.turn, board.key) == states.pop()
+
+
+def test_apply_move_matches_push():
+    for board, move in play_random_game(7):
+        copy = board.copy()
+        copy.apply_move(move)
+        board.push(move)
+        assert (copy.white, copy.black, copy.kings, copy.turn, copy.key) == (
+            board.white, board.black, board.kings, board.turn, board.key)
+        board.pop()
+
+
+def test_turns_alternate():
+    board = BitBoard()
+    assert board.turn == WHITE
+    board.push(board.get_legal_moves()[0])
+    assert board.turn == BLACK
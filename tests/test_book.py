@@ -0,0 +1,210 @@
+# Opening books: building them from game records, the file format, lookups
+# by binary search and the AI playing from them.
+
+import random
+
+import pytest
+
+from checkers.ai import AI
+from checkers.bitboard import BitBoard, WHITE, BLACK
+from checkers.book import (OpeningBook, write_book, add_game, MAGIC, HEADER, ENTRY, MAX_WEIGHT,
+                           BOOK_PLIES)
+from checkers.records import GameWriter, read_games, DRAW, UNKNOWN
+
+from test_notation import get_random_games
+
+RESULTS = [WHITE, BLACK, DRAW, UNKNOWN]
+
+
+def get_expected_moves(games, plies):
+
+    # Count the book moves of every position as the book should: the moves
+    # of the first plies of each game, leaving out those of the loser.
+    expected = {}
+    for moves, result in games:
+        loser = {WHITE: BLACK, BLACK: WHITE}.get(result)
+        board = BitBoard()
+        for move in moves[:plies]:
+            if board.turn != loser:
+                position = expected.setdefault(board.key, {})
+                position[move] = position.get(move, 0) + 1
+            board.apply_move(move)
+    return expected
+
+
+@pytest.fixture(scope='module')
+def games():
+
+    # Random games, with the same opening in several of them so that some
+    # moves have more weight than others.
+    games = [moves for moves in get_random_games(30) if len(moves) > 4]
+    rng = random.Random(5)
+    for number in range(10):
+        board = BitBoard()
+        moves = games[0][:4]
+        for move in moves:
+            board.apply_move(move)
+        while len(moves) < 40 and board.get_legal_moves() != []:
+            moves.append(rng.choice(board.get_legal_moves()))
+            board.apply_move(moves[-1])
+        games.append(moves)
+    return [(moves, RESULTS[number % len(RESULTS)]) for number, moves in enumerate(games)]
+
+
+@pytest.fixture(scope='module')
+def book_path(games, tmp_path_factory):
+
+    # Write the games as records and build a book from them as
+    # python -m checkers.book build --records does.
+    directory = tmp_path_factory.mktemp('book')
+    writer = GameWriter(str(directory / 'games.bin'))
+    for moves, result in games:
+        writer.write(moves, result)
+    writer.close()
+
+    weights = {}
+    for game in read_games(str(directory / 'games.bin')):
+        add_game(weights, game.get_moves(), BOOK_PLIES, {WHITE: BLACK, BLACK: WHITE}.get(game.result))
+    path = str(directory / 'book.bin')
+    write_book(path, weights)
+    return path
+
+
+@pytest.fixture
+def book(book_path):
+    book = OpeningBook(book_path)
+    yield book
+    book.close()
+
+
+def get_boards(games, plies):
+
+    # Return the positions of the first plies of the games by key.
+    boards = {}
+    for moves, result in games:
+        board = BitBoard()
+        for move in moves[:plies]:
+            boards[board.key] = board.copy()
+            board.apply_move(move)
+    return boards
+
+
+def test_add_game_skips_the_losers_moves():
+    moves = get_random_games(1)[0][:6]
+    weights = {}
+    add_game(weights, moves, 4, BLACK)
+    add_game(weights, moves, 4)
+    board = BitBoard()
+    for ply, move in enumerate(moves[:5]):
+        # White moves first. Only four plies are counted.
+        expected = 0 if ply >= 4 else 2 if board.turn == WHITE else 1
+        assert weights.get((board.key, move), 0) == expected
+        board.apply_move(move)
+
+
+def test_write_book_format(tmp_path):
+    path = str(tmp_path / 'book.bin')
+    key = BitBoard().key
+    weights = {(key + 1, (9, 13, 0)): 3, (key, (10, 14, 0)): MAX_WEIGHT + 5,
+               (key, (9, 14, 0)): 2, (key, (11, 15, 0)): 0}
+    assert write_book(path, weights) == 3
+
+    with open(path, 'rb') as file:
+        data = file.read()
+    assert HEADER.unpack_from(data, 0) == (MAGIC, 3)
+    assert len(data) == HEADER.size + 3 * ENTRY.size
+    # Sorted by key, with the weights capped and unweighted moves left out.
+    assert [ENTRY.unpack_from(data, HEADER.size + number * ENTRY.size) for number in range(3)] == [
+        (key, 0, 9, 14, 2), (key, 0, 10, 14, MAX_WEIGHT), (key + 1, 0, 9, 13, 3)]
+
+
+def test_book_holds_the_openings_of_the_games(games, book):
+    expected = get_expected_moves(games, BOOK_PLIES)
+    boards = get_boards(games, BOOK_PLIES)
+    assert book.size == sum(len(moves) for moves in expected.values())
+    for key, board in boards.items():
+        assert dict(book.get_moves(board)) == expected.get(key, {})
+
+
+def test_first_and_last_keys_are_found(games, book):
+    boards = get_boards(games, BOOK_PLIES)
+    expected = get_expected_moves(games, BOOK_PLIES)
+    for number in (0, book.size - 1):
+        key = book.get_entry(number)[0]
+        assert dict(book.get_moves(boards[key])) == expected[key]
+
+
+def test_positions_not_in_the_book(games, book):
+    # Positions past the book's plies, and keys before the first and after
+    # the last entry.
+    boards = get_boards(games, BOOK_PLIES + 10)
+    expected = get_expected_moves(games, BOOK_PLIES)
+    missing = [board for key, board in boards.items() if key not in expected]
+    assert missing != []
+    for board in missing:
+        assert book.get_moves(board) == []
+
+    board = BitBoard()
+    for key in (book.get_entry(0)[0] - 1, book.get_entry(book.size - 1)[0] + 1):
+        board.key = key
+        assert book.get_moves(board) == []
+
+
+def test_moves_that_are_not_legal_are_skipped(tmp_path):
+
+    # Another position with the same key would have other moves, which are
+    # not legal here.
+    path = str(tmp_path / 'book.bin')
+    board = BitBoard()
+    legal = board.get_legal_moves()[0]
+    write_book(path, {(board.key, legal): 1, (board.key, (9, 13, 0)): 5, (board.key, (0, 31, 0)): 5})
+    book = OpeningBook(path)
+    try:
+        assert book.get_moves(board) == [(legal, 1)]
+        assert book.choose_move(board, random.Random(1)) == legal
+    finally:
+        book.close()
+
+
+def test_choose_move_plays_only_book_moves(games, book):
+    rng = random.Random(1)
+    expected = get_expected_moves(games, BOOK_PLIES)
+    for key, board in get_boards(games, BOOK_PLIES + 10).items():
+        move = book.choose_move(board, rng)
+        if key in expected:
+            assert move in expected[key]
+        else:
+            assert move == None
+
+    # The moves are chosen by weight.
+    chosen = [book.choose_move(BitBoard(), rng) for number in range(200)]
+    weights = expected[BitBoard().key]
+    assert set(chosen) == set(weights)
+    heaviest = max(weights, key=weights.get)
+    assert chosen.count(heaviest) == max(chosen.count(move) for move in weights)
+
+
+def test_the_ai_plays_from_the_book(games, book_path):
+    expected = get_expected_moves(games, BOOK_PLIES)
+    board = BitBoard()
+    ai = AI(board, WHITE, 4, book=book_path, seed=1)
+    try:
+        move = ai.choose_move()
+        assert ai.from_book
+        assert move in expected[board.key]
+
+        # A position out of the book is searched.
+        for moves, result in games:
+            board = BitBoard()
+            for move in moves[:BOOK_PLIES + 10]:
+                board.apply_move(move)
+            if board.key not in expected and board.get_legal_moves() != []:
+                break
+        assert board.key not in expected
+        ai.board = board
+        ai.colour = board.turn
+        assert ai.choose_move() in board.get_legal_moves()
+        assert not ai.from_book
+        assert ai.depth_reached == 4
+    finally:
+        ai.book.close()
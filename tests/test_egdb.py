@@ -0,0 +1,121 @@
+# Endgame databases, checked position by position against their own moves.
+
+import pytest
+
+from checkers.ai import AI
+from checkers.bitboard import BitBoard, WHITE, BLACK
+from checkers.egdb import (EndgameDatabase, DRAW, build, get_distance, get_position,
+                           get_slice_size, reverse)
+
+
+@pytest.fixture(scope='module')
+def two_piece_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('egdb') / 'endgame.bin')
+    build(2, path, workers=1)
+    return path
+
+
+@pytest.fixture(scope='module')
+def two_pieces(two_piece_path):
+    database = EndgameDatabase(two_piece_path)
+    yield database
+    database.close()
+
+
+def get_expected(database, board):
+
+    # Work out the value of a position from the values of the positions its
+    # moves lead to: the quickest win if there is one, else a draw, else the
+    # slowest loss.
+    wins = []
+    losses = []
+    draw = False
+    for move in board.get_legal_moves():
+        board.push(move)
+        # Taking the last piece wins at once.
+        value = 1 if not board.black else database.probe(board)
+        board.pop()
+        if value == DRAW:
+            draw = True
+        else:
+            distance, wins_there = get_distance(value)
+            (losses if wins_there else wins).append(distance + 1)
+    if wins != []:
+        return min(wins) + 1
+    if draw:
+        return DRAW
+    return max(losses, default=0) + 1
+
+
+def check_database(database):
+
+    # Return the number of positions checked and the number that are wrong.
+    checked = wrong = 0
+    for slice in database.slices:
+        for index in range(get_slice_size(slice)):
+            position = get_position(slice, index)
+            if position == None:
+                continue
+            board = BitBoard(position[0], position[1], position[2], WHITE)
+            checked += 1
+            wrong += database.probe(board) != get_expected(database, board)
+    return checked, wrong
+
+
+def test_two_piece_values_follow_from_their_moves(two_pieces):
+    checked, wrong = check_database(two_pieces)
+    assert checked > 0
+    assert wrong == 0
+
+
+@pytest.mark.slow
+def test_three_piece_values_follow_from_their_moves(tmp_path):
+    path = str(tmp_path / 'endgame.bin')
+    build(3, path)
+    database = EndgameDatabase(path)
+    checked, wrong = check_database(database)
+    database.close()
+    assert checked > 100000
+    assert wrong == 0
+
+
+def test_black_to_move_is_the_board_turned_around(two_pieces):
+    for slice in two_pieces.slices:
+        for index in range(get_slice_size(slice)):
+            position = get_position(slice, index)
+            if position == None:
+                continue
+            white, black, kings = position
+            turned = BitBoard(reverse(black), reverse(white), reverse(kings), BLACK)
+            assert two_pieces.probe(turned) == two_pieces.probe(BitBoard(white, black, kings, WHITE))
+
+
+def test_positions_outside_the_database(two_pieces):
+    assert two_pieces.probe(BitBoard()) == None
+    assert two_pieces.probe(BitBoard(1 << 20, 0, 0, WHITE)) == None
+
+
+def test_the_ai_plays_the_quickest_win(two_piece_path, two_pieces):
+
+    # Take the won positions with a quiet choice of moves, and check that the
+    # AI picks a move that loses for the opponent as quickly as any.
+    checked = 0
+    for slice in two_pieces.slices:
+        for index in range(get_slice_size(slice)):
+            position = get_position(slice, index)
+            if position == None:
+                continue
+            board = BitBoard(position[0], position[1], position[2], WHITE)
+            value = two_pieces.probe(board)
+            moves = board.get_legal_moves()
+            if value == DRAW or not get_distance(value)[1] or len(moves) < 2 or moves[0][2]:
+                continue
+
+            ai = AI(board, WHITE, 3, endgame=two_piece_path, shuffle=False)
+            board.push(ai.choose_move())
+            assert two_pieces.probe(board) == value - 1
+            board.pop()
+            checked += 1
+            if checked == 50:
+                return
+    assert checked > 0
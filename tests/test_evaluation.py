@@ -0,0 +1,80 @@
+# Evaluation features, one position at a time and in NumPy batches.
+
+import json
+
+import pytest
+
+from checkers.ai import AI
+from checkers.bitboard import BitBoard, WHITE, BLACK
+from checkers.evaluation import Evaluator, FEATURES, DEFAULT_WEIGHTS, load_weights
+from checkers.notation import read_fen
+
+from test_notation import get_random_games
+
+# Every feature weighed, so that a mistake in any of them shows.
+ALL_WEIGHTS = {'men': 10, 'kings': 25, 'advancement': 1, 'back_rank': 2, 'centre': 3,
+               'mobility': 1, 'won': 500}
+
+
+def get_positions():
+
+    # Every position of a few random games, with both sides to move.
+    positions = []
+    for moves in get_random_games(10):
+        board = BitBoard()
+        for move in moves:
+            positions.append(board.copy())
+            board.apply_move(move)
+        positions.append(board.copy())
+    return positions
+
+
+def test_default_weights_count_material():
+    # Three men and three kings (Black in FEN, White here) against four men
+    # and two kings.
+    board = read_fen('B:W18,24,27,28,K10,K15:B12,16,20,K22,K25,K29')
+    evaluator = Evaluator()
+    assert evaluator.evaluate(board, WHITE) == 1
+    assert evaluator.evaluate(board, BLACK) == -1
+    board = read_fen('B:W18,24,27,28,K10,K15:B12,16,20,K22,K25')
+    assert evaluator.evaluate(board, WHITE) == -1
+
+
+def test_a_side_without_moves_has_lost():
+    # Black, to move, has one blocked man against four.
+    board = read_fen('W:W32:B27,28,23,24')
+    assert Evaluator().evaluate(board, WHITE) == 3 + DEFAULT_WEIGHTS['won']
+
+
+@pytest.mark.parametrize('weights', [DEFAULT_WEIGHTS, ALL_WEIGHTS], ids=['default', 'all'])
+@pytest.mark.parametrize('colour', [WHITE, BLACK])
+def test_batches_match_single_positions(weights, colour):
+    pytest.importorskip('numpy')
+    evaluator = Evaluator(weights)
+    positions = get_positions()
+    batch = evaluator.evaluate_batch([(board.white, board.black, board.kings, board.turn)
+                                      for board in positions], colour)
+    assert batch == [evaluator.evaluate(board, colour) for board in positions]
+
+
+def test_features_are_antisymmetric():
+    numpy = pytest.importorskip('numpy')
+    evaluator = Evaluator()
+    states = [(board.white, board.black, board.kings, board.turn) for board in get_positions()]
+    assert numpy.array_equal(evaluator.get_batch_features(states, WHITE),
+                             -evaluator.get_batch_features(states, BLACK))
+    assert evaluator.get_batch_features(states, WHITE).shape == (len(states), len(FEATURES))
+
+
+def test_unknown_features_are_refused():
+    with pytest.raises(ValueError):
+        Evaluator({'men': 1, 'tempo': 1})
+
+
+def test_the_ai_reads_a_weights_file(tmp_path):
+    path = tmp_path / 'weights.json'
+    path.write_text(json.dumps({'weights': ALL_WEIGHTS, 'positions': 0}))
+    assert load_weights(str(path)) == ALL_WEIGHTS
+    ai = AI(BitBoard(), WHITE, 2, weights=str(path))
+    assert ai.evaluator.weights == [ALL_WEIGHTS[name] for name in FEATURES]
+    assert ai.choose_move() in ai.board.get_legal_moves()
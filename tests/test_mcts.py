@@ -0,0 +1,71 @@
+# The Monte Carlo tree search AI.
+
+import pytest
+
+from checkers.bitboard import BitBoard, WHITE
+from checkers.mcts import MCTSAI, Tree
+from checkers.notation import read_fen
+
+
+def test_chooses_a_legal_move_and_leaves_the_board():
+    board = BitBoard()
+    ai = MCTSAI(board, WHITE, 300, seed=1)
+    move = ai.choose_move()
+    assert move in board.get_legal_moves()
+    assert board.history == [] and board.key == BitBoard().key
+    assert ai.stats['playouts'] == 300
+    assert ai.principal_variation[0] == move
+
+
+@pytest.mark.parametrize('settings, budget', [({'playouts': 0}, None), ({}, 0)],
+                         ids=['no playouts', 'no time'])
+def test_a_search_too_short_to_choose_still_moves(settings, budget):
+    board = BitBoard()
+    ai = MCTSAI(board, WHITE, seed=1, **settings)
+    assert ai.choose_move(budget) in board.get_legal_moves()
+
+
+def test_stop_only_ends_one_search():
+    board = BitBoard()
+    ai = MCTSAI(board, WHITE, 200, seed=1)
+    ai.stop()
+    assert ai.choose_move() in board.get_legal_moves()
+    assert ai.choose_move() in board.get_legal_moves()
+    assert ai.stats['playouts'] == 200
+
+
+def test_takes_the_only_move():
+    board = read_fen('B:W18,30:B14,1')
+    assert MCTSAI(board, board.turn, 100, seed=1).choose_move() == board.get_legal_moves()[0]
+
+
+def test_no_move_once_lost():
+    board = read_fen('W:W:B1')
+    assert MCTSAI(board, board.turn, 100, seed=1).choose_move() == None
+
+
+def test_the_tree_is_kept_after_the_expected_reply():
+    board = BitBoard()
+    ai = MCTSAI(board, WHITE, 500, seed=1)
+    board.apply_move(ai.choose_move())
+    board.apply_move(ai.principal_variation[1])
+    ai.choose_move()
+    assert ai.stats['reused']
+
+
+def test_tree_columns():
+    tree = Tree()
+    tree.expand(0, BitBoard().get_legal_moves())
+    assert len(tree) == 8
+    assert [tree.get_move(child) for child in tree.get_children(0)] == BitBoard().get_legal_moves()
+    assert all(tree.parent[child] == 0 for child in tree.get_children(0))
+
+
+def test_root_parallel_search():
+    board = BitBoard()
+    ai = MCTSAI(board, WHITE, 200, workers=2, seed=1)
+    try:
+        assert ai.choose_move() in board.get_legal_moves()
+        assert ai.stats['playouts'] == 200
+    finally:
+        ai.close()
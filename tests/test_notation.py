@@ -0,0 +1,113 @@
+# Position encodings, FEN strings, moves and PDN games, all written and read
+# back again.
+
+import random
+
+import pytest
+
+from checkers.bitboard import BitBoard, BLACK
+from checkers.notation import (encode, decode, to_bytes, from_bytes, read_fen, write_fen,
+                               format_move, parse_move, read_pdn, write_pdn)
+
+
+def get_random_games(count, seed=3):
+
+    # Return the moves of random games of varying length.
+    rng = random.Random(seed)
+    games = []
+    for game in range(count):
+        board = BitBoard()
+        moves = []
+        for ply in range(rng.randrange(1, 150)):
+            legal_moves = board.get_legal_moves()
+            if legal_moves == []:
+                break
+            move = rng.choice(legal_moves)
+            moves.append(move)
+            board.apply_move(move)
+        games.append(moves)
+    return games
+
+
+def get_state(board):
+    return (board.white, board.black, board.kings, board.turn, board.key)
+
+
+def test_positions_and_moves_round_trip():
+
+    for moves in get_random_games(30):
+        board = BitBoard()
+        for move in moves:
+            assert get_state(decode(encode(board))) == get_state(board)
+            assert get_state(from_bytes(to_bytes(board))) == get_state(board)
+            assert get_state(read_fen(write_fen(board))) == get_state(board)
+            assert parse_move(board, format_move(board, move)) == move
+            board.apply_move(move)
+
+
+def test_encodings_take_13_bytes():
+    assert len(to_bytes(BitBoard())) == 13
+    assert encode(BitBoard()) < 2 ** 97
+
+
+def test_fen_of_the_starting_position():
+    assert write_fen(BitBoard()) == 'B:B1,2,3,4,5,6,7,8,9,10,11,12:W21,22,23,24,25,26,27,28,29,30,31,32'
+    assert get_state(read_fen('[FEN "B:W21-32:B1-12"]')) == get_state(BitBoard())
+
+
+def test_fen_kings_and_side_to_move():
+    board = read_fen('W:W18,24,27,28,K10,K15:B12,16,20,K22,K25,K29')
+    assert board.turn == BLACK
+    assert bin(board.kings).count('1') == 5
+    assert write_fen(board) == 'W:B12,16,20,K22,K25,K29:WK10,K15,18,24,27,28'
+
+
+@pytest.mark.parametrize('fen', ['X:W21:B1', 'B:W21,1:B1', 'B:W1:B2', 'B:W33:B1'])
+def test_impossible_positions_are_refused(fen):
+    with pytest.raises(ValueError):
+        read_fen(fen)
+
+
+def test_captures_are_written_with_every_square():
+    board = read_fen('B:W18,26:B14')
+    move = board.get_legal_moves()[0]
+    assert format_move(board, move) == '14x23x30'
+    assert parse_move(board, '14x30') == move
+    with pytest.raises(ValueError):
+        parse_move(board, '14-17')
+
+
+def test_pdn_games_round_trip(tmp_path):
+
+    games = get_random_games(20)
+    # A game from a set-up position, with Black (White in PDN) to move.
+    start = read_fen('W:W18,24,27,28,K10,K15:B12,16,20,K22,K25,K29')
+    board = start.copy()
+    moves = []
+    for ply in range(10):
+        move = sorted(board.get_legal_moves())[0]
+        moves.append(move)
+        board.apply_move(move)
+
+    path = tmp_path / 'games.pdn'
+    with open(path, 'w') as file:
+        for game in games:
+            write_pdn(file, BitBoard(), game, '*', (('Event', 'Test'),))
+        write_pdn(file, start, moves, '1-0')
+
+    read = list(read_pdn(path))
+    assert [game for position, game in read] == games + [moves]
+    assert all(get_state(position) == get_state(BitBoard()) for position, game in read[:-1])
+    assert get_state(read[-1][0]) == get_state(start)
+
+
+def test_pdn_comments_and_variations_are_skipped(tmp_path):
+    path = tmp_path / 'game.pdn'
+    path.write_text('[Event "x"]\n1. 11-15 {a comment} (1. 9-13 22-18) 23-19 2. 8-11 *\n')
+    (position, moves), = read_pdn(path)
+    board = BitBoard()
+    written = []
+    for move in moves:
+        written.append(format_move(board, move))
+        board.apply_move(move)
+    assert written == ['11-15', '23-19', '8-11']
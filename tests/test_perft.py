@@ -0,0 +1,60 @@
+# Move generator counts against the published and stored perft numbers.
+
+import time
+
+import pytest
+
+from checkers.perft import POSITIONS, check, divide, make_board, perft
+
+# Counts above this many leaves are timing cases rather than quick checks,
+# and counts above the second limit take too long to run at all.
+QUICK_NODES = 10 ** 5
+BENCHMARK_NODES = 2 * 10 ** 7
+
+CASES = [pytest.param(name, depth, expected, id='%s-%d' % (name.replace(' ', '-'), depth),
+                      marks=[pytest.mark.benchmark] if expected > QUICK_NODES else [])
+         for name, white, black, kings, turn, counts in POSITIONS
+         for depth, expected in enumerate(counts, 1)
+         if expected <= BENCHMARK_NODES]
+
+
+def get_board(name):
+    for position in POSITIONS:
+        if position[0] == name:
+            return make_board(*position[1:5])
+
+
+@pytest.mark.parametrize('name, depth, expected', CASES)
+def test_perft(name, depth, expected):
+
+    board = get_board(name)
+    start = time.perf_counter()
+    counted = perft(board, depth)
+    seconds = time.perf_counter() - start
+    assert counted == expected
+    if expected > QUICK_NODES:
+        print('%s perft(%d): %.0f nodes/s' % (name, depth, counted / seconds))
+
+
+def test_check_finds_no_failures():
+    results = list(check(5, QUICK_NODES))
+    assert results != []
+    assert [(name, depth) for name, depth, expected, counted, seconds in results
+            if counted != expected] == []
+
+
+def test_perft_of_no_moves_is_one():
+    assert perft(make_board(None, None, None, None), 0) == 1
+
+
+def test_divide_adds_up_to_perft():
+    board = make_board(None, None, None, None)
+    assert sum(count for move, count in divide(board, 4)) == perft(board, 4)
+
+
+def test_perft_leaves_the_board_as_it_was():
+    board = get_board('king jump')
+    before = (board.white, board.black, board.kings, board.turn, board.key)
+    perft(board, 5)
+    assert (board.white, board.black, board.kings, board.turn, board.key) == before
+    assert board.history == []
@@ -0,0 +1,96 @@
+# Binary game records, written and read back again.
+
+import json
+
+from checkers.bitboard import BitBoard, WHITE, BLACK
+from checkers.notation import read_fen, to_bytes
+from checkers.records import (GameWriter, read_games, get_complete_size, MAGIC, RECORD, DRAW,
+                              UNKNOWN)
+
+from test_notation import get_random_games
+
+
+def test_games_round_trip(tmp_path):
+
+    path = str(tmp_path / 'games.bin')
+    games = get_random_games(40)
+    results = [(WHITE, BLACK, DRAW, UNKNOWN)[number % 4] for number in range(len(games))]
+
+    # Two writers append to the same file.
+    for part in (slice(0, 20), slice(20, None)):
+        writer = GameWriter(path)
+        for moves, result in zip(games[part], results[part]):
+            writer.write(moves, result)
+        writer.close()
+
+    read = list(read_games(path))
+    assert [game.get_moves() for game in read] == games
+    assert [game.result for game in read] == results
+    # A record takes the header and one byte per ply.
+    assert get_complete_size(path) == len(MAGIC) + sum(RECORD.size + len(moves) for moves in games)
+
+
+def test_replay_yields_every_position(tmp_path):
+    path = str(tmp_path / 'games.bin')
+    moves = get_random_games(1)[0]
+    writer = GameWriter(path)
+    writer.write(moves, WHITE)
+    writer.close()
+
+    game, = read_games(path)
+    board = BitBoard()
+    for position, move in game.replay():
+        assert (position.white, position.black, position.kings, position.turn) == (
+            board.white, board.black, board.kings, board.turn)
+        board.apply_move(move)
+    assert game.get_moves(5) == moves[:5]
+
+
+def test_games_from_a_set_up_position(tmp_path):
+    path = str(tmp_path / 'games.bin')
+    start = read_fen('W:W18,24,27,28,K10,K15:B12,16,20,K22,K25,K29')
+    moves = [sorted(start.get_legal_moves())[0]]
+    writer = GameWriter(path)
+    writer.write(moves, UNKNOWN, start)
+    writer.close()
+
+    game, = read_games(path)
+    assert game.get_start().key == start.key
+    assert game.get_moves() == moves
+
+
+def test_a_record_cut_short_is_dropped(tmp_path):
+
+    path = str(tmp_path / 'games.bin')
+    games = get_random_games(3)
+    writer = GameWriter(path)
+    for moves in games:
+        writer.write(moves, DRAW)
+    writer.close()
+
+    # A writer stopped part of the way through a record.
+    with open(path, 'ab') as file:
+        file.write(RECORD.pack(to_bytes(BitBoard()), DRAW, 50) + bytes(7))
+    assert len(list(read_games(path))) == 3
+
+    writer = GameWriter(path)
+    writer.write(games[0], WHITE)
+    writer.close()
+    read = list(read_games(path))
+    assert [game.get_moves() for game in read] == games + [games[0]]
+
+
+def test_selfplay_lines_convert(tmp_path, monkeypatch):
+
+    # The convert command reads the JSON lines of checkers.selfplay.
+    games = get_random_games(3)
+    selfplay = tmp_path / 'selfplay.jsonl'
+    with open(selfplay, 'w') as file:
+        for moves in games:
+            file.write(json.dumps({'winner': 'draw', 'moves': [{'move': move} for move in moves]}) + '\n')
+
+    from checkers import records
+    output = str(tmp_path / 'games.bin')
+    monkeypatch.setattr('sys.argv', ['records', 'convert', '--selfplay', str(selfplay), '--output', output])
+    records.main()
+    assert [game.get_moves() for game in read_games(output)] == games
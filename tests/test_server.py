@@ -0,0 +1,139 @@
+# The analysis server's protocol, spoken over a real connection.
+
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from checkers import server
+from checkers.bitboard import BitBoard
+from checkers.evaluation import Evaluator
+from checkers.notation import encode, write_fen, read_fen
+
+
+def ask(requests, workers=1):
+
+    # Send all the requests at once to a server on a free port, and return
+    # the answers by id.
+    async def run():
+        analysis = server.AnalysisServer(workers)
+        listener = await asyncio.start_server(analysis.serve_client, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            for request in requests:
+                line = request if isinstance(request, str) else json.dumps(request)
+                writer.write((line + '\n').encode())
+            await writer.drain()
+            answers = [json.loads(await reader.readline()) for request in requests]
+            writer.close()
+            await writer.wait_closed()
+            # Let the server see the connection close before it stops.
+            await asyncio.sleep(0.05)
+        finally:
+            listener.close()
+            analysis.close()
+        return {answer['id']: answer for answer in answers}
+
+    return asyncio.run(run())
+
+
+def test_answers():
+
+    fen = write_fen(BitBoard())
+    answers = ask([
+        {'id': 1, 'method': 'legal_moves', 'fen': fen},
+        {'id': 2, 'method': 'evaluate', 'fen': 'B:W18,24,27,28,K10,K15:B12,16,20,K22,K25,K29'},
+        {'id': 3, 'method': 'best_move', 'code': encode(BitBoard()), 'depth': 4, 'game': 'g'},
+        {'id': 4, 'method': 'best_move', 'fen': fen, 'time': 50},
+    ])
+
+    assert sorted(answers[1]['result']['moves']) == ['10-14', '10-15', '11-15', '11-16', '12-16',
+                                                     '9-13', '9-14']
+
+    # Values are from the point of view of the side to move.
+    board = read_fen('B:W18,24,27,28,K10,K15:B12,16,20,K22,K25,K29')
+    assert answers[2]['result']['value'] == Evaluator().evaluate(board, board.turn)
+
+    result = answers[3]['result']
+    assert result['depth'] == 4
+    assert result['move'] in answers[1]['result']['moves']
+    assert result['pv'][0] == result['move'] and len(result['pv']) == 4
+    assert answers[4]['result']['depth'] >= 1
+
+
+def test_errors():
+
+    fen = write_fen(BitBoard())
+    answers = ask([
+        {'id': 'method', 'method': 'nope', 'fen': fen},
+        {'id': 'position', 'method': 'evaluate'},
+        {'id': 'fen', 'method': 'evaluate', 'fen': 'B:W1:B1'},
+        {'id': 'shallow', 'method': 'best_move', 'fen': fen, 'depth': 0},
+        {'id': 'deep', 'method': 'best_move', 'fen': fen, 'depth': 1000},
+        {'id': 'slow', 'method': 'best_move', 'fen': fen, 'depth': 40, 'timeout': 100},
+        'not json',
+    ])
+
+    assert answers['method']['error'] == "Unknown method: 'nope'"
+    assert answers['position']['error'] == 'The request has no position'
+    assert 'error' in answers['fen']
+    assert answers['shallow']['error'] == answers['deep']['error'] == 'The depth must be from 1 to 64'
+    assert 'error' in answers['slow']
+    assert 'error' in answers[None]
+
+
+def test_many_evaluations_are_batched():
+    fen = write_fen(BitBoard())
+    answers = ask([{'id': number, 'method': 'evaluate', 'fen': fen} for number in range(100)])
+    assert set(answer['result']['value'] for answer in answers.values()) == {0}
+
+
+def test_a_game_searched_for_both_sides_matches_fresh_searches():
+
+    # Positions along one game, so that the searches share table entries.
+    rng = random.Random(3)
+    board = BitBoard()
+    positions = []
+    for ply in range(12):
+        positions.append(encode(board))
+        board.apply_move(rng.choice(board.get_legal_moves()))
+
+    fresh = []
+    for code in positions:
+        server._worker_ais.clear()
+        fresh.append(server.search(code, 'fresh', 5, None, time.time() + 60)['value'])
+
+    server._worker_ais.clear()
+    for repeat in range(2):
+        values = [server.search(code, 'game', 5, None, time.time() + 60)['value'] for code in positions]
+        assert values == fresh
+    server._worker_ais.clear()
+
+
+def test_search_without_moves():
+    result = server.search(encode(read_fen('W:W:B1')), None, 3, None, time.time() + 60)
+    assert result['move'] == None and result['pv'] == []
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='no SIGTERM on Windows')
+def test_sigterm_stops_the_workers_too():
+
+    # The workers share the server's output, so it only ends when they have
+    # all gone.
+    process = subprocess.Popen([sys.executable, '-m', 'checkers.server', '--port', '0', '--workers', '2'],
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        assert process.stdout.readline().startswith('serving on')
+        process.send_signal(signal.SIGTERM)
+        assert process.communicate(timeout=30)[0] == ''
+    finally:
+        process.kill()
+        process.stdout.close()
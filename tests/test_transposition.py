@@ -0,0 +1,64 @@
+# The transposition table's replacement policies and lookups.
+
+import pytest
+
+from checkers.transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+SIZE = 16
+MOVE = (9, 13, 0)
+
+
+def test_size_is_rounded_to_a_power_of_two():
+    assert TranspositionTable(100).size == 64
+    with pytest.raises(ValueError):
+        TranspositionTable(SIZE, 'newest')
+
+
+def test_a_deeper_entry_of_this_search_is_kept():
+    table = TranspositionTable(SIZE)
+    table.store(1, 6, EXACT, 10, MOVE)
+    # Key 1 + SIZE shares the slot of key 1.
+    table.store(1 + SIZE, 2, LOWER, 20, MOVE)
+    assert table.probe(1)[:4] == (1, 6, EXACT, 10)
+    assert table.probe(1 + SIZE) == None
+    assert table.stores == 1
+
+    # A search at least as deep replaces it.
+    table.store(1 + SIZE, 6, LOWER, 20, MOVE)
+    assert table.probe(1) == None
+    assert table.probe(1 + SIZE)[:4] == (1 + SIZE, 6, LOWER, 20)
+
+
+def test_an_entry_of_an_earlier_search_is_replaced():
+    table = TranspositionTable(SIZE)
+    table.store(1, 6, EXACT, 10, MOVE)
+    table.new_search()
+    table.store(1 + SIZE, 2, UPPER, 20, MOVE)
+    assert table.probe(1) == None
+    assert table.probe(1 + SIZE) == (1 + SIZE, 2, UPPER, 20, MOVE, table.age)
+
+
+def test_the_same_position_is_always_overwritten():
+    table = TranspositionTable(SIZE)
+    table.store(1, 6, EXACT, 10, MOVE)
+    table.store(1, 2, LOWER, 20, None)
+    assert table.probe(1) == (1, 2, LOWER, 20, None, table.age)
+
+
+def test_always_keeps_the_newest_entry():
+    table = TranspositionTable(SIZE, 'always')
+    table.store(1, 6, EXACT, 10, MOVE)
+    table.store(1 + SIZE, 2, LOWER, 20, MOVE)
+    assert table.probe(1) == None
+    assert table.probe(1 + SIZE)[:4] == (1 + SIZE, 2, LOWER, 20)
+    assert table.stores == 2
+
+
+def test_probe_tells_positions_sharing_a_slot_apart():
+    table = TranspositionTable(SIZE)
+    table.store(3, 4, EXACT, 10, MOVE)
+    assert table.probe(3 + SIZE) == None
+    assert table.probe(3 + 5 * SIZE) == None
+    assert table.probe(3) != None
+    assert (table.probes, table.hits) == (3, 1)
+    assert table.get_hit_rate() == 1 / 3
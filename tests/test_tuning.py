@@ -0,0 +1,61 @@
+# Fitting the evaluation weights to recorded games.
+
+import json
+
+import pytest
+
+from checkers import tuning
+from checkers.bitboard import BitBoard, WHITE, BLACK
+from checkers.evaluation import FEATURES, load_weights
+from checkers.records import GameWriter, DRAW
+
+from test_notation import get_random_games
+
+numpy = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def record_path(tmp_path):
+
+    # Random games, each won by the side with more pieces at the end.
+    path = str(tmp_path / 'games.bin')
+    writer = GameWriter(path)
+    for moves in get_random_games(60):
+        board = BitBoard()
+        for move in moves:
+            board.apply_move(move)
+        white, black = board.white.bit_count(), board.black.bit_count()
+        writer.write(moves, WHITE if white > black else BLACK if black > white else DRAW)
+    writer.close()
+    return path
+
+
+def test_positions_are_labelled(record_path):
+    features, scores = tuning.load_positions([('records', record_path)], 1, tuning.SKIP_PLIES)
+    assert features.shape == (len(scores), len(FEATURES))
+    assert set(scores.tolist()) <= {0.0, 0.5, 1.0}
+    # The games are the same whichever way they are shared out.
+    parts = [tuning.extract_positions([('records', record_path)], part, 3, tuning.SKIP_PLIES)
+             for part in range(3)]
+    assert sum(len(part[1]) for part in parts) == len(scores)
+
+
+def test_fitting_beats_no_weights(record_path):
+    features, scores = tuning.load_positions([('records', record_path)], 1, tuning.SKIP_PLIES)
+    with tuning.ThreadPoolExecutor(2) as executor:
+        weights, loss = tuning.fit(features[:, :2], scores, executor)
+    assert weights[0] > 0
+    assert loss < numpy.log(2)
+
+
+def test_the_weights_file(record_path, tmp_path, monkeypatch):
+    output = str(tmp_path / 'weights.json')
+    monkeypatch.setattr('sys.argv', ['tuning', '--records', record_path, '--workers', '1',
+                                     '--features', 'men,kings', '--output', output])
+    tuning.main()
+    weights = load_weights(output)
+    assert weights['men'] == tuning.UNIT
+    assert weights['won'] == tuning.WON_MEN * tuning.UNIT
+    assert all(isinstance(weight, int) for weight in weights.values())
+    with open(output) as file:
+        assert json.load(file)['positions'] > 0